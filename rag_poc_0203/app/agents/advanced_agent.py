@@ -10,7 +10,11 @@ from langgraph.graph import StateGraph, END
 
 from app.models.router import router
 from app.rag.retriever import retriever
+from app.rag.rerank import resolve_rerank_mode
 from app.core.prompts import prompt_manager
+from app.core.config import get_settings
+
+settings = get_settings()
 
 # 1. Define State
 class AdvancedAgentState(TypedDict):
@@ -54,12 +58,13 @@ async def executor_node(state: AdvancedAgentState, config: RunnableConfig):
     retrieval_config = state.get("retrieval_config", {})
     
     top_k = retrieval_config.get("top_k", 3)
-    use_reranker = retrieval_config.get("use_reranker", False)
+    # No reranking unless requested (or opted in with ADVANCED_RERANK_MODE)
+    rerank_mode = resolve_rerank_mode(retrieval_config, default=settings.ADVANCED_RERANK_MODE)
     
     search_type = retrieval_config.get("search_type", "vector")
     metadata_filter = retrieval_config.get("metadata_filter", None)
     
-    fetch_k = top_k * 3 if use_reranker else top_k
+    fetch_k = top_k * 3 if rerank_mode != "none" else top_k
     docs = await retriever.retrieve(
         user_query, 
         collection_name=collection_name, 
@@ -68,11 +73,8 @@ async def executor_node(state: AdvancedAgentState, config: RunnableConfig):
         metadata_filter=metadata_filter
     )
     
-    if use_reranker and docs:
-        from app.agents.simple_agent import llm_rerank
-        docs = await llm_rerank(user_query, docs, top_k, config=config)
-    else:
-        docs = docs[:top_k]
+    from app.agents.simple_agent import rerank_docs
+    docs = await rerank_docs(user_query, docs, top_k, collection_name, rerank_mode, config=config)
     
     ctx_name = prompt_map.get("rag_context", "rag_context")
     context_template = prompt_manager.get_prompt(ctx_name)
@@ -0,0 +1,110 @@
+import re
+import threading
+from typing import Dict, List, Optional
+from app.core.config import get_settings
+from app.rag.keyword_index import tokenize_ko
+
+settings = get_settings()
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# full: every node runs | adaptive: cheap retrieval signals gate expansion, rerank and grading
+PIPELINE_MODES = ("full", "adaptive")
+
+
+def pipeline_mode(retrieval_config: Dict) -> str:
+    mode = retrieval_config.get("pipeline_mode") or settings.PIPELINE_MODE
+    return mode if mode in PIPELINE_MODES else "full"
+
+
+def new_pipeline_record(retrieval_config: Dict) -> Dict:
+    """Per-request record of the pipeline decisions (kept in the graph state)."""
+    return {"mode": pipeline_mode(retrieval_config), "skipped": [], "signals": {}, "confident": False, "saved_ms": 0.0}
+
+
+def keyword_overlap(query: str, docs: List[Dict]) -> Optional[float]:
+    """
+    Fraction of the query's words (surface form or particle-stripped stem) found in the
+    docs' content. None when no doc has content (not hydrated).
+    """
+    contents = [d["content"] for d in docs if d.get("content")]
+    if not contents:
+        return None
+    doc_terms = {t for t in tokenize_ko(" ".join(contents)) if not t.startswith("#")}
+    words = [w for w in _WORD.findall(query.lower()) if len(w) >= 2]
+    if not words:
+        return None
+    matched = sum(1 for w in words if any(t in doc_terms for t in tokenize_ko(w) if not t.startswith("#")))
+    return matched / len(words)
+
+
+def retrieval_signals(query: str, docs: List[Dict], search_type: str) -> Dict:
+    """Top score, gap to the runner-up and query keyword overlap of a ranked doc list."""
+    scores = [d["score"] for d in docs]
+    top = scores[0] if scores else 0.0
+    return {
+        "search_type": search_type,
+        "top_score": round(top, 4),
+        "score_gap": round(top - scores[1], 4) if len(scores) > 1 else round(top, 4),
+        "keyword_overlap": keyword_overlap(query, docs[:3]),
+        "docs": len(docs),
+    }
+
+
+def is_confident(signals: Dict) -> bool:
+    """
+    Retrieval is "clearly good" when the top vector score is high and either stands out
+    from the runner-up or shares most of the query's keywords. Only vector (cosine)
+    scores are absolute; keyword and fused scores never count as confident.
+    """
+    if signals.get("search_type") != "vector" or not signals.get("docs"):
+        return False
+    if signals["top_score"] < settings.ADAPTIVE_MIN_TOP_SCORE:
+        return False
+    overlap = signals.get("keyword_overlap")
+    return signals["score_gap"] >= settings.ADAPTIVE_MIN_SCORE_GAP or (
+        overlap is not None and overlap >= settings.ADAPTIVE_MIN_KEYWORD_OVERLAP
+    )
+
+
+class NodeLatency:
+    """
+    Moving average of each skippable node's latency, measured when it runs, so a
+    skipped node can be credited with the time it would have taken.
+    """
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._avg_ms: Dict[str, float] = {}
+        self._skips: Dict[str, int] = {}
+        self._saved_ms: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, node: str, elapsed_ms: float):
+        with self._lock:
+            avg = self._avg_ms.get(node)
+            self._avg_ms[node] = elapsed_ms if avg is None else avg + self.alpha * (elapsed_ms - avg)
+
+    def skip(self, pipeline: Dict, node: str, reason: str) -> Dict:
+        """Records a skipped node on the request's pipeline record (returns a new record)."""
+        with self._lock:
+            saved = round(self._avg_ms.get(node, 0.0), 1)
+            self._skips[node] = self._skips.get(node, 0) + 1
+            self._saved_ms[node] = self._saved_ms.get(node, 0.0) + saved
+        pipeline = dict(pipeline)
+        pipeline["skipped"] = pipeline["skipped"] + [{"node": node, "reason": reason, "saved_ms": saved}]
+        pipeline["saved_ms"] = round(pipeline["saved_ms"] + saved, 1)
+        return pipeline
+
+    def stats(self) -> Dict:
+        return {
+            node: {
+                "avg_ms": round(self._avg_ms.get(node, 0.0), 1),
+                "skipped": self._skips.get(node, 0),
+                "saved_ms_total": round(self._saved_ms.get(node, 0.0), 1),
+            }
+            for node in sorted(set(self._avg_ms) | set(self._skips))
+        }
+
+
+# Singleton instance
+node_latency = NodeLatency()
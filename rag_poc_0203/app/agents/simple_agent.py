@@ -1,4 +1,6 @@
+import asyncio
 import operator
+import time
 from typing import Annotated, Sequence, TypedDict, Union, List, Dict, Any, Optional
 import os
 
@@ -10,12 +12,17 @@ try:
 except ImportError:
     observe = lambda *args, **kwargs: (lambda f: f)
 from app.models.router import router
-from app.rag.retriever import retriever
+from app.rag.retriever import retriever, rrf_fuse
+from app.rag.rerank import resolve_rerank_mode, vector_rerank
+from app.agents.pipeline import new_pipeline_record, retrieval_signals, is_confident, node_latency
+from app.core.config import get_settings
 from app.core.prompts import prompt_manager
 from app.rag.query_logic import generate_queries
 from app.rag.web_tools import web_search_tool
 from langchain_core.runnables import RunnableConfig
 
+settings = get_settings()
+
 # 1. Define State
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
@@ -26,16 +33,20 @@ class AgentState(TypedDict):
     prompt_map: Dict[str, str]
     collection_name: str
     retrieval_config: Dict
-    summary: str # Compressed history
+    summary: str # Compressed history (updated in the background, see app/agents/summarizer.py)
+    pipeline: Dict # Adaptive mode: skipped nodes, retrieval signals, saved latency
 
 # 2. Nodes & Helpers
 async def llm_rerank(query: str, docs: List[Dict], top_k: int, config: Optional[RunnableConfig] = None) -> List[Dict]:
     """
-    Reranks documents using a cheap LLM call for better precision.
+    Reranks documents using a cheap LLM call for better precision (opt-in: rerank_mode="llm").
+    Budgeted: at most LLM_RERANK_MAX_DOCS candidates of LLM_RERANK_MAX_CHARS each, and
+    LLM_RERANK_TIMEOUT seconds before falling back to the given order.
     """
+    docs = docs[:settings.LLM_RERANK_MAX_DOCS]
     doc_list = ""
     for idx, d in enumerate(docs):
-        doc_list += f"[{idx}] {d['content'][:]}\n"
+        doc_list += f"[{idx}] {d['content'][:settings.LLM_RERANK_MAX_CHARS]}\n"
         
     prompt = f"""
 다음 문서를 검색 쿼리에 가장 관련 있는 순서대로 정렬해주세요. 
@@ -50,7 +61,10 @@ async def llm_rerank(query: str, docs: List[Dict], top_k: int, config: Optional[
 
     try:
         # Use simple task type for speed
-        gen_result = await router.generate(prompt, task_type="simple", config=config)
+        gen_result = await asyncio.wait_for(
+            router.generate(prompt, task_type="simple", config=config),
+            timeout=settings.LLM_RERANK_TIMEOUT
+        )
         response = gen_result.content
         
         # Parse indices
@@ -69,67 +83,151 @@ async def llm_rerank(query: str, docs: List[Dict], top_k: int, config: Optional[
         
     return docs[:top_k]
 
-@observe()
-async def rewrite_query_node(state: AgentState, config: RunnableConfig):
+async def rerank_docs(query: str, docs: List[Dict], top_k: int, collection_name: str, rerank_mode: str, config: Optional[RunnableConfig] = None) -> List[Dict]:
     """
-    Expands the user query into multiple variations for better retrieval.
+    Applies the rerank mode to retrieved candidates (in retrieval order):
+    vector/mmr rank by stored vectors in one NumPy pass; llm asks the LLM to order the
+    vector-preranked candidates; none keeps retrieval order.
     """
+    if rerank_mode == "llm" and docs:
+        if len(docs) > settings.LLM_RERANK_MAX_DOCS:
+            docs = await vector_rerank(query, docs, settings.LLM_RERANK_MAX_DOCS, collection_name, lambda_=1.0)
+        return await llm_rerank(query, docs, top_k, config=config)
+    if rerank_mode in ("vector", "mmr") and len(docs) > top_k:
+        return await vector_rerank(query, docs, top_k, collection_name, lambda_=1.0 if rerank_mode == "vector" else None)
+    return docs[:top_k]
+
+def expansion_input(state: AgentState) -> str:
     user_query = state["messages"][-1].content
     summary = state.get("summary", "")
-    
     # If summary exists, combine it for better query expansion context
-    expansion_input = f"[맥락: {summary}] {user_query}" if summary else user_query
-    
-    queries = await generate_queries(expansion_input, n=2, config=config) # Generate 2 extra variations
-    return {"queries": queries}
+    return f"[맥락: {summary}] {user_query}" if summary else user_query
+
+async def expand_query(state: AgentState, config: Optional[RunnableConfig] = None) -> List[str]:
+    started = time.perf_counter()
+    queries = await generate_queries(expansion_input(state), n=2, config=config) # Generate 2 extra variations
+    node_latency.record("rewrite_query", (time.perf_counter() - started) * 1000)
+    return queries
+
+def speculative_retrieval_enabled(retrieval_config: Dict) -> bool:
+    speculative = retrieval_config.get("speculative_retrieval")
+    return settings.SPECULATIVE_RETRIEVAL if speculative is None else speculative
+
+async def speculative_retrieve(state: AgentState, retrieval_config: Dict, retrieve_kwargs: Dict, config: Optional[RunnableConfig] = None, adaptive: bool = False):
+    """
+    Retrieves the original query while the query variations are still being generated,
+    so time to first token no longer includes a retrieval after the expansion LLM call.
+    The variations' results are fused in (RRF) when they arrive. The expansion is
+    abandoned when the original query's top vector score reaches the skip score, or in
+    adaptive mode when its retrieval signals are confident.
+    Returns (docs in fused rank order, queries searched, skip reason or None).
+    """
+    original_query = state["messages"][-1].content
+    search_type = retrieve_kwargs.get("search_type", "vector")
+    expansion = asyncio.create_task(expand_query(state, config=config))
+    try:
+        first = await retriever.retrieve_many([original_query], **retrieve_kwargs)
+    except BaseException:
+        expansion.cancel()
+        raise
+
+    skip_score = retrieval_config.get("skip_expansion_score")
+    if skip_score is None:
+        skip_score = settings.SKIP_EXPANSION_SCORE
+    skip_reason = None
+    # Only cosine scores are comparable to a threshold (keyword/fused scores are relative)
+    if skip_score is not None and search_type == "vector" and first and first[0]["score"] >= skip_score:
+        skip_reason = f"top score >= {skip_score}"
+    elif adaptive and is_confident(retrieval_signals(original_query, first, search_type)):
+        skip_reason = "confident retrieval"
+    if skip_reason:
+        expansion.cancel()
+        return first, [original_query], skip_reason
+
+    queries = await expansion
+    variations = [q for q in queries if q.strip() != original_query.strip()]
+    if not variations:
+        return first, [original_query], None
+    rest = await retriever.retrieve_many(variations, **retrieve_kwargs)
+    return rrf_fuse([first, rest], settings.RRF_K), [original_query] + variations, None
+
+@observe()
+async def rewrite_query_node(state: AgentState, config: RunnableConfig):
+    """
+    Expands the user query into multiple variations for better retrieval.
+    """
+    retrieval_config = state.get("retrieval_config", {})
+    pipeline = new_pipeline_record(retrieval_config)
+    if pipeline["mode"] == "adaptive" and retrieval_config.get("search_type", "vector") == "graph":
+        # The knowledge graph analyses the question itself; variations only multiply graph queries
+        pipeline = node_latency.skip(pipeline, "rewrite_query", "search_type=graph")
+        return {"queries": [state["messages"][-1].content], "pipeline": pipeline}
+    if speculative_retrieval_enabled(retrieval_config) or pipeline["mode"] == "adaptive":
+        # Expansion runs in retrieve_node, overlapped with the original query's retrieval
+        return {"queries": [], "pipeline": pipeline}
+    
+    queries = await expand_query(state, config=config)
+    return {"queries": queries, "pipeline": pipeline}
 
 @observe()
 async def retrieve_node(state: AgentState, config: RunnableConfig):
     original_query = state["messages"][-1].content
-    queries = state.get("queries", [original_query])
+    queries = state.get("queries") or [original_query]
     prompt_map = state.get("prompt_map", {})
     collection_name = state.get("collection_name", "knowledge_base")
     retrieval_config = state.get("retrieval_config", {})
     
     top_k = retrieval_config.get("top_k", 3)
-    use_reranker = retrieval_config.get("use_reranker", False)
+    rerank_mode = resolve_rerank_mode(retrieval_config)
+    pipeline = dict(state.get("pipeline") or new_pipeline_record(retrieval_config))
+    adaptive = pipeline["mode"] == "adaptive"
     score_threshold = retrieval_config.get("score_threshold", 0.0)
     search_type = retrieval_config.get("search_type", "vector")
     metadata_filter = retrieval_config.get("metadata_filter", None)
     
-    fetch_k = top_k * 2 if use_reranker else top_k 
+    # Lazy hydration: candidates come back as (id, score) and only the final top_k
+    # are fetched with content. The LLM reranker needs content, so it disables this.
+    lazy_hydration = retrieval_config.get("lazy_hydration")
+    if lazy_hydration is None:
+        lazy_hydration = settings.RETRIEVAL_LAZY_HYDRATION
+    lazy_hydration = lazy_hydration and rerank_mode != "llm"
+    
+    fetch_k = top_k * 2 if rerank_mode != "none" else top_k
     
     try:
-        import asyncio
-        # Perform parallel retrieval for all queries
-        tasks = [
-            retriever.retrieve(
-                q, 
-                collection_name=collection_name, 
-                limit=fetch_k,
-                score_threshold=score_threshold,
-                search_type=search_type,
-                metadata_filter=metadata_filter
-            ) for q in queries
-        ]
-        
-        results = await asyncio.gather(*tasks)
+        retrieve_kwargs = {
+            "collection_name": collection_name,
+            "limit": fetch_k,
+            "score_threshold": score_threshold,
+            "search_type": search_type,
+            "metadata_filter": metadata_filter,
+            "hydrate": not lazy_hydration,
+        }
+        if (speculative_retrieval_enabled(retrieval_config) or adaptive) and not state.get("queries"):
+            all_docs, queries, skip_reason = await speculative_retrieve(state, retrieval_config, retrieve_kwargs, config=config, adaptive=adaptive)
+            if skip_reason:
+                pipeline = node_latency.skip(pipeline, "rewrite_query", skip_reason)
+        else:
+            # One batch embedding + one batch search for all query variations,
+            # fused with RRF and deduplicated by point id
+            all_docs = await retriever.retrieve_many(queries, **retrieve_kwargs)
         
-        # Flatten and De-duplicate
-        all_docs = []
-        seen_contents = set()
-        for doc_list in results:
-            for d in doc_list:
-                if d['content'] not in seen_contents:
-                    all_docs.append(d)
-                    seen_contents.add(d['content'])
+        if adaptive:
+            pipeline["signals"] = retrieval_signals(original_query, all_docs, search_type)
+            pipeline["confident"] = is_confident(pipeline["signals"])
         
-        # 2. Rerank if needed
-        if (use_reranker or len(all_docs) > top_k) and all_docs:
-            all_docs.sort(key=lambda x: x['score'], reverse=True)
-            docs = await llm_rerank(original_query, all_docs, top_k, config=config)
-        else:
+        # 2. Rerank (docs are already in fused rank order)
+        rerank_needed = bool(all_docs) and (rerank_mode == "llm" or (rerank_mode != "none" and len(all_docs) > top_k))
+        if adaptive and rerank_needed and (pipeline["confident"] or search_type == "graph"):
+            pipeline = node_latency.skip(pipeline, "rerank", "confident retrieval" if pipeline["confident"] else "search_type=graph")
             docs = all_docs[:top_k]
+        else:
+            started = time.perf_counter()
+            docs = await rerank_docs(original_query, all_docs, top_k, collection_name, rerank_mode, config=config)
+            if rerank_needed:
+                node_latency.record("rerank", (time.perf_counter() - started) * 1000)
+        if lazy_hydration:
+            docs = await retriever.hydrate(docs, collection_name)
         
         # Format context
         prompt_name = prompt_map.get("rag_context", "rag_context")
@@ -143,10 +241,10 @@ async def retrieve_node(state: AgentState, config: RunnableConfig):
         context_template_str = getattr(context_template, "prompt", getattr(context_template, "template", ""))
         final_context = context_template_str.replace("{retrieved_context}", formatted_context_str)
         
-        return {"context": final_context, "retrieved_docs": docs}
+        return {"context": final_context, "retrieved_docs": docs, "queries": queries, "pipeline": pipeline}
     except Exception as e:
         print(f"ERROR [retrieve_node]: {e}")
-        return {"context": "Error: 정보를 검색하는 도중 기술적인 문제가 발생했습니다.", "retrieved_docs": []}
+        return {"context": "Error: 정보를 검색하는 도중 기술적인 문제가 발생했습니다.", "retrieved_docs": [], "pipeline": pipeline}
 
 @observe()
 async def grade_documents_node(state: AgentState, config: RunnableConfig):
@@ -161,6 +259,11 @@ async def grade_documents_node(state: AgentState, config: RunnableConfig):
         print("DEBUG [Grader]: No documents retrieved. Result: NOT RELEVANT")
         return {"is_relevant": False}
     
+    pipeline = state.get("pipeline") or {}
+    if pipeline.get("confident"):
+        # Adaptive mode: strong retrieval signals stand in for the LLM relevance check
+        return {"is_relevant": True, "pipeline": node_latency.skip(pipeline, "grade_docs", "confident retrieval")}
+    
     context_content = "\n".join([f"- {d['content']}" for d in docs])
     
     prompt = f"""
@@ -177,7 +280,9 @@ async def grade_documents_node(state: AgentState, config: RunnableConfig):
 
     try:
         model_instance = router.get_model(task_type="simple")
+        started = time.perf_counter()
         gen_result = await model_instance.ainvoke(prompt, config=config)
+        node_latency.record("grade_docs", (time.perf_counter() - started) * 1000)
         score = gen_result.content.lower().strip()
         # Look for 'yes' or 'no' strictly
         if "yes" in score and "no" not in score:
@@ -316,57 +421,6 @@ async def generate_node(state: AgentState, config: RunnableConfig):
         "metadata": {"trace_id": trace_id}
     }
 
-@observe()
-async def summarize_history_node(state: AgentState, config: RunnableConfig):
-    """
-    Summarizes the existing conversation history when it gets too long.
-    """
-    messages = state["messages"]
-    existing_summary = state.get("summary", "")
-    
-    if existing_summary:
-        summary_prompt = f"""
-이전 요약: {existing_summary}
-
-기존 요약에 다음 대화 내용을 포함하여 다시 요약해주세요. 
-대화의 핵심 맥락과 중요한 정보(특히 사용자의 선호도나 특정 지식 베이스 관련 내용)를 유지해야 합니다.
-
-새로운 대화:
-{messages[:-1]}
-"""
-    else:
-        summary_prompt = f"""
-다음은 사용자와 AI의 대화 기록입니다. 
-이후 대화의 연속성을 위해 핵심 맥락과 중요한 정보를 요약해주세요. 
-불필요한 인사나 사소한 내용은 제외하고 지식 베이스와 관련된 중요한 사실 위주로 작성하세요.
-
-대화 내용:
-{messages[:-1]}
-"""
-    
-    try:
-        model = router.get_model(task_type="simple")
-        response = await model.ainvoke(summary_prompt)
-        new_summary = response.content
-    except Exception as e:
-        print(f"ERROR [summarize_history_node]: {e}")
-        new_summary = existing_summary
-    
-    # Prune messages: Keep only the new summary and the last 2-3 messages for immediate context
-    # In LangGraph, we can't easily 'delete' messages from the shared state by returning a partial dict 
-    # if the messages key is Annotated with operator.add.
-    # We might need a more custom approach or just work with the summary in the prompt.
-    # For now, we store the summary and continue.
-    return {"summary": new_summary}
-
-def should_summarize(state: AgentState):
-    """
-    Conditional logic to decide if we should run summarization.
-    """
-    if len(state["messages"]) > 10:
-        return "summarize"
-    return "end"
-
 @observe()
 async def missing_info_node(state: AgentState, config: RunnableConfig):
     """
@@ -393,7 +447,6 @@ def build_agent_graph():
     workflow.add_node("web_search", web_search_node)
     workflow.add_node("generate", generate_node)
     workflow.add_node("missing_info", missing_info_node)
-    workflow.add_node("summarize", summarize_history_node)
     
     workflow.set_entry_point("rewrite_query")
     workflow.add_edge("rewrite_query", "retrieve")
@@ -411,25 +464,9 @@ def build_agent_graph():
     
     workflow.add_edge("web_search", "generate")
     
-    # After generation or missing_info, check if we need to summarize
-    workflow.add_conditional_edges(
-        "generate",
-        should_summarize,
-        {
-            "summarize": "summarize",
-            "end": END
-        }
-    )
-    workflow.add_conditional_edges(
-        "missing_info",
-        should_summarize,
-        {
-            "summarize": "summarize",
-            "end": END
-        }
-    )
-    
-    workflow.add_edge("summarize", END)
+    # Summarization runs after the response is sent (app/agents/summarizer.py)
+    workflow.add_edge("generate", END)
+    workflow.add_edge("missing_info", END)
     
     return workflow.compile()
 
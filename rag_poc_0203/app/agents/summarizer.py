@@ -0,0 +1,173 @@
+import asyncio
+import datetime
+import time
+from typing import Dict, List, Set
+
+from langchain_core.messages import BaseMessage
+from sqlalchemy import and_, update
+
+try:
+    from langfuse.decorators import observe
+except ImportError:
+    observe = lambda *args, **kwargs: (lambda f: f)
+from app.models.router import router
+from app.core.config import get_settings
+from app.core.database import async_session, ChatSession
+from app.core.history import load_history, summary_watermark
+
+settings = get_settings()
+
+
+@observe()
+async def summarize_messages(existing_summary: str, messages: List[BaseMessage]) -> str:
+    """
+    Folds messages that left the history window into the running summary. Only those
+    messages are sent, so the cost per pass does not grow with the conversation.
+    """
+    conversation = "\n".join(f"{m.type}: {m.content}" for m in messages)
+
+    if existing_summary:
+        summary_prompt = f"""
+이전 요약: {existing_summary}
+
+기존 요약에 다음 대화 내용을 포함하여 다시 요약해주세요.
+대화의 핵심 맥락과 중요한 정보(특히 사용자의 선호도나 특정 지식 베이스 관련 내용)를 유지해야 합니다.
+
+새로운 대화:
+{conversation}
+"""
+    else:
+        summary_prompt = f"""
+다음은 사용자와 AI의 대화 기록입니다.
+이후 대화의 연속성을 위해 핵심 맥락과 중요한 정보를 요약해주세요.
+불필요한 인사나 사소한 내용은 제외하고 지식 베이스와 관련된 중요한 사실 위주로 작성하세요.
+
+대화 내용:
+{conversation}
+"""
+
+    model = router.get_model(task_type="simple")
+    response = await model.ainvoke(summary_prompt)
+    return response.content
+
+
+class SessionSummarizer:
+    """
+    Updates session summaries after the response has been sent.
+
+    schedule() is called once per persisted turn. Each session has at most one summary
+    task: it waits SUMMARY_DEBOUNCE seconds, then folds the pending messages (see
+    app/core/history.py) into the summary. Turns scheduled while the task is waiting are
+    absorbed into it; turns scheduled while it is summarizing trigger one more pass
+    afterwards. Chat turns read whatever summary is stored at the time.
+    """
+    def __init__(self, debounce: float = 2.0, max_concurrency: int = 2):
+        self.debounce = debounce
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._waiting: Set[str] = set()
+        self._rerun: Set[str] = set()
+        self.scheduled = 0
+        self.coalesced = 0
+        self.passes = 0
+        self.failures = 0
+        self.last_duration = 0.0
+
+    def schedule(self, session_id: str):
+        self.scheduled += 1
+        task = self._tasks.get(session_id)
+        if task is not None and not task.done():
+            self.coalesced += 1
+            if session_id not in self._waiting:
+                self._rerun.add(session_id)
+            return
+        self._tasks[session_id] = asyncio.create_task(self._run(session_id))
+
+    async def _run(self, session_id: str):
+        try:
+            while True:
+                self._waiting.add(session_id)
+                await asyncio.sleep(self.debounce)
+                self._waiting.discard(session_id)
+                async with self._semaphore:
+                    more = await self._summarize(session_id)
+                if not more and session_id not in self._rerun:
+                    break
+                self._rerun.discard(session_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            print(f"ERROR [summarizer] session {session_id}: {e}")
+        finally:
+            self._waiting.discard(session_id)
+            self._rerun.discard(session_id)
+            self._tasks.pop(session_id, None)
+
+    async def _summarize(self, session_id: str) -> bool:
+        """
+        One summary pass. Returns True when more pending messages remain.
+        The LLM call runs between two short DB units of work, not inside one.
+        """
+        async with async_session() as db:
+            session = await db.get(ChatSession, session_id)
+            if session is None:
+                return False
+            existing_summary = session.summary or ""
+            watermark = summary_watermark(session)
+            history = await load_history(db, session)
+        if len(history.pending) < settings.SUMMARY_MIN_MESSAGES:
+            return False
+
+        start = time.perf_counter()
+        summary = await summarize_messages(existing_summary, history.pending)
+        self.last_duration = time.perf_counter() - start
+        self.passes += 1
+
+        async with async_session() as db:
+            # Only applies if the watermark is still the one this pass started from
+            if watermark is None:
+                unchanged = ChatSession.summarized_until.is_(None)
+            elif watermark[1] is None:
+                unchanged = and_(ChatSession.summarized_until == watermark[0], ChatSession.summarized_until_id.is_(None))
+            else:
+                unchanged = and_(ChatSession.summarized_until == watermark[0], ChatSession.summarized_until_id == watermark[1])
+            summarized_until, summarized_until_id = history.watermark(len(history.pending))
+            result = await db.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id, unchanged)
+                .values(
+                    summary=summary,
+                    summarized_until=summarized_until,
+                    summarized_until_id=summarized_until_id,
+                    updated_at=datetime.datetime.utcnow(),
+                )
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            print(f"Summary of session {session_id} changed during the pass. Discarding it.")
+            return False
+        return len(history.pending) >= settings.SUMMARY_MAX_MESSAGES
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "active_sessions": len(self._tasks),
+            "scheduled": self.scheduled,
+            "coalesced": self.coalesced,
+            "passes": self.passes,
+            "failures": self.failures,
+            "last_duration": round(self.last_duration, 3),
+        }
+
+
+# Singleton instance
+session_summarizer = SessionSummarizer(
+    debounce=settings.SUMMARY_DEBOUNCE,
+    max_concurrency=settings.SUMMARY_MAX_CONCURRENCY,
+)
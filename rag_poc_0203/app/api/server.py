@@ -1,11 +1,12 @@
 import asyncio
 import json
 import uuid
-from fastapi import FastAPI, BackgroundTasks, Depends
+from fastapi import FastAPI, BackgroundTasks, Depends, Request, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Optional, List
-from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Optional, List
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,8 +19,11 @@ from app.agents.advanced_agent import advanced_graph
 from app.ops.monitor import observable
 from app.ops.router_logic import classify_intent
 from app.core.database import get_db_session, ChatSession, ChatMessage, async_session
+from app.core.history import (
+    begin_turn, save_turn, decode_cursor, list_sessions_page, list_messages_page, sessions_etag, messages_etag
+)
 from app.core.prompts import prompt_manager
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage
 
 try:
     from langfuse.decorators import langfuse_context, observe
@@ -31,6 +35,10 @@ import subprocess
 import sys
 import os
 from app.rag.retriever import retriever 
+from app.rag.ingest_jobs import ingest_jobs, TextSource, FileSource
+from app.rag.answer_cache import answer_cache
+from app.agents.pipeline import node_latency
+from app.agents.summarizer import session_summarizer
 
 settings = get_settings()
 
@@ -39,8 +47,20 @@ async def lifespan(app: FastAPI):
     print(f"Starting {settings.PROJECT_NAME}...")
     from app.core.database import init_db
     await init_db()
+    from app.rag.keyword_index import keyword_index
+    keyword_index.load_all()
+    if settings.CHUNK_TOKENIZER_PRELOAD:
+        # Loading may download from the HuggingFace hub; keep it off the event loop
+        from app.rag.chunking import get_token_counter
+        counter = await asyncio.to_thread(get_token_counter, settings.CHUNK_TOKENIZER)
+        print(f"Token chunking backend: {counter.backend}")
+    ingest_jobs.start()
     yield
     print("Shutting down...")
+    await ingest_jobs.stop()
+    await session_summarizer.stop()
+    keyword_index.close()
+    await retriever.aclient.close()
 
 app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
@@ -51,7 +71,12 @@ class ChatRequest(BaseModel):
     prompt_map: dict[str, str] = {}
     collection_name: str = "knowledge_base"
     top_k: int = 3
-    use_reranker: bool = False
+    use_reranker: bool = False          # Legacy: LLM rerank (same as rerank_mode="llm")
+    rerank_mode: Optional[str] = None   # none | vector | mmr | llm; None = settings.RERANK_MODE
+    pipeline_mode: Optional[str] = None # full | adaptive; None = settings.PIPELINE_MODE
+    lazy_hydration: Optional[bool] = None  # None = settings.RETRIEVAL_LAZY_HYDRATION
+    speculative_retrieval: Optional[bool] = None  # None = settings.SPECULATIVE_RETRIEVAL
+    skip_expansion_score: Optional[float] = None  # None = settings.SKIP_EXPANSION_SCORE
     search_type: str = "vector"
     score_threshold: float = 0.0
     graph_mode: Optional[str] = "hybrid"
@@ -64,11 +89,16 @@ class IngestRequest(BaseModel):
     chunk_size: int = 1000
     chunk_overlap: int = 100
     preset: str = "general"
+    length_unit: str = "chars" # chars or tokens (sizes measured with the embedding tokenizer)
+    storage_profile: Optional[str] = None # default | scalar | binary | low_memory (new collections only)
 
 class ChatResponse(BaseModel):
     response: str
     trace_id: str | None = None
     session_id: str
+    cached: bool = False
+    retrieved_docs: List[dict] = []
+    pipeline: Optional[dict] = None  # Skipped nodes and estimated latency saved (adaptive mode)
 
 class FeedbackRequest(BaseModel):
     trace_id: str
@@ -90,6 +120,49 @@ async def feedback_endpoint(request: FeedbackRequest):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+async def answer_cache_lookup(request: ChatRequest, first_turn: bool):
+    """
+    (scope, query vector, cached answer) for a cacheable request, else (None, None, None).
+    Only first turns are cached: follow-up questions depend on the conversation.
+    """
+    if not settings.ANSWER_CACHE_ENABLED or not first_turn:
+        return None, None, None
+    try:
+        vector = await retriever.aembed_query(request.message)
+    except Exception as e:
+        print(f"Answer cache bypassed (embedding failed): {e}")
+        return None, None, None
+    scope = answer_cache.make_scope(request.collection_name, request.model_dump(exclude={"message", "session_id"}))
+    return scope, vector, answer_cache.lookup(scope, vector)
+
+def answer_cache_metadata(scope: Optional[str], cached) -> dict:
+    """Langfuse trace metadata for the answer cache outcome."""
+    return {
+        "answer_cache": "hit" if cached else ("miss" if scope else "bypass"),
+        "answer_cache_hit_rate": answer_cache.stats()["hit_rate"],
+    }
+
+# Canned answers of the chat graphs (app/agents/simple_agent.py): never cached
+FALLBACK_MODELS = {"error-fallback", "self-rag-fallback"}
+
+def is_grounded_answer(message, context: str, retrieved_docs: List[Dict], answers: int = 1) -> bool:
+    """
+    Whether a turn's answer may be stored in the answer cache: a model answer generated
+    from knowledge-base documents in a single pass. Error and no-documents fallbacks,
+    answers from web search results and turns where the graph looped (the advanced
+    graph's critic sent `answers` > 1 drafts back to the executor) are not.
+    `context` is the graph's final "context".
+    """
+    if message is None or not message.content or answers != 1:
+        return False
+    if (getattr(message, "response_metadata", None) or {}).get("model") in FALLBACK_MODELS:
+        return False
+    context = context or ""
+    if context.startswith("[Web Search Results]") or context.startswith("Error:"):
+        return False
+    # The simple graph reports its documents; the advanced one only its formatted context
+    return bool(retrieved_docs) or bool(context.strip())
+
 @app.post("/chat", response_model=ChatResponse)
 @observe(name="api_chat")
 async def chat_endpoint(request: ChatRequest):
@@ -110,101 +183,115 @@ async def chat_endpoint(request: ChatRequest):
         except Exception as e:
             print(f"Langfuse context error: {e}")
 
-    async with async_session() as db:
-
-        # 1. Ensure Session exists in DB
-        result = await db.execute(select(ChatSession).filter(ChatSession.id == session_id))
-        session = result.scalar_one_or_none()
-        if not session:
-            session = ChatSession(id=session_id)
-            db.add(session)
-            await db.commit()
-
-        # 2. Dynamic Routing (Auto-Intent)
-        task_mode = request.task_type
-        if task_mode == "auto":
-            task_mode = await classify_intent(request.message)
-        
-        # Load History
-        history_result = await db.execute(
-            select(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(ChatMessage.created_at.asc())
-        )
-        history_msgs = history_result.scalars().all()
-        lc_history = []
-        for m in history_msgs:
-            if m.role == "user":
-                lc_history.append(HumanMessage(content=m.content))
-            else:
-                lc_history.append(AIMessage(content=m.content))
-                
-        # Include latest message
-        lc_history.append(HumanMessage(content=request.message))
-        
-        # 3. Choose Graph
-        inputs = {
-            "messages": lc_history,
-            "summary": session.summary or "",
-            "collection_name": request.collection_name,
-            "retrieval_config": {
-                "top_k": request.top_k,
-                "use_reranker": request.use_reranker,
-                "search_type": request.search_type,
-                "graph_mode": request.graph_mode,
-                "score_threshold": request.score_threshold,
-                "metadata_filter": request.filters
-            },
-            "metadata": {"session_id": session_id}
-        }
-        
-        if task_mode == "complex":
-            graph = advanced_graph
-            inputs.update({
-                "plan": "",
-                "context": "",
-                "critique_score": 0.0,
-                "critique_feedback": "",
-                "retry_count": 0,
-                "prompt_map": request.prompt_map,
-            })
-        else:
-            graph = agent_graph
-            inputs.update({
-                "prompt_map": request.prompt_map,
-            })
-
-        # 4. Invoke Graph
-        config = {
-            "configurable": {"session_id": session_id},
-            "metadata": {
-                "langfuse_session_id": session_id
-            }
-        }
-        
-        final_response = await graph.ainvoke(inputs, config=config)
-        final_message = final_response["messages"][-1].content
-        final_summary = final_response.get("summary", session.summary)
-
-        # 5. Persist messages and summary
-        if final_summary != session.summary:
-            session.summary = final_summary
-            
-        user_msg = ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role="user", content=request.message)
-        ai_msg = ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role="assistant", content=final_message)
-        db.add_all([user_msg, ai_msg])
-        await db.commit()
-
-        # Update output in Langfuse
+    # 1. Ensure the session exists and load its summary and recent turns within the token
+    # budget (older turns live in the summary). Short unit of work: no DB session is held
+    # while the graph runs.
+    turn = await begin_turn(session_id)
+    history = turn.history
+    lc_history = history.messages + [HumanMessage(content=request.message)]
+    
+    # 2. Semantic answer cache: a near-identical earlier question skips the graph
+    cache_scope, cache_vector, cached = await answer_cache_lookup(request, first_turn=not history.has_history)
+    if langfuse_context:
+        try:
+            langfuse_context.update_current_trace(metadata=answer_cache_metadata(cache_scope, cached))
+        except Exception:
+            pass
+    if cached:
+        await save_turn(session_id, request.message, cached.answer)
+        session_summarizer.schedule(session_id)
         if langfuse_context:
             try:
-                langfuse_context.update_current_trace(output=final_message)
+                langfuse_context.update_current_trace(output=cached.answer)
             except Exception:
                 pass
-
         return ChatResponse(
-            response=final_message,
+            response=cached.answer,
             session_id=session_id,
-            trace_id=langfuse_context.get_current_trace_id() if langfuse_context else None
+            trace_id=langfuse_context.get_current_trace_id() if langfuse_context else None,
+            cached=True,
+            retrieved_docs=cached.retrieved_docs
         )
+    
+    # Dynamic Routing (Auto-Intent)
+    task_mode = request.task_type
+    if task_mode == "auto":
+        task_mode = await classify_intent(request.message)
+    
+    # 3. Choose Graph
+    inputs = {
+        "messages": lc_history,
+        "summary": turn.summary,
+        "collection_name": request.collection_name,
+        "retrieval_config": {
+            "top_k": request.top_k,
+            "use_reranker": request.use_reranker,
+            "rerank_mode": request.rerank_mode,
+            "pipeline_mode": request.pipeline_mode,
+            "lazy_hydration": request.lazy_hydration,
+            "speculative_retrieval": request.speculative_retrieval,
+            "skip_expansion_score": request.skip_expansion_score,
+            "search_type": request.search_type,
+            "graph_mode": request.graph_mode,
+            "score_threshold": request.score_threshold,
+            "metadata_filter": request.filters
+        },
+        "metadata": {"session_id": session_id}
+    }
+    
+    if task_mode == "complex":
+        graph = advanced_graph
+        inputs.update({
+            "plan": "",
+            "context": "",
+            "critique_score": 0.0,
+            "critique_feedback": "",
+            "retry_count": 0,
+            "prompt_map": request.prompt_map,
+        })
+    else:
+        graph = agent_graph
+        inputs.update({
+            "prompt_map": request.prompt_map,
+        })
+
+    # 4. Invoke Graph
+    config = {
+        "configurable": {"session_id": session_id},
+        "metadata": {
+            "langfuse_session_id": session_id
+        }
+    }
+    
+    final_response = await graph.ainvoke(inputs, config=config)
+    final_message = final_response["messages"][-1].content
+    retrieved_docs = final_response.get("retrieved_docs", [])
+    pipeline = final_response.get("pipeline")
+    answers = len(final_response["messages"]) - len(inputs["messages"])
+    if cache_scope and is_grounded_answer(final_response["messages"][-1], final_response.get("context"), retrieved_docs, answers):
+        answer_cache.store(cache_scope, request.collection_name, request.message, cache_vector, final_message, retrieved_docs)
+
+    # 5. Persist messages; the summary is updated in the background
+    await save_turn(session_id, request.message, final_message)
+    session_summarizer.schedule(session_id)
+
+    # Update output in Langfuse
+    if langfuse_context:
+        try:
+            langfuse_context.update_current_trace(
+                output=final_message,
+                metadata={**answer_cache_metadata(cache_scope, None), "pipeline": pipeline}
+            )
+        except Exception:
+            pass
+
+    return ChatResponse(
+        response=final_message,
+        session_id=session_id,
+        trace_id=langfuse_context.get_current_trace_id() if langfuse_context else None,
+        retrieved_docs=retrieved_docs,
+        pipeline=pipeline
+    )
 
 @app.post("/chat/stream")
 @observe(name="api_chat_stream")
@@ -233,101 +320,128 @@ async def chat_stream_endpoint(request: ChatRequest):
     trace_id = langfuse_context.get_current_trace_id() if langfuse_context else None
 
     async def event_generator():
-        async with async_session() as db:
-            # 1. Ensure Session exists in DB
-            result = await db.execute(select(ChatSession).filter(ChatSession.id == session_id))
-            session = result.scalar_one_or_none()
-            if not session:
-                session = ChatSession(id=session_id)
-                db.add(session)
-                await db.commit()
-                
-            # 2. Load History
-            history_result = await db.execute(
-                select(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(ChatMessage.created_at.asc())
-            )
-            history_msgs = history_result.scalars().all()
-            lc_history = []
-            for m in history_msgs:
-                if m.role == "user":
-                    lc_history.append(HumanMessage(content=m.content))
-                else:
-                    lc_history.append(AIMessage(content=m.content))
-            
-            lc_history.append(HumanMessage(content=request.message))
+        # 1-2. Ensure the session exists, load summary + bounded history window.
+        # Short unit of work: the connection is released before streaming starts.
+        turn = await begin_turn(session_id)
+        history = turn.history
+        lc_history = history.messages + [HumanMessage(content=request.message)]
     
-            # 3. Setup Graph Inputs
-            task_mode = request.task_type
-            if task_mode == "auto":
-                task_mode = await classify_intent(request.message)
-            
-            graph = advanced_graph if task_mode == "complex" else agent_graph
-            inputs = {
-                "messages": lc_history,
-                "summary": session.summary or "",
-                "collection_name": request.collection_name,
-                "retrieval_config": {
-                    "top_k": request.top_k,
-                    "use_reranker": request.use_reranker,
-                    "search_type": request.search_type,
-                    "graph_mode": request.graph_mode,
-                    "score_threshold": request.score_threshold,
-                    "metadata_filter": request.filters
-                },
-                "metadata": {"session_id": session_id}
+        # Semantic answer cache: replay a near-identical earlier answer as SSE events
+        cache_scope, cache_vector, cached = await answer_cache_lookup(request, first_turn=not history.has_history)
+        if trace_id:
+            try:
+                prompt_manager.langfuse.trace(id=trace_id).update(metadata=answer_cache_metadata(cache_scope, cached))
+            except Exception:
+                pass
+        if cached:
+            yield f"data: {json.dumps({'event': 'metadata', 'session_id': session_id, 'trace_id': trace_id, 'cached': True})}\n\n"
+            yield f"data: {json.dumps({'event': 'node', 'name': 'answer_cache'})}\n\n"
+            for start in range(0, len(cached.answer), 64):
+                yield f"data: {json.dumps({'event': 'chunk', 'text': cached.answer[start:start + 64]})}\n\n"
+            await save_turn(session_id, request.message, cached.answer)
+            session_summarizer.schedule(session_id)
+            if trace_id:
+                try:
+                    prompt_manager.langfuse.trace(id=trace_id).update(output=cached.answer)
+                except Exception:
+                    pass
+            yield f"data: {json.dumps({'event': 'done', 'response': cached.answer, 'retrieved_docs': cached.retrieved_docs, 'summary': turn.summary, 'cached': True})}\n\n"
+            return
+    
+        # 3. Setup Graph Inputs
+        task_mode = request.task_type
+        if task_mode == "auto":
+            task_mode = await classify_intent(request.message)
+        
+        graph = advanced_graph if task_mode == "complex" else agent_graph
+        inputs = {
+            "messages": lc_history,
+            "summary": turn.summary,
+            "collection_name": request.collection_name,
+            "retrieval_config": {
+                "top_k": request.top_k,
+                "use_reranker": request.use_reranker,
+                "rerank_mode": request.rerank_mode,
+                "pipeline_mode": request.pipeline_mode,
+                "lazy_hydration": request.lazy_hydration,
+                "speculative_retrieval": request.speculative_retrieval,
+                "skip_expansion_score": request.skip_expansion_score,
+                "search_type": request.search_type,
+                "graph_mode": request.graph_mode,
+                "score_threshold": request.score_threshold,
+                "metadata_filter": request.filters
+            },
+            "metadata": {"session_id": session_id}
+        }
+        
+        # Initial Metadata
+        yield f"data: {json.dumps({'event': 'metadata', 'session_id': session_id, 'trace_id': trace_id})}\n\n"
+        
+        full_response = ""
+        retrieved_docs = []
+        pipeline = None
+        context = ""
+        final_message = None  # Last message returned by an answering node
+        answers = 0  # Answering node runs (the advanced graph re-runs executor on a critic retry)
+        
+        # 2. Iterate graph events
+        config = {
+            "configurable": {"session_id": session_id},
+            "metadata": {
+                "langfuse_session_id": session_id
             }
+        }
+
+        async for event in graph.astream_events(inputs, config=config, version="v2"):
+            kind = event["event"]
+            node = event["metadata"].get("langgraph_node", "")
             
-            # Initial Metadata
-            yield f"data: {json.dumps({'event': 'metadata', 'session_id': session_id, 'trace_id': trace_id})}\n\n"
+            if kind == "on_chat_model_stream" and node in ["generate", "executor"]:
+                content = event["data"]["chunk"].content
+                if content:
+                    full_response += content
+                    yield f"data: {json.dumps({'event': 'chunk', 'text': content})}\n\n"
             
-            full_response = ""
-            retrieved_docs = []
-            final_summary = session.summary or ""
+            elif kind == "on_chain_start" and node:
+                yield f"data: {json.dumps({'event': 'node', 'name': node})}\n\n"
             
-            # 2. Iterate graph events
-            config = {
-                "configurable": {"session_id": session_id},
-                "metadata": {
-                    "langfuse_session_id": session_id
-                }
-            }
-
-            async for event in graph.astream_events(inputs, config=config, version="v2"):
-                kind = event["event"]
-                node = event["metadata"].get("langgraph_node", "")
-                
-                if kind == "on_chat_model_stream" and node in ["generate", "executor"]:
-                    content = event["data"]["chunk"].content
-                    if content:
-                        full_response += content
-                        yield f"data: {json.dumps({'event': 'chunk', 'text': content})}\n\n"
-                
-                elif kind == "on_chain_start" and node:
-                    yield f"data: {json.dumps({'event': 'node', 'name': node})}\n\n"
-                
-                elif kind == "on_chain_end" and node == "retrieve":
-                    retrieved_docs = event["data"]["output"].get("retrieved_docs", [])
-                
-                elif kind == "on_chain_end" and node == "summarize":
-                    final_summary = event["data"]["output"].get("summary", "")
-    
-            # 3. Finalize & Persist
-            if final_summary != session.summary:
-                session.summary = final_summary
-                
-            user_msg = ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role="user", content=request.message)
-            ai_msg = ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role="assistant", content=full_response)
-            db.add_all([user_msg, ai_msg])
-            await db.commit()
+            elif kind == "on_chain_end" and node == "retrieve":
+                retrieved_docs = event["data"]["output"].get("retrieved_docs", [])
+                pipeline = event["data"]["output"].get("pipeline", pipeline)
+                context = event["data"]["output"].get("context", context)
             
-            # Update Langfuse output via client (context might be lost in generator)
-            if trace_id:
-                try:
-                    prompt_manager.langfuse.trace(id=trace_id).update(output=full_response)
-                except Exception:
-                    pass
+            elif kind == "on_chain_end" and node in ["web_search", "generate", "executor", "missing_info"]:
+                output = event["data"].get("output")
+                if isinstance(output, dict):
+                    context = output.get("context", context)
+                    if output.get("messages"):
+                        final_message = output["messages"][-1]
+                        answers += 1
+            
+            elif kind == "on_chain_end" and node in ["rewrite_query", "grade_docs"]:
+                output = event["data"].get("output")
+                if isinstance(output, dict) and output.get("pipeline"):
+                    pipeline = output["pipeline"]
+    
+        # 3. Finalize & Persist
+        # full_response holds every streamed draft; the answer is the last answering node's
+        answer = final_message.content if final_message is not None and final_message.content else full_response
+        if cache_scope and is_grounded_answer(final_message, context, retrieved_docs, answers):
+            answer_cache.store(cache_scope, request.collection_name, request.message, cache_vector, answer, retrieved_docs)
+        await save_turn(session_id, request.message, answer)
+        session_summarizer.schedule(session_id)
+        
+        # Update Langfuse output via client (context might be lost in generator)
+        if trace_id:
+            try:
+                prompt_manager.langfuse.trace(id=trace_id).update(
+                    output=answer,
+                    metadata={**answer_cache_metadata(cache_scope, None), "pipeline": pipeline}
+                )
+            except Exception:
+                pass
 
-            yield f"data: {json.dumps({'event': 'done', 'response': full_response, 'retrieved_docs': retrieved_docs, 'summary': final_summary})}\n\n"
+        yield f"data: {json.dumps({'event': 'done', 'response': answer, 'retrieved_docs': retrieved_docs, 'summary': turn.summary, 'pipeline': pipeline})}\n\n"
 
     from fastapi.responses import StreamingResponse
     return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -352,35 +466,216 @@ async def run_evaluation_endpoint(background_tasks: BackgroundTasks):
 
 @app.get("/rag/collections")
 async def list_collections_endpoint():
-    return {"collections": retriever.list_collections()}
-
+    return {"collections": await retriever.alist_collections()}
+
+
+def ingest_result(filename: str, stats: Dict) -> Dict:
+    """Response of the synchronous ingest endpoints ("partial"/"failed" when chunks failed to embed)."""
+    status = stats.get("status", "completed")
+    counts = f"{stats['new']} new, {stats['unchanged']} unchanged, {stats['removed']} removed"
+    if status == "completed":
+        message = f"Ingestion of '{filename}' completed successfully: {counts} chunks."
+    else:
+        message = (
+            f"Ingestion of '{filename}' {status}: {counts}, {stats['failed']} failed chunks. "
+            f"The previous chunks were kept; re-ingest to complete the update."
+        )
+    return {"status": status, "message": message, "stats": stats}
+
+def submit_text_job(request: IngestRequest, graph_index: bool):
+    return ingest_jobs.submit(
+        TextSource(request.text),
+        request.collection_name,
+        request.filename,
+        options={
+            "chunk_size": request.chunk_size,
+            "chunk_overlap": request.chunk_overlap,
+            "preset": request.preset,
+            "length_unit": request.length_unit,
+            "storage_profile": request.storage_profile,
+        },
+        graph_index=graph_index
+    )
 
 @app.post("/rag/ingest")
-async def ingest_endpoint(request: IngestRequest):
+async def ingest_endpoint(request: IngestRequest, wait: bool = False, graph_index: bool = True):
+    """
+    Queues the document as a background ingestion job (same as POST /rag/jobs), so
+    chunking, embedding and LightRAG extraction never run on the request path.
+    With wait=true the response is sent once the job has finished, with its stats.
+    """
     try:
-        # Directly await ingestion (it's already optimized internally)
-        await retriever.ingest_documents(
-            request.text, 
-            request.collection_name, 
-            request.filename,
-            chunk_size=request.chunk_size,
-            chunk_overlap=request.chunk_overlap,
-            preset=request.preset
-        )
+        job = submit_text_job(request, graph_index)
+        if not wait:
+            return {
+                "status": "queued",
+                "job_id": job.id,
+                "message": f"Ingestion of '{request.filename}' queued. Poll GET /rag/jobs/{job.id} for progress."
+            }
+        await ingest_jobs.wait(job)
+        if job.status in ("failed", "cancelled"):
+            return {"status": "error", "job_id": job.id, "message": f"Ingestion {job.status}: {job.error}"}
+        return {**ingest_result(request.filename, job.stats), "job_id": job.id, "graph_status": job.graph_status}
+    except Exception as e:
         return {
-            "status": "completed", 
-            "message": f"Ingestion of '{request.filename}' completed successfully."
+            "status": "error",
+            "message": f"Ingestion failed: {str(e)}"
         }
+
+async def spool_request_body(request: Request, suffix: str) -> str:
+    """
+    Writes the request body to a temp file and returns its path. Disk writes run in a
+    worker thread, buffered to ~1 MB, so the event loop never blocks on file I/O.
+    """
+    import tempfile
+    tmp = await asyncio.to_thread(tempfile.NamedTemporaryFile, delete=False, suffix=suffix)
+    try:
+        buffer = bytearray()
+        async for data in request.stream():
+            buffer += data
+            if len(buffer) >= 1 << 20:
+                await asyncio.to_thread(tmp.write, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await asyncio.to_thread(tmp.write, bytes(buffer))
+        await asyncio.to_thread(tmp.close)
+    except BaseException:
+        await asyncio.to_thread(tmp.close)
+        await asyncio.to_thread(os.remove, tmp.name)
+        raise
+    return tmp.name
+
+@app.post("/rag/ingest/stream")
+async def ingest_stream_endpoint(
+    request: Request,
+    collection_name: str = "knowledge_base",
+    filename: str = "stream_ingest",
+    chunk_size: int = 1000,
+    chunk_overlap: int = 100,
+    preset: str = "general",
+    graph_index: bool = False,
+    length_unit: str = "chars",
+    storage_profile: Optional[str] = None,
+):
+    """
+    Streaming ingestion: the raw file is sent as the request body (no JSON wrapping).
+    Text bodies are decoded incrementally; PDFs are spooled to disk and converted page by page.
+    """
+    from app.rag.loaders import decode_byte_stream, aiter_pdf_markdown
+    tmp_path = None
+    try:
+        if filename.lower().endswith(".pdf"):
+            # PDF parsing needs random access: spool the body to disk, never to memory
+            tmp_path = await spool_request_body(request, ".pdf")
+
+            text_pieces = aiter_pdf_markdown(tmp_path)
+        else:
+            text_pieces = decode_byte_stream(request.stream())
+
+        stats = await retriever.ingest_stream(
+            text_pieces,
+            collection_name,
+            filename,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            preset=preset,
+            graph_index=graph_index,
+            length_unit=length_unit,
+            storage_profile=storage_profile
+        )
+        return ingest_result(filename, stats)
     except Exception as e:
         return {
             "status": "error",
             "message": f"Ingestion failed: {str(e)}"
         }
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+@app.post("/rag/jobs")
+async def submit_ingest_job_endpoint(request: IngestRequest, graph_index: bool = True):
+    """
+    Queues an ingestion job and returns immediately. Poll GET /rag/jobs/{job_id} for progress.
+    """
+    try:
+        job = submit_text_job(request, graph_index)
+        return {"status": "queued", "job_id": job.id}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.post("/rag/jobs/upload")
+async def submit_upload_job_endpoint(
+    request: Request,
+    collection_name: str = "knowledge_base",
+    filename: str = "upload",
+    chunk_size: int = 1000,
+    chunk_overlap: int = 100,
+    preset: str = "general",
+    length_unit: str = "chars",
+    graph_index: bool = True,
+    storage_profile: Optional[str] = None,
+):
+    """
+    Same as /rag/ingest/stream, but the body is spooled to disk and processed by a background job.
+    """
+    is_pdf = filename.lower().endswith(".pdf")
+    tmp_path = await spool_request_body(request, ".pdf" if is_pdf else ".txt")
+    try:
+        job = ingest_jobs.submit(
+            FileSource(tmp_path, is_pdf=is_pdf),
+            collection_name,
+            filename,
+            options={
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "preset": preset,
+                "length_unit": length_unit,
+                "storage_profile": storage_profile,
+            },
+            graph_index=graph_index
+        )
+        return {"status": "queued", "job_id": job.id}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/rag/jobs")
+async def list_ingest_jobs_endpoint():
+    return [job.to_dict() for job in ingest_jobs.list_jobs()]
+
+@app.get("/rag/jobs/{job_id}")
+async def get_ingest_job_endpoint(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/rag/jobs/{job_id}")
+async def cancel_ingest_job_endpoint(job_id: str):
+    if ingest_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    cancelled = ingest_jobs.cancel(job_id)
+    return {"status": "cancelling" if cancelled else "finished", "job": ingest_jobs.get(job_id).to_dict()}
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+def parse_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.get("/chat/sessions")
 async def list_sessions_endpoint():
     """
     Lists all chat sessions with their summaries and creation times.
+    Legacy unpaginated list; use the paginated {API_V1_STR}/chat/sessions instead.
     """
     async with async_session() as db:
         result = await db.execute(select(ChatSession).order_by(ChatSession.created_at.desc()))
@@ -397,6 +692,7 @@ async def list_sessions_endpoint():
 async def get_session_messages_endpoint(session_id: str):
     """
     Retrieves all messages for a specific session.
+    Legacy unpaginated list; use {API_V1_STR}/chat/sessions/{session_id}/messages instead.
     """
     async with async_session() as db:
         result = await db.execute(
@@ -411,6 +707,80 @@ async def get_session_messages_endpoint(session_id: str):
             } for m in messages
         ]
 
+@app.get(f"{settings.API_V1_STR}/chat/sessions")
+async def list_sessions_page_endpoint(request: Request, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    """
+    Lists chat sessions, newest first, one keyset page at a time: pass next_cursor back
+    as cursor. Responds 304 when If-None-Match carries the current ETag.
+    """
+    after = parse_cursor(cursor)
+    async with async_session() as db:
+        etag = await sessions_etag(db, limit, cursor)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        sessions, next_cursor = await list_sessions_page(db, limit, after)
+    return JSONResponse(
+        {
+            "sessions": [
+                {
+                    "id": s.id,
+                    "summary": s.summary or "New Conversation",
+                    "created_at": s.created_at.isoformat() if s.created_at else None,
+                    "updated_at": s.updated_at.isoformat() if s.updated_at else None
+                } for s in sessions
+            ],
+            "next_cursor": next_cursor
+        },
+        headers={"ETag": etag}
+    )
+
+@app.get(f"{settings.API_V1_STR}/chat/sessions/{{session_id}}/messages")
+async def get_session_messages_page_endpoint(session_id: str, request: Request, limit: int = Query(100, ge=1, le=500), cursor: Optional[str] = None):
+    """
+    Retrieves a session's messages, oldest first, one keyset page at a time.
+    Responds 304 when If-None-Match carries the current ETag.
+    """
+    after = parse_cursor(cursor)
+    async with async_session() as db:
+        etag = await messages_etag(db, session_id, limit, cursor)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        messages, next_cursor = await list_messages_page(db, session_id, limit, after)
+    return JSONResponse(
+        {
+            "messages": [
+                {
+                    "role": m.role,
+                    "content": m.content,
+                    "created_at": m.created_at.isoformat() if m.created_at else None
+                } for m in messages
+            ],
+            "next_cursor": next_cursor
+        },
+        headers={"ETag": etag}
+    )
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Cache and pipeline counters for sizing and tuning.
+    """
+    from app.rag.embedding_cache import embedding_cache
+    from app.rag.collection_registry import collection_registry
+    from app.rag.keyword_index import keyword_index
+    from app.rag.retrieval_cache import retrieval_cache
+    from app.rag import qdrant_transport
+    return {
+        "qdrant_transport": qdrant_transport.describe(),
+        "embedding_cache": embedding_cache.stats(),
+        "collection_registry": collection_registry.stats(),
+        "keyword_index": keyword_index.stats(),
+        "retrieval_cache": retrieval_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "pipeline_nodes": node_latency.stats(),
+        "summarizer": session_summarizer.stats()
+    }
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "version": "0.1.0"}
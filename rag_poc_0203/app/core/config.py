@@ -13,8 +13,20 @@ class Settings(BaseSettings):
     # Qdrant Configuration
     QDRANT_URL: str = os.getenv("QDRANT_URL", "http://localhost:6333")
     QDRANT_API_KEY: Optional[str] = os.getenv("QDRANT_API_KEY", "difyai123456")
+    QDRANT_PREFER_GRPC: bool = False    # gRPC (port QDRANT_GRPC_PORT) instead of REST/JSON
+    QDRANT_GRPC_PORT: int = 6334
+    QDRANT_POOL_SIZE: int = 32          # Max REST connections per client
+    QDRANT_KEEPALIVE_CONNECTIONS: int = 16
+    QDRANT_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle REST connection is kept
+    QDRANT_GRPC_KEEPALIVE_MS: int = 30000  # gRPC keep-alive ping interval
+    QDRANT_TIMEOUT: int = 10            # Default per-call timeout (seconds)
+    QDRANT_SEARCH_TIMEOUT: int = 5      # Per-call timeout for search requests (seconds)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "qdrant")  # qdrant | local (embedded NumPy store)
+    LOCAL_VECTOR_DIR: str = "./data/local_vectors"
+    LOCAL_VECTOR_DTYPE: str = "float16"  # float16 | float32 (local backend vector storage)
     LANGFUSE_HOST: str = "http://localhost:3000"
     DATABASE_URL: str = "sqlite+aiosqlite:///./chat.db"
+    SQLITE_WAL: bool = True             # journal_mode=WAL for SQLite databases
     
     # OpenAI
     OPENAI_API_KEY: str | None = None
@@ -28,6 +40,82 @@ class Settings(BaseSettings):
     EMBEDDING_BINDING: str = "ollama"
     EMBEDDING_MODEL: str = "bge-m3:latest"
     EMBEDDING_BINDING_HOST: str = "http://localhost:11434"
+    EMBEDDING_DIM: int = 1024
+    EMBEDDING_CACHE_SIZE: int = 4096    # In-memory LRU entries for query embeddings
+    EMBEDDING_CACHE_PATH: Optional[str] = None  # e.g. ./data/embedding_cache.sqlite to persist across restarts
+
+    # Chat History (/chat, /chat/stream)
+    HISTORY_MAX_TURNS: int = 5          # Recent user/assistant turns passed to the graph
+    HISTORY_TOKEN_BUDGET: int = 2000    # Token cap (estimated) for those turns; older ones are left to the summary
+    SUMMARY_MIN_MESSAGES: int = 4       # Unsummarized messages outside the window before a summary pass
+    SUMMARY_MAX_MESSAGES: int = 20      # Messages folded into the summary per pass
+    SUMMARY_DEBOUNCE: float = 2.0       # Seconds a background summary waits to absorb follow-up turns
+    SUMMARY_MAX_CONCURRENCY: int = 2    # Sessions summarized at once
+
+    # Semantic Answer Cache (/chat, /chat/stream)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIZE: int = 1000       # LRU entries
+    ANSWER_CACHE_TTL: float = 3600.0    # Seconds a cached answer stays valid
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # Min cosine similarity between questions for a hit
+
+    # Retrieval Result Cache (QdrantRetriever.retrieve / retrieve_many)
+    RETRIEVAL_CACHE_SIZE: int = 2048    # LRU entries
+    RETRIEVAL_CACHE_TTL: float = 600.0  # Seconds; bounds staleness from writes by other processes
+
+    # Ingestion Pipeline
+    EMBED_BATCH_SIZE: int = 32          # Initial chunks per embed_documents call
+    EMBED_MIN_BATCH_SIZE: int = 4
+    EMBED_MAX_BATCH_SIZE: int = 128
+    EMBED_TARGET_BATCH_LATENCY: float = 2.0  # Seconds; batch size adapts around this
+    EMBED_MAX_CONCURRENCY: int = 4      # In-flight embedding batches
+    UPSERT_PAGE_SIZE: int = 256         # Points per Qdrant upsert request
+    INGEST_STREAM_WINDOW_CHARS: int = 65536  # Text window chunked at a time by streaming ingest
+    CHUNK_TOKENIZER: str = "BAAI/bge-m3"  # Tokenizer for length_unit="tokens" chunking
+    CHUNK_TOKENIZER_PRELOAD: bool = True  # Load it at startup (may download) instead of on first ingest
+    EMBEDDING_MAX_TOKENS: int = 8192     # Embedder input limit; longer chunks are truncated
+
+    # Background Ingestion Jobs
+    INGEST_MAX_CONCURRENT_JOBS: int = 2  # Vector-stage workers (chunk/embed/upsert)
+    GRAPH_MAX_CONCURRENT_JOBS: int = 1   # Graph-stage workers (LightRAG extraction)
+    INGEST_MAX_QUEUED_JOBS: int = 32
+    INGEST_JOB_HISTORY: int = 200        # Finished jobs kept for status queries
+
+    # Collection Metadata Cache
+    COLLECTION_CACHE_TTL: float = 300.0          # Seconds collection info is reused by retrieval
+    COLLECTION_CACHE_NEGATIVE_TTL: float = 5.0   # Seconds a "collection not found" answer is reused
+
+    # Retrieval
+    RRF_K: int = 60                     # Reciprocal Rank Fusion constant for multi-query fusion
+    RETRIEVAL_LAZY_HYDRATION: bool = False  # Search returns (id, score); content fetched for the final top_k only (no LLM rerank)
+    PIPELINE_MODE: str = "full"         # full | adaptive (skip expansion/rerank/grading when retrieval is clearly good)
+    ADAPTIVE_MIN_TOP_SCORE: float = 0.7  # Adaptive: min top vector score to trust retrieval
+    ADAPTIVE_MIN_SCORE_GAP: float = 0.1  # ... and either this gap to the runner-up
+    ADAPTIVE_MIN_KEYWORD_OVERLAP: float = 0.6  # ... or this share of query words in the top docs
+    SPECULATIVE_RETRIEVAL: bool = False  # Retrieve the original query while query expansion runs
+    SKIP_EXPANSION_SCORE: Optional[float] = None  # e.g. 0.8: skip variations if the original's top vector score reaches it
+    RERANK_MODE: str = "mmr"            # none | vector | mmr | llm (default when a request sets none)
+    ADVANCED_RERANK_MODE: str = "none"  # Same default for the advanced (complex) graph; "mmr" etc. to opt in
+    MMR_LAMBDA: float = 0.7             # 1.0 = pure query similarity, lower = more diverse context
+    LLM_RERANK_MAX_DOCS: int = 10       # Candidates sent to the LLM reranker (vector-preranked)
+    LLM_RERANK_MAX_CHARS: int = 500     # Characters of each candidate sent to the LLM reranker
+    LLM_RERANK_TIMEOUT: float = 5.0     # Seconds before falling back to retrieval order
+    DENSE_VECTOR_NAME: str = "dense"    # Named vectors of newly created collections
+    SPARSE_VECTOR_NAME: str = "bm25"
+    HYBRID_FUSION: str = "rrf"          # Server-side hybrid fusion: "rrf" or "dbsf"
+    HYBRID_PREFETCH_FACTOR: int = 4     # Each hybrid branch prefetches limit * factor candidates
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    BM25_AVG_DOC_LEN: float = 200.0     # Average chunk length in words, for BM25 length normalization
+    KEYWORD_INDEX_DIR: str = "./data/keyword_index"  # Local BM25 inverted index for search_type="keyword"
+    KEYWORD_INDEX_COMPACT_THRESHOLD: int = 2000  # Added/removed docs before the delta is merged into the base segment
+    KEYWORD_FILTER_OVERFETCH: int = 5   # Keyword candidates per result when a metadata filter is applied
+
+    # Vector Storage (see app/rag/storage_profiles.py)
+    COLLECTION_STORAGE_PROFILE: str = "default"  # default | scalar | binary | low_memory (new collections)
+    QUANTIZATION_RESCORE: bool = True   # Re-rank quantized candidates with the original vectors
+    QUANTIZATION_OVERSAMPLING: float = 2.0  # Candidates fetched per result for scalar quantization
+    BINARY_OVERSAMPLING: float = 3.0
+    HNSW_EF_SEARCH: Optional[int] = None  # None = Qdrant default
 
     # Internal Service URLs (for UI and inter-service comms)
     BASE_URL: str = "http://127.0.0.1:8000"
@@ -40,6 +128,10 @@ class Settings(BaseSettings):
     @property
     def INGEST_API_URL(self) -> str: return f"{self.BASE_URL}/rag/ingest"
     @property
+    def INGEST_STREAM_API_URL(self) -> str: return f"{self.BASE_URL}/rag/ingest/stream"
+    @property
+    def INGEST_JOBS_API_URL(self) -> str: return f"{self.BASE_URL}/rag/jobs"
+    @property
     def FEEDBACK_API_URL(self) -> str: return f"{self.BASE_URL}/chat/feedback"
 
     class Config:
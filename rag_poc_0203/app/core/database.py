@@ -1,6 +1,6 @@
 import datetime
 from typing import List, Optional
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, create_engine
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index, create_engine, event, inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from app.core.config import get_settings
@@ -14,8 +14,16 @@ class ChatSession(Base):
     id = Column(String, primary_key=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     summary = Column(Text, nullable=True)
+    summarized_until = Column(DateTime, nullable=True) # created_at of the last message folded into summary
+    summarized_until_id = Column(String, nullable=True) # and its id: the watermark is a (created_at, id) keyset position
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow) # Last new message or summary change (ETags)
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_chat_sessions_created_at_id", "created_at", "id"), # Keyset pagination of the session list
+        Index("ix_chat_sessions_updated_at", "updated_at"),
+    )
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
     
@@ -27,13 +35,74 @@ class ChatMessage(Base):
     
     session = relationship("ChatSession", back_populates="messages")
 
+    __table_args__ = (
+        # History windows and keyset pagination within a session
+        Index("ix_chat_messages_session_created_at_id", "session_id", "created_at", "id"),
+    )
+
 # Async Engine Setup
 engine = create_async_engine(settings.DATABASE_URL)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+if engine.dialect.name == "sqlite" and settings.SQLITE_WAL:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL: readers (session list polls, history loads) do not block the turn writes
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+# Columns added after the first release: (table, column, DDL type, backfill statement or None).
+# create_all only creates missing tables, so existing databases are altered in place.
+COLUMN_MIGRATIONS = [
+    (
+        "chat_sessions", "summarized_until", "DATETIME",
+        # Sessions summarized by the old every-turn summarizer cover all their messages
+        "UPDATE chat_sessions SET summarized_until = "
+        "(SELECT MAX(created_at) FROM chat_messages WHERE chat_messages.session_id = chat_sessions.id) "
+        "WHERE summary IS NOT NULL",
+    ),
+    (
+        "chat_sessions", "summarized_until_id", "VARCHAR",
+        # Messages sharing the watermark's created_at were all treated as folded: keep the largest id
+        "UPDATE chat_sessions SET summarized_until_id = "
+        "(SELECT MAX(id) FROM chat_messages WHERE chat_messages.session_id = chat_sessions.id "
+        "AND chat_messages.created_at = chat_sessions.summarized_until) "
+        "WHERE summarized_until IS NOT NULL",
+    ),
+    (
+        "chat_sessions", "updated_at", "DATETIME",
+        "UPDATE chat_sessions SET updated_at = COALESCE("
+        "(SELECT MAX(created_at) FROM chat_messages WHERE chat_messages.session_id = chat_sessions.id), created_at)",
+    ),
+]
+
+def _migrate(conn):
+    """
+    Adds missing columns, then missing indexes (create_all skips both on existing
+    tables), then backfills the new columns with the indexes in place.
+    """
+    inspector = inspect(conn)
+    backfills = []
+    for table, column, ddl_type, backfill in COLUMN_MIGRATIONS:
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        if column in existing:
+            continue
+        print(f"Migrating database: adding {table}.{column}")
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+        if backfill:
+            backfills.append(backfill)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    for backfill in backfills:
+        conn.execute(text(backfill))
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_migrate)
 
 async def get_db_session():
     async with async_session() as session:
@@ -0,0 +1,216 @@
+import base64
+import datetime
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from app.core.config import get_settings
+from app.core.database import ChatSession, ChatMessage, async_session
+from app.rag.chunking import estimate_tokens
+
+settings = get_settings()
+
+# Keyset position of a row: (created_at, id). Pagination cursors and the summary
+# watermark use it, so rows sharing a created_at are ordered (and skipped) exactly once.
+Position = Tuple[datetime.datetime, str]
+
+
+@dataclass
+class HistoryWindow:
+    """
+    What a chat turn loads from a session: the recent messages given to the graph and
+    the older messages not yet folded into the session summary (oldest first).
+    """
+    messages: List[BaseMessage] = field(default_factory=list)
+    pending: List[BaseMessage] = field(default_factory=list)
+    pending_positions: List[Position] = field(default_factory=list)
+    has_history: bool = False
+
+    def watermark(self, folded: int) -> Optional[Position]:
+        """New (summarized_until, summarized_until_id) after the first `folded` pending messages were summarized."""
+        if folded <= 0:
+            return None
+        return self.pending_positions[min(folded, len(self.pending_positions)) - 1]
+
+
+def summary_watermark(session: ChatSession) -> Optional[Position]:
+    if session.summarized_until is None:
+        return None
+    return session.summarized_until, session.summarized_until_id
+
+
+def to_lc_message(message: ChatMessage) -> BaseMessage:
+    if message.role == "user":
+        return HumanMessage(content=message.content)
+    return AIMessage(content=message.content)
+
+
+def fit_token_budget(contents: List[str], budget: int) -> int:
+    """
+    Index of the oldest message such that it and every newer message fit in budget tokens.
+    Tokens are estimated from the byte length: this runs on the event loop inside the
+    turn's DB session, so no tokenizer is loaded or called here.
+    """
+    start = len(contents)
+    total = 0
+    for i in range(len(contents) - 1, -1, -1):
+        total += estimate_tokens(contents[i])
+        if total > budget:
+            break
+        start = i
+    return start
+
+
+async def load_history(db: AsyncSession, session: ChatSession, with_pending: bool = True) -> HistoryWindow:
+    """
+    Two bounded queries, independent of the session length:
+    the last HISTORY_MAX_TURNS turns (trimmed to HISTORY_TOKEN_BUDGET tokens), and up to
+    SUMMARY_MAX_MESSAGES messages older than that window but newer than the summary watermark
+    (skipped with with_pending=False).
+    """
+    result = await db.execute(
+        select(ChatMessage)
+        .filter(ChatMessage.session_id == session.id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(settings.HISTORY_MAX_TURNS * 2)
+    )
+    recent = list(reversed(result.scalars().all()))
+    if not recent:
+        return HistoryWindow()
+
+    start = fit_token_budget([m.content or "" for m in recent], settings.HISTORY_TOKEN_BUDGET)
+    window = recent[start:]
+    if not with_pending:
+        return HistoryWindow(messages=[to_lc_message(m) for m in window], has_history=True)
+
+    position = tuple_(ChatMessage.created_at, ChatMessage.id)
+    query = select(ChatMessage).filter(ChatMessage.session_id == session.id)
+    watermark = summary_watermark(session)
+    if watermark and watermark[1] is None:
+        # Watermark written before ids were recorded: everything at that instant is folded
+        query = query.filter(ChatMessage.created_at > watermark[0])
+    elif watermark:
+        query = query.filter(position > tuple_(*watermark))
+    if window:
+        query = query.filter(position < tuple_(window[0].created_at, window[0].id))
+    result = await db.execute(
+        query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).limit(settings.SUMMARY_MAX_MESSAGES)
+    )
+    pending = result.scalars().all()
+
+    return HistoryWindow(
+        messages=[to_lc_message(m) for m in window],
+        pending=[to_lc_message(m) for m in pending],
+        pending_positions=[(m.created_at, m.id) for m in pending],
+        has_history=True,
+    )
+
+
+@dataclass
+class TurnContext:
+    """Snapshot of a session taken at the start of a chat turn (no open DB session)."""
+    summary: str
+    history: HistoryWindow
+
+
+async def begin_turn(session_id: str) -> TurnContext:
+    """
+    First unit of work of a chat turn: creates the session row if needed and reads the
+    summary and the recent history. The connection is released before the graph runs.
+    """
+    async with async_session() as db:
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            db.add(ChatSession(id=session_id))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Created by a concurrent request for the same session
+                await db.rollback()
+            session = await db.get(ChatSession, session_id)
+        history = await load_history(db, session, with_pending=False)
+        return TurnContext(summary=session.summary or "", history=history)
+
+
+async def save_turn(session_id: str, question: str, answer: str):
+    """Last unit of work of a chat turn: one short transaction for the question and answer."""
+    # Explicit timestamps keep the question ordered before the answer
+    now = datetime.datetime.utcnow()
+    async with async_session() as db:
+        db.add_all([
+            ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role="user", content=question, created_at=now),
+            ChatMessage(
+                id=str(uuid.uuid4()), session_id=session_id, role="assistant", content=answer,
+                created_at=now + datetime.timedelta(microseconds=1)
+            ),
+        ])
+        await db.execute(
+            update(ChatSession).where(ChatSession.id == session_id).values(updated_at=datetime.datetime.utcnow())
+        )
+        await db.commit()
+
+
+# Keyset pagination: a cursor is the Position of the last row of the previous page.
+def encode_cursor(created_at: datetime.datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Position:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), str(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+async def list_sessions_page(db: AsyncSession, limit: int, after: Optional[Position] = None) -> Tuple[List[ChatSession], Optional[str]]:
+    """Sessions newest first (index ix_chat_sessions_created_at_id). Returns the page and the next cursor."""
+    query = select(ChatSession).order_by(ChatSession.created_at.desc(), ChatSession.id.desc())
+    if after:
+        query = query.filter(tuple_(ChatSession.created_at, ChatSession.id) < tuple_(*after))
+    rows = (await db.execute(query.limit(limit + 1))).scalars().all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id)
+
+
+async def list_messages_page(db: AsyncSession, session_id: str, limit: int, after: Optional[Position] = None) -> Tuple[List[ChatMessage], Optional[str]]:
+    """A session's messages oldest first (index ix_chat_messages_session_created_at_id)."""
+    query = (
+        select(ChatMessage)
+        .filter(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+    )
+    if after:
+        query = query.filter(tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(*after))
+    rows = (await db.execute(query.limit(limit + 1))).scalars().all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id)
+
+
+async def sessions_etag(db: AsyncSession, *params) -> str:
+    """
+    Version of the session list: the latest updated_at (one index lookup). New
+    sessions, new messages and summary updates all advance it.
+    """
+    latest = (await db.execute(select(func.max(ChatSession.updated_at)))).scalar()
+    return make_etag("sessions", latest, *params)
+
+
+async def messages_etag(db: AsyncSession, session_id: str, *params) -> str:
+    updated_at = (await db.execute(select(ChatSession.updated_at).filter(ChatSession.id == session_id))).scalar()
+    return make_etag("messages", session_id, updated_at, *params)
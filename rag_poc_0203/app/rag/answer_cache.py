@@ -0,0 +1,142 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import numpy as np
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class CachedAnswer:
+    scope: str
+    collection_name: str
+    query: str
+    vector: np.ndarray  # Unit-normalized query embedding
+    answer: str
+    retrieved_docs: List[Dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    Final answers of the chat graphs keyed by (scope, query embedding).
+
+    The scope hashes everything besides the question that changes the answer (collection
+    and request options: task type, prompt_map, retrieval config). A lookup returns the
+    most similar cached question of the same scope if its cosine similarity is >= threshold
+    and the entry is younger than ttl. Entries are evicted LRU beyond max_entries and dropped per
+    collection when it is re-ingested.
+    """
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._scopes: Dict[str, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_scope(collection_name: str, options: Dict) -> str:
+        raw = json.dumps(
+            {"collection": collection_name, "options": options},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, scope: str, vector: List[float]) -> Optional[CachedAnswer]:
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            ids = self._scopes.get(scope, [])
+            for entry_id in [i for i in ids if now - self._entries[i].created_at > self.ttl]:
+                self._remove(entry_id)
+            ids = self._scopes.get(scope, [])
+            if ids:
+                matrix = np.stack([self._entries[i].vector for i in ids])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = self._entries[ids[best]]
+                    self._entries.move_to_end(ids[best])
+                    entry.hits += 1
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def store(self, scope: str, collection_name: str, query: str, vector: List[float], answer: str, retrieved_docs: List[Dict] = None):
+        if not answer:
+            return
+        entry = CachedAnswer(
+            scope=scope,
+            collection_name=collection_name,
+            query=query,
+            vector=self._normalize(vector),
+            answer=answer,
+            retrieved_docs=list(retrieved_docs or []),
+        )
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._scopes.setdefault(scope, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        ids = self._scopes[entry.scope]
+        ids.remove(entry_id)
+        if not ids:
+            del self._scopes[entry.scope]
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        """Drops the answers grounded on a collection (all answers when None)."""
+        with self._lock:
+            stale = [i for i, e in self._entries.items() if collection_name is None or e.collection_name == collection_name]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.ANSWER_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Singleton instance
+answer_cache = SemanticAnswerCache(
+    max_entries=settings.ANSWER_CACHE_SIZE,
+    ttl=settings.ANSWER_CACHE_TTL,
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+)
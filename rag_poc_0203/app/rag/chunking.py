@@ -0,0 +1,475 @@
+import re
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Chunking presets (sizes in characters)
+CHUNK_PRESETS = {
+    "general": {"size": 1000, "overlap": 100},
+    "legal": {"size": 2000, "overlap": 300},  # Larger chunks for legal context
+    "code": {"size": 800, "overlap": 50},    # Smaller, precise chunks for code
+    "granular": {"size": 500, "overlap": 50}  # Very small chunks for FAQ style
+}
+
+# Same presets measured in embedding-model tokens (length_unit="tokens")
+TOKEN_CHUNK_PRESETS = {
+    "general": {"size": 512, "overlap": 64},
+    "legal": {"size": 1024, "overlap": 160},
+    "code": {"size": 384, "overlap": 32},
+    "granular": {"size": 256, "overlap": 32}
+}
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# Custom implementation to avoid dependency issues
+class RecursiveCharacterTextSplitter:
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chunk_overlap: int = 200,
+        separators: List[str] = None,
+        length_function = len,
+    ):
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        self._separators = separators or ["\n\n", "\n", " ", ""]
+        self._length_function = length_function
+
+    def split_text(self, text: str) -> List[str]:
+        final_chunks = []
+        if self._length_function(text) <= self._chunk_size:
+            return [text]
+        separator = self._separators[-1]
+        for _s in self._separators:
+            if _s == "":
+                separator = _s
+                break
+            if re.search(re.escape(_s), text):
+                separator = _s
+                break
+        splits = text.split(separator) if separator else list(text)
+        _good_splits = []
+        _separator = separator if separator else ""
+        for s in splits:
+            if self._length_function(s) < self._chunk_size:
+                _good_splits.append(s)
+            else:
+                if _good_splits:
+                    merged = self._merge_splits(_good_splits, _separator)
+                    final_chunks.extend(merged)
+                    _good_splits = []
+                final_chunks.extend(self.split_text(s))
+        if _good_splits:
+            final_chunks.extend(self._merge_splits(_good_splits, _separator))
+        return final_chunks
+
+    def _merge_splits(self, splits: List[str], separator: str) -> List[str]:
+        docs = []
+        current_doc = []
+        total = 0
+        for d in splits:
+            _len = self._length_function(d)
+            if total + _len + (len(separator) if current_doc else 0) > self._chunk_size:
+                if current_doc:
+                    doc = separator.join(current_doc)
+                    if doc.strip():
+                        docs.append(doc)
+                    while total > self._chunk_overlap or (total + _len + len(separator) > self._chunk_size and total > 0):
+                        total -= self._length_function(current_doc[0]) + (len(separator) if len(current_doc) > 1 else 0)
+                        current_doc.pop(0)
+            current_doc.append(d)
+            total += _len + (len(separator) if len(current_doc) > 1 else 0)
+        if current_doc:
+            doc = separator.join(current_doc)
+            if doc.strip():
+                docs.append(doc)
+        return docs
+
+
+_NON_WHITESPACE = re.compile(r"\S")
+
+
+class OffsetTextSplitter:
+    """
+    Linear-time replacement for RecursiveCharacterTextSplitter with identical output.
+
+    Chunks are tracked as (start, end) character offsets into the original text:
+    each level computes its split lengths once, merges them with a two-pointer
+    overlap window and a running total (no pop(0), no re-joining), and only the
+    emitted chunks are ever sliced out of the text. Runs without any separator
+    ("" level) are windowed arithmetically instead of char by char.
+    """
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chunk_overlap: int = 200,
+        separators: List[str] = None,
+        length_function = len,
+    ):
+        self._chunk_size = chunk_size
+        self._chunk_overlap = chunk_overlap
+        self._separators = separators or SEPARATORS
+        self._length_function = length_function
+        self._char_lengths = length_function is len
+
+    def split_text(self, text: str) -> List[str]:
+        return list(self.iter_chunks(text))
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        for start, end in self.iter_spans(text):
+            yield text[start:end]
+
+    def iter_spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Lazily yields (start, end) offsets of each chunk in `text`."""
+        return self._split_span(text, 0, len(text))
+
+    def _length(self, text: str, start: int, end: int) -> int:
+        if self._char_lengths:
+            return end - start
+        return self._length_function(text[start:end])
+
+    def _split_lengths(self, text: str, start: int, end: int, separator: str) -> Tuple[List[int], List[int]]:
+        """Returns (character lengths, budget lengths) of the splits of text[start:end]."""
+        span = text if (start == 0 and end == len(text)) else text[start:end]
+        pieces = span.split(separator) if separator else list(span)
+        char_lengths = [len(p) for p in pieces]
+        if self._char_lengths:
+            return char_lengths, char_lengths
+        batch = getattr(self._length_function, "batch", None)
+        if batch is not None:
+            return char_lengths, batch(pieces)
+        return char_lengths, [self._length_function(p) for p in pieces]
+
+    def _split_span(self, text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        chunk_size = self._chunk_size
+        chunk_overlap = self._chunk_overlap
+        if self._length(text, start, end) <= chunk_size:
+            yield (start, end)
+            return
+
+        separator = None
+        for _s in self._separators:
+            if _s == "" or text.find(_s, start, end) != -1:
+                separator = _s
+                break
+        if separator is None:
+            # No separator applies (custom list without ""): keep the span whole
+            yield (start, end)
+            return
+        if separator == "" and self._char_lengths and chunk_size > 1:
+            yield from self._split_chars(text, start, end)
+            return
+
+        # Offsets always advance in characters; the chunk budget uses length_function
+        sep_chars = len(separator)
+        sep_len = sep_chars if self._char_lengths else self._length_function(separator)
+        char_lengths, lengths = self._split_lengths(text, start, end, separator)
+
+        # Overlap window = lengths[lo:i], spanning text[win_start:win_end]
+        lo = 0
+        total = 0
+        win_start = win_end = start
+        pos = start
+        for i, length in enumerate(lengths):
+            split_start = pos
+            split_end = pos + char_lengths[i]
+            pos = split_end + sep_chars
+
+            if length >= chunk_size:
+                # Oversized split: flush the window, then split it on the next separator
+                if i > lo and _NON_WHITESPACE.search(text, win_start, win_end):
+                    yield (win_start, win_end)
+                lo = i + 1
+                total = 0
+                yield from self._split_span(text, split_start, split_end)
+                continue
+
+            if i > lo and total + length + sep_len > chunk_size:
+                if _NON_WHITESPACE.search(text, win_start, win_end):
+                    yield (win_start, win_end)
+                while i > lo and (
+                    total > chunk_overlap
+                    or (total + length + sep_len > chunk_size and total > 0)
+                ):
+                    total -= lengths[lo] + (sep_len if i > lo + 1 else 0)
+                    win_start += char_lengths[lo] + sep_chars
+                    lo += 1
+
+            if i == lo:
+                win_start = split_start
+                total += length
+            else:
+                total += length + sep_len
+            win_end = split_end
+
+        if len(lengths) > lo and _NON_WHITESPACE.search(text, win_start, win_end):
+            yield (win_start, win_end)
+
+    def _split_chars(self, text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """
+        "" separator in character mode: every split is one character, so the merge
+        window always fills to chunk_size and keeps min(overlap, chunk_size - 1)
+        characters. The chunk offsets follow directly from that stride.
+        """
+        chunk_size = self._chunk_size
+        keep = max(0, min(self._chunk_overlap, chunk_size - 1))
+        stride = chunk_size - keep
+        win_start = start
+        while win_start + chunk_size < end:
+            if _NON_WHITESPACE.search(text, win_start, win_start + chunk_size):
+                yield (win_start, win_start + chunk_size)
+            win_start += stride
+        if _NON_WHITESPACE.search(text, win_start, end):
+            yield (win_start, end)
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer-free token estimate: UTF-8 bytes / 3 (about one token per Hangul syllable)."""
+    return math.ceil(len(text.encode("utf-8")) / 3)
+
+
+class TokenCounter:
+    """
+    Length function that counts embedding-model tokens instead of characters.
+    Callable like `len`, with a `batch()` method the splitter uses to measure
+    all splits of a level in one tokenizer call, and a bounded memo for repeats.
+
+    Tokenizer preference: HuggingFace `tokenizers` (e.g. BAAI/bge-m3) ->
+    tiktoken cl100k_base -> a byte-length estimate. Loading may download from the
+    HuggingFace hub, so build it off the event loop (the server warms it at startup).
+    Each backend counts differently, so chunk boundaries (and content-hash point IDs)
+    depend on `backend`; ingest stats report it.
+    """
+    def __init__(self, tokenizer_name: str, cache_size: int = 65536):
+        self.tokenizer_name = tokenizer_name
+        self.backend = "estimate"
+        self._encode_batch = None
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_pretrained(self.tokenizer_name)
+            tokenizer.no_padding()
+            tokenizer.no_truncation()
+            self._encode_batch = lambda texts: [
+                len(e.ids) for e in tokenizer.encode_batch(texts, add_special_tokens=False)
+            ]
+            self.backend = f"tokenizers:{self.tokenizer_name}"
+            return
+        except Exception as e:
+            print(f"Tokenizer '{self.tokenizer_name}' unavailable ({e}). Trying tiktoken; token chunk boundaries will differ from '{self.tokenizer_name}'.")
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding("cl100k_base")
+            self._encode_batch = lambda texts: [len(ids) for ids in encoding.encode_ordinary_batch(texts)]
+            self.backend = "tiktoken:cl100k_base"
+        except Exception as e:
+            print(f"tiktoken unavailable ({e}). Estimating token counts from byte length.")
+            self._encode_batch = lambda texts: [estimate_tokens(t) for t in texts]
+
+    def __call__(self, text: str) -> int:
+        return self.batch([text])[0]
+
+    def batch(self, texts: List[str]) -> List[int]:
+        results: List[Optional[int]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                if not text:
+                    results[i] = 0
+                    continue
+                cached = self._cache.get(text)
+                if cached is not None:
+                    results[i] = cached
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        if missing:
+            unique = list(missing)
+            counts = self._encode_batch(unique)
+            with self._lock:
+                for text, count in zip(unique, counts):
+                    for i in missing[text]:
+                        results[i] = count
+                    # Only memoize short strings (words, lines); long spans rarely repeat
+                    if len(text) <= 256:
+                        self._cache[text] = count
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+
+@lru_cache(maxsize=4)
+def get_token_counter(tokenizer_name: str) -> TokenCounter:
+    """Tokenizers are expensive to load; keep one per name for the process lifetime."""
+    return TokenCounter(tokenizer_name)
+
+
+def make_splitter(preset: str, chunk_size: int, chunk_overlap: int, length_unit: str = "chars", tokenizer_name: str = None) -> OffsetTextSplitter:
+    """
+    Builds the ingest splitter. With length_unit="tokens", preset sizes come from
+    TOKEN_CHUNK_PRESETS and custom chunk_size/chunk_overlap are read as tokens.
+    """
+    if length_unit == "tokens":
+        config = TOKEN_CHUNK_PRESETS.get(preset, {"size": chunk_size, "overlap": chunk_overlap})
+        length_function = get_token_counter(tokenizer_name)
+    else:
+        config = CHUNK_PRESETS.get(preset, {"size": chunk_size, "overlap": chunk_overlap})
+        length_function = len
+    return OffsetTextSplitter(
+        chunk_size=config["size"],
+        chunk_overlap=config["overlap"],
+        separators=SEPARATORS,
+        length_function=length_function,
+    )
+
+
+class ChunkLengthStats:
+    """Collects the length distribution of emitted chunks (in the splitter's unit)."""
+    def __init__(self, length_function=len, unit: str = "chars", limit: int = None):
+        self.length_function = length_function
+        self.unit = unit
+        self.limit = limit
+        self.lengths: List[int] = []
+
+    def measure(self, chunks: List[str]) -> List[str]:
+        """Records the lengths of a batch of chunks (one tokenizer call) and returns them."""
+        batch = getattr(self.length_function, "batch", None)
+        self.lengths.extend(batch(chunks) if batch is not None else map(self.length_function, chunks))
+        return chunks
+
+    def summary(self) -> Dict:
+        if not self.lengths:
+            return {"unit": self.unit, "count": 0}
+        ordered = sorted(self.lengths)
+        count = len(ordered)
+
+        def percentile(p: float) -> int:
+            return ordered[min(count - 1, int(round(p / 100 * (count - 1))))]
+
+        summary = {
+            "unit": self.unit,
+            "count": count,
+            "min": ordered[0],
+            "max": ordered[-1],
+            "mean": round(sum(ordered) / count, 1),
+            "p50": percentile(50),
+            "p90": percentile(90),
+            "p99": percentile(99),
+        }
+        if self.limit:
+            # Chunks the embedder will silently truncate
+            summary["over_limit"] = sum(1 for length in ordered if length > self.limit)
+            summary["limit"] = self.limit
+        return summary
+
+
+class TextWindower:
+    """
+    Regroups an incremental stream of text pieces (e.g. decoded upload chunks or PDF pages)
+    into windows of roughly `window_size` characters, cut at paragraph/line boundaries.
+    Each window can be split independently, so memory stays bounded by the window size.
+    """
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self._buffer: List[str] = []
+        self._buffered = 0
+
+    def feed(self, piece: str) -> List[str]:
+        if not piece:
+            return []
+        self._buffer.append(piece)
+        self._buffered += len(piece)
+        if self._buffered < self.window_size:
+            return []
+
+        text = "".join(self._buffer)
+        windows = []
+        start = 0
+        while len(text) - start >= self.window_size:
+            limit = start + self.window_size
+            cut = text.rfind("\n\n", start, limit)
+            if cut <= start:
+                cut = text.rfind("\n", start, limit)
+            if cut <= start:
+                cut = limit
+            windows.append(text[start:cut])
+            start = cut
+        rest = text[start:]
+        self._buffer = [rest] if rest else []
+        self._buffered = len(rest)
+        return windows
+
+    def finish(self) -> List[str]:
+        rest = "".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        return [rest] if rest.strip() else []
+
+
+class WindowChunker:
+    """
+    Splits a sequence of consecutive windows (TextWindower output) as one text, so chunks
+    (with their overlap and content-hash IDs) match splitting the whole text at once.
+    Only chunks that end before the last top-level piece of the text seen so far (e.g.
+    its last paragraph, which may continue in the next window) are final. The rest,
+    from the start of the first chunk reaching into that piece (keeping its overlap),
+    is carried over and split again with the next window; chunks already emitted are
+    skipped. Carry-overs are capped at max_carry characters.
+    """
+    def __init__(self, splitter: OffsetTextSplitter, max_carry: int = 100_000):
+        self.splitter = splitter
+        self.max_carry = max_carry
+        self._tail = ""
+        self._emitted_end = 0  # End offset in _tail of the last emitted chunk
+
+    def _last_piece_start(self, text: str) -> int:
+        separator = next((s for s in self.splitter._separators if s and s in text), None)
+        if separator is None:
+            return 0
+        cut = text.rfind(separator)
+        return 0 if cut == -1 else cut + len(separator)
+
+    def feed(self, window: str) -> List[str]:
+        text = self._tail + window
+        spans = [span for span in self.splitter.iter_spans(text) if span[1] > self._emitted_end]
+        boundary = self._last_piece_start(text)
+        if len(text) - boundary > self.max_carry and spans:
+            boundary = spans[-1][0]
+        final = [span for span in spans if span[1] < boundary]
+        if not final:
+            self._tail = text
+            return []
+        carry = min([boundary] + [start for start, end in spans if end >= boundary])
+        self._tail = text[carry:]
+        self._emitted_end = max(0, final[-1][1] - carry)
+        return [text[start:end] for start, end in final]
+
+    def finish(self) -> List[str]:
+        text, self._tail = self._tail, ""
+        emitted_end, self._emitted_end = self._emitted_end, 0
+        if not text.strip():
+            return []
+        return [text[start:end] for start, end in self.splitter.iter_spans(text) if end > emitted_end]
+
+
+def iter_text_windows(pieces: Iterable[str], window_size: int) -> Iterator[str]:
+    windower = TextWindower(window_size)
+    for piece in pieces:
+        yield from windower.feed(piece)
+    yield from windower.finish()
+
+
+async def aiter_text_windows(pieces: AsyncIterable[str], window_size: int) -> AsyncIterator[str]:
+    windower = TextWindower(window_size)
+    async for piece in pieces:
+        for window in windower.feed(piece):
+            yield window
+    for window in windower.finish():
+        yield window
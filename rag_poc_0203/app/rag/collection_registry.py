@@ -0,0 +1,168 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class CollectionInfo:
+    name: str
+    exists: bool
+    vector_size: Optional[int] = None
+    distance: Optional[str] = None
+    # Named dense vectors ("" for a collection with a single unnamed vector)
+    vector_names: List[str] = field(default_factory=list)
+    sparse_vector_names: List[str] = field(default_factory=list)
+    # field name -> payload index type (e.g. {"content": "text", "source": "keyword"})
+    payload_indexes: Dict[str, str] = field(default_factory=dict)
+    quantization: Optional[str] = None
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def from_qdrant(cls, name: str, info) -> "CollectionInfo":
+        params = info.config.params
+        vectors = params.vectors
+        if isinstance(vectors, dict):
+            vector_names = list(vectors.keys())
+            first = next(iter(vectors.values()), None)
+        else:
+            vector_names = [""]
+            first = vectors
+        sparse = getattr(params, "sparse_vectors", None) or {}
+        payload_schema = getattr(info, "payload_schema", None) or {}
+        quantization = getattr(info.config, "quantization_config", None)
+        return cls(
+            name=name,
+            exists=True,
+            vector_size=getattr(first, "size", None),
+            distance=str(getattr(first, "distance", "")) or None,
+            vector_names=vector_names,
+            sparse_vector_names=list(sparse.keys()),
+            payload_indexes={
+                key: str(getattr(schema, "data_type", schema)) for key, schema in payload_schema.items()
+            },
+            quantization=type(quantization).__name__ if quantization is not None else None,
+        )
+
+    @property
+    def dense_vector(self) -> Optional[str]:
+        """Vector name to pass as `using=` for dense queries (None for a single unnamed vector)."""
+        if settings.DENSE_VECTOR_NAME in self.vector_names:
+            return settings.DENSE_VECTOR_NAME
+        return (self.vector_names[0] or None) if self.vector_names else None
+
+    @property
+    def sparse_vector(self) -> Optional[str]:
+        """BM25 sparse vector name if the collection has one (collections created before it don't)."""
+        return settings.SPARSE_VECTOR_NAME if settings.SPARSE_VECTOR_NAME in self.sparse_vector_names else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "exists": self.exists,
+            "vector_size": self.vector_size,
+            "distance": self.distance,
+            "vector_names": self.vector_names,
+            "sparse_vector_names": self.sparse_vector_names,
+            "payload_indexes": self.payload_indexes,
+            "quantization": self.quantization,
+        }
+
+
+def is_not_found(error: BaseException) -> bool:
+    """True only for an explicit "collection does not exist": REST 404 or gRPC NOT_FOUND."""
+    if getattr(error, "status_code", None) == 404:
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            return False
+    return getattr(code, "name", None) == "NOT_FOUND"
+
+
+class CollectionRegistry:
+    """
+    In-process cache of Qdrant collection metadata (existence, vector size, index config),
+    so the retrieval path does not pay a get_collection round trip per query.
+
+    Entries expire after `ttl` seconds; "does not exist" answers use the shorter
+    `negative_ttl` so collections created by another process show up quickly.
+    Collections created or deleted through this process are invalidated explicitly.
+    Concurrent misses for the same collection share a single lookup.
+    """
+    def __init__(self, ttl: float = 300.0, negative_ttl: float = 5.0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[str, CollectionInfo] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, name: str, fetch: Callable[[str], Awaitable]) -> CollectionInfo:
+        """
+        Returns cached metadata for `name`, calling `fetch(name)` (get_collection) on a miss.
+        Lookup errors other than "not found" are re-raised and not cached.
+        """
+        entry = self._fresh(name)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            # Another coroutine may have refreshed it while we waited
+            entry = self._fresh(name)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            try:
+                entry = CollectionInfo.from_qdrant(name, await fetch(name))
+            except Exception as e:
+                if not is_not_found(e):
+                    # Transport/server error (timeouts, resets, gRPC UNAVAILABLE, ...):
+                    # nothing is known about the collection, so nothing is cached
+                    print(f"Collection lookup for '{name}' failed: {e}")
+                    raise
+                entry = CollectionInfo(name=name, exists=False)
+            self._entries[name] = entry
+            return entry
+
+    def _fresh(self, name: str) -> Optional[CollectionInfo]:
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        ttl = self.ttl if entry.exists else self.negative_ttl
+        if time.monotonic() - entry.fetched_at > ttl:
+            return None
+        return entry
+
+    def invalidate(self, name: str = None):
+        """Drops one collection (after create/delete/schema change), or everything if name is None."""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "collections": {name: entry.to_dict() for name, entry in self._entries.items()},
+        }
+
+
+# Singleton instance
+collection_registry = CollectionRegistry(
+    ttl=settings.COLLECTION_CACHE_TTL,
+    negative_ttl=settings.COLLECTION_CACHE_NEGATIVE_TTL,
+)
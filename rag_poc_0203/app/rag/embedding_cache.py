@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings keyed by (binding, model, normalized text).
+    - Memory tier: bounded LRU of float32 arrays.
+    - Disk tier (optional): SQLite table that survives restarts.
+
+    The async methods (aget_many, aput_many, ...) answer memory hits inline and run the
+    SQLite reads/writes in a worker thread, one query / one commit per batch.
+    """
+    def __init__(self, max_entries: int = 4096, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"Embedding disk cache disabled ({disk_path}): {e}")
+                self._db = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # Unicode-normalize (Korean jamo vs. precomposed) and collapse whitespace
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def make_key(self, binding: str, model: str, text: str) -> str:
+        raw = f"{binding}\x00{model}\x00{self.normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _memory_get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        results = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(vector.tolist())
+                else:
+                    results.append(None)
+        return results
+
+    def _disk_get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """One SELECT for all keys; found vectors are promoted to the memory tier."""
+        found: Dict[str, List[float]] = {}
+        if self._db is not None and keys:
+            rows = []
+            with self._db_lock:
+                # Chunked below SQLite's default host-parameter limit
+                for start in range(0, len(keys), 500):
+                    chunk = list(keys[start:start + 500])
+                    placeholders = ",".join("?" * len(chunk))
+                    rows += self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+            with self._lock:
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    self._remember(key, vector)
+                    found[key] = vector.tolist()
+        with self._lock:
+            self.disk_hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _disk_put_many(self, items: Sequence[Tuple[str, array]]):
+        """One executemany + commit for the whole batch."""
+        if self._db is None or not items:
+            return
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, packed.tobytes()) for key, packed in items]
+                )
+                self._db.commit()
+        except Exception as e:
+            print(f"Embedding disk cache write failed: {e}")
+
+    def _remember_many(self, items: Sequence[Tuple[str, List[float]]]) -> List[Tuple[str, array]]:
+        packed = [(key, array("f", vector)) for key, vector in items]
+        with self._lock:
+            for key, vector in packed:
+                self._remember(key, vector)
+        return packed
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        results = self._memory_get_many(keys)
+        missing = [key for key, vector in zip(keys, results) if vector is None]
+        if missing:
+            found = self._disk_get_many(missing)
+            results = [vector if vector is not None else found.get(key) for key, vector in zip(keys, results)]
+        return results
+
+    def get(self, key: str) -> Optional[List[float]]:
+        return self.get_many([key])[0]
+
+    def put_many(self, items: Sequence[Tuple[str, List[float]]]):
+        self._disk_put_many(self._remember_many(items))
+
+    def put(self, key: str, vector: List[float]):
+        self.put_many([(key, vector)])
+
+    async def aget_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        results = self._memory_get_many(keys)
+        missing = [key for key, vector in zip(keys, results) if vector is None]
+        if missing:
+            if self._db is None:
+                with self._lock:
+                    self.misses += len(missing)
+                return results
+            found = await asyncio.to_thread(self._disk_get_many, missing)
+            results = [vector if vector is not None else found.get(key) for key, vector in zip(keys, results)]
+        return results
+
+    async def aget(self, key: str) -> Optional[List[float]]:
+        return (await self.aget_many([key]))[0]
+
+    async def aput_many(self, items: Sequence[Tuple[str, List[float]]]):
+        packed = self._remember_many(items)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put_many, packed)
+
+    async def aput(self, key: str, vector: List[float]):
+        await self.aput_many([(key, vector)])
+
+    def _remember(self, key: str, vector: array):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_enabled": self._db is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Singleton instance
+embedding_cache = EmbeddingCache(
+    max_entries=settings.EMBEDDING_CACHE_SIZE,
+    disk_path=settings.EMBEDDING_CACHE_PATH,
+)
@@ -0,0 +1,88 @@
+import threading
+from typing import List
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class EmbeddingClient:
+    """
+    Long-lived embedding client shared by ingestion and retrieval.
+    The underlying LangChain embeddings object (and its HTTP connection pool)
+    is created once instead of on every call.
+    """
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def binding(self) -> str:
+        return settings.EMBEDDING_BINDING
+
+    @property
+    def model_name(self) -> str:
+        if self.binding == "openai":
+            return "openai-default"
+        return settings.EMBEDDING_MODEL
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._build_model()
+        return self._model
+
+    def _build_model(self):
+        # 1. Check Binding Strategy
+        if self.binding == "openai":
+            from langchain_openai import OpenAIEmbeddings
+            return OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
+
+        # 2. Default to Ollama (Local)
+        from langchain_ollama import OllamaEmbeddings
+        return OllamaEmbeddings(
+            base_url=settings.EMBEDDING_BINDING_HOST,
+            model=settings.EMBEDDING_MODEL
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Native async HTTP call; does not block the event loop
+        return await self.model.aembed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.model.aembed_documents(texts)
+
+
+class AdaptiveBatchSizer:
+    """
+    Adjusts the embedding batch size based on observed batch latency.
+    Fast batches grow the size (up to max), slow or failed batches shrink it.
+    """
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.target_latency = target_latency
+
+    def record(self, batch_size: int, latency: float):
+        # Only react to batches that were actually sized by the current setting
+        if batch_size < self.size and latency <= self.target_latency:
+            return
+        if latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        elif latency < self.target_latency / 2:
+            self.size = min(self.maximum, self.size * 2)
+
+    def record_failure(self):
+        self.size = max(self.minimum, self.size // 2)
+
+
+# Singleton instance
+embedding_client = EmbeddingClient()
@@ -0,0 +1,285 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+from app.core.config import get_settings
+from app.rag.chunking import aiter_text_windows
+from app.rag.graph_logic import graph_retriever
+from app.rag.loaders import aiter_pdf_markdown, aiter_text_file
+from app.rag.retriever import retriever
+
+settings = get_settings()
+
+
+class TextSource:
+    """Document submitted as a JSON string."""
+    def __init__(self, text: str):
+        self.text = text
+
+    async def pieces(self) -> AsyncIterator[str]:
+        yield self.text
+
+    def cleanup(self):
+        self.text = ""
+
+
+class FileSource:
+    """Document spooled to a temp file; can be re-read by each stage without holding it in memory."""
+    def __init__(self, path: str, is_pdf: bool = False):
+        self.path = path
+        self.is_pdf = is_pdf
+
+    def pieces(self) -> AsyncIterator[str]:
+        if self.is_pdf:
+            return aiter_pdf_markdown(self.path)
+        return aiter_text_file(self.path)
+
+    def cleanup(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@dataclass
+class IngestJob:
+    id: str
+    collection_name: str
+    filename: str
+    options: Dict
+    graph_index: bool
+    source: object = None
+    # queued -> running -> vector_done -> completed | partial | failed | cancelled
+    # (partial: some chunks failed to embed, the previous points were kept; a graph-stage
+    # failure or cancellation after vector_done ends "completed" or "partial")
+    status: str = "queued"
+    # pending -> queued -> running -> completed | failed | cancelled | skipped
+    graph_status: str = "pending"
+    stats: Dict = field(default_factory=dict)
+    graph_progress: Dict = field(default_factory=lambda: {"windows_indexed": 0})
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    vector_done_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_requested: bool = False
+    _task: Optional[asyncio.Task] = None
+    _done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "partial", "failed", "cancelled")
+
+    @property
+    def vector_outcome(self) -> str:
+        """Final status once the vector stage has finished."""
+        return "partial" if self.stats.get("status") == "partial" else "completed"
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "collection_name": self.collection_name,
+            "filename": self.filename,
+            "status": self.status,
+            "graph_status": self.graph_status,
+            "progress": {
+                "chunks": self.stats.get("chunks", 0),
+                "embedded": self.stats.get("embedded", 0),
+                "upserted": self.stats.get("upserted", 0),
+                "new": self.stats.get("new", 0),
+                "unchanged": self.stats.get("unchanged", 0),
+                "removed": self.stats.get("removed", 0),
+                "failed": self.stats.get("failed", 0),
+                "graph_windows_indexed": self.graph_progress["windows_indexed"],
+            },
+            "stats": self.stats,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "vector_done_at": self.vector_done_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobManager:
+    """
+    Background ingestion queue, separate from the chat request path.
+
+    Jobs run in two independent stages with their own worker pools:
+    1. vector: chunk -> embed -> upsert (INGEST_MAX_CONCURRENT_JOBS workers)
+    2. graph: LightRAG entity extraction (GRAPH_MAX_CONCURRENT_JOBS workers)
+    A job's chunks are searchable as soon as stage 1 finishes. Cancelling a running
+    job stops it between batches; points already upserted stay (their content-hash
+    IDs make a later re-submission skip them).
+    """
+    def __init__(self):
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._vector_queue: Optional[asyncio.Queue] = None
+        self._graph_queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self):
+        if self._workers:
+            return
+        self._vector_queue = asyncio.Queue(maxsize=settings.INGEST_MAX_QUEUED_JOBS)
+        self._graph_queue = asyncio.Queue()
+        for _ in range(settings.INGEST_MAX_CONCURRENT_JOBS):
+            self._workers.append(asyncio.create_task(self._worker(self._vector_queue, self._run_vector_stage)))
+        for _ in range(settings.GRAPH_MAX_CONCURRENT_JOBS):
+            self._workers.append(asyncio.create_task(self._worker(self._graph_queue, self._run_graph_stage)))
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self.jobs.values():
+            if not job.finished:
+                self._mark_cancelled(job)
+            if job.source is not None:
+                job.source.cleanup()
+
+    def submit(self, source, collection_name: str, filename: str, options: Dict, graph_index: bool = True) -> IngestJob:
+        """Queues a job; the source is cleaned up here if it cannot be queued."""
+        if self._vector_queue is None:
+            source.cleanup()
+            raise RuntimeError("Ingest job workers are not running.")
+        job = IngestJob(
+            id=str(uuid.uuid4()),
+            collection_name=collection_name,
+            filename=filename,
+            options=options,
+            graph_index=graph_index,
+            source=source,
+        )
+        try:
+            self._vector_queue.put_nowait(job)
+        except asyncio.QueueFull:
+            source.cleanup()
+            raise RuntimeError(f"Ingest queue is full ({settings.INGEST_MAX_QUEUED_JOBS} jobs). Try again later.")
+        self.jobs[job.id] = job
+        self._trim_history()
+        return job
+
+    async def wait(self, job: IngestJob) -> IngestJob:
+        """Waits until the job finishes (both stages). Cancelling the wait leaves the job running."""
+        await job._done.wait()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestJob]:
+        return list(reversed(self.jobs.values()))
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_requested = True
+        if job._task is not None and not job._task.done():
+            job._task.cancel()
+        else:
+            # Still queued for a stage: the worker will skip it
+            self._mark_cancelled(job)
+        return True
+
+    async def _worker(self, queue: asyncio.Queue, stage):
+        while True:
+            job = await queue.get()
+            try:
+                if job.cancel_requested:
+                    continue
+                # The vector stage hands the job to the graph queue before it returns,
+                # so track this stage's task locally rather than through job._task.
+                task = asyncio.create_task(stage(job))
+                job._task = task
+                # asyncio.wait does not propagate the stage's cancellation into the worker
+                await asyncio.wait({task})
+                if job._task is task:
+                    job._task = None
+                if task.cancelled():
+                    self._mark_cancelled(job)
+                elif task.exception() is not None:
+                    self._mark_failed(job, task.exception())
+            finally:
+                queue.task_done()
+
+    async def _run_vector_stage(self, job: IngestJob):
+        job.status = "running"
+        job.started_at = time.time()
+        await retriever.ingest_stream(
+            job.source.pieces(),
+            job.collection_name,
+            job.filename,
+            graph_index=False,
+            stats=job.stats,
+            **job.options
+        )
+        if job.stats.get("status") == "failed":
+            raise RuntimeError(f"Embedding failed for all {job.stats.get('failed', 0)} new chunks; previous points were kept.")
+        job.status = "vector_done"
+        job.vector_done_at = time.time()
+
+        if job.graph_index and (job.stats.get("new") or job.stats.get("removed")):
+            job.graph_status = "queued"
+            await self._graph_queue.put(job)
+        else:
+            job.graph_status = "skipped"
+            self._mark_completed(job)
+
+    async def _run_graph_stage(self, job: IngestJob):
+        job.graph_status = "running"
+        async for window in aiter_text_windows(job.source.pieces(), settings.INGEST_STREAM_WINDOW_CHARS):
+            await graph_retriever.ingest(window)
+            job.graph_progress["windows_indexed"] += 1
+        job.graph_status = "completed"
+        self._mark_completed(job)
+
+    def _mark_completed(self, job: IngestJob):
+        job.status = job.vector_outcome
+        job.finished_at = time.time()
+        self._release(job)
+        print(
+            f"Ingest job {job.id} {job.status} for '{job.filename}' "
+            f"({job.stats.get('new', 0)} new chunks, {job.stats.get('failed', 0)} failed)"
+        )
+
+    def _mark_failed(self, job: IngestJob, error: BaseException):
+        if job.status == "vector_done":
+            # Vectors are already searchable; only the graph stage failed
+            job.graph_status = "failed"
+            job.status = job.vector_outcome
+        else:
+            job.status = "failed"
+        job.error = str(error)
+        job.finished_at = time.time()
+        self._release(job)
+        print(f"Ingest job {job.id} failed for '{job.filename}': {error}")
+
+    def _mark_cancelled(self, job: IngestJob):
+        if job.graph_status in ("pending", "queued", "running"):
+            job.graph_status = "cancelled"
+        if job.status == "vector_done":
+            # Vectors are committed and searchable (not rolled back); only the graph stage stopped
+            job.status = job.vector_outcome
+        else:
+            job.status = "cancelled"
+        job.finished_at = time.time()
+        self._release(job)
+
+    def _release(self, job: IngestJob):
+        job._done.set()
+        if job.source is not None:
+            job.source.cleanup()
+            job.source = None
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(self.jobs) - settings.INGEST_JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+
+# Singleton instance
+ingest_jobs = IngestJobManager()
@@ -0,0 +1,397 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_HANGUL = re.compile(r"[가-힣]")
+
+# Common particles (josa) and copula endings, longest first so "에서" wins over "에"
+_KOREAN_SUFFIXES = sorted([
+    "은", "는", "이", "가", "을", "를", "에", "의", "도", "만", "와", "과", "로", "으로",
+    "에서", "에게", "한테", "께서", "부터", "까지", "보다", "처럼", "마다", "조차", "라도",
+    "이나", "나", "이며", "며", "이고", "고", "이다", "입니다", "이에요", "예요", "에는", "에서는",
+    "으로는", "로는", "에도", "와의", "과의", "들", "들은", "들이", "들을", "들의",
+], key=len, reverse=True)
+
+
+def _strip_korean_suffix(word: str) -> str:
+    for suffix in _KOREAN_SUFFIXES:
+        if len(word) > len(suffix) and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize_ko(text: str) -> List[str]:
+    """
+    Lightweight Korean-aware tokenizer (no morphological analyzer dependency).
+    Each word yields its lowercased surface form; Hangul words also yield the stem with
+    a trailing particle stripped ("계약은" -> "계약") and the stem's character bigrams,
+    so compounds match their parts ("배포파이프라인" ~ "파이프라인").
+    """
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        tokens.append(word)
+        if not _HANGUL.search(word):
+            continue
+        stem = _strip_korean_suffix(word)
+        if stem != word:
+            tokens.append(stem)
+        if len(stem) >= 3:
+            tokens.extend(f"#{stem[i:i + 2]}" for i in range(len(stem) - 1))
+    return tokens
+
+
+class _Segment:
+    """Immutable on-disk postings, memory-mapped (numpy .npy files)."""
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        if path is None:
+            self.doc_ids: List[str] = []
+            self.doc_len = np.zeros(0, dtype=np.int32)
+            self.terms: Dict[str, List[int]] = {}
+            self.post_docs = np.zeros(0, dtype=np.int32)
+            self.post_tf = np.zeros(0, dtype=np.float32)
+            return
+        with open(os.path.join(path, "doc_ids.json"), encoding="utf-8") as f:
+            self.doc_ids = json.load(f)
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as f:
+            self.terms = json.load(f)
+        self.doc_len = np.load(os.path.join(path, "doc_len.npy"), mmap_mode="r")
+        self.post_docs = np.load(os.path.join(path, "post_docs.npy"), mmap_mode="r")
+        self.post_tf = np.load(os.path.join(path, "post_tf.npy"), mmap_mode="r")
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        span = self.terms.get(term)
+        if span is None:
+            return self.post_docs[:0], self.post_tf[:0]
+        return self.post_docs[span[0]:span[1]], self.post_tf[span[0]:span[1]]
+
+
+class _CollectionIndex:
+    """
+    One collection's index: a memory-mapped base segment plus an in-memory delta
+    (docs added since the last compaction) and tombstones (removed docs).
+    Every mutation is appended to delta.log, which is replayed on load; compaction
+    merges base + delta - tombstones into a new segment and truncates the log.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.RLock()
+        self.base = _Segment()
+        self.delta_ids: List[str] = []
+        self.delta_len: List[int] = []
+        self.delta_postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.tombstones = set()
+        self.live: Dict[str, int] = {}  # point id -> doc number
+        self.total_len = 0
+        self._log = None
+
+    # --- persistence ---
+    def load(self):
+        current = os.path.join(self.root, "CURRENT")
+        if os.path.exists(current):
+            with open(current) as f:
+                self.base = _Segment(os.path.join(self.root, f.read().strip()))
+        self.live = {doc_id: n for n, doc_id in enumerate(self.base.doc_ids)}
+        self.total_len = int(np.asarray(self.base.doc_len, dtype=np.int64).sum())
+        log_path = os.path.join(self.root, "delta.log")
+        if os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # torn last write
+                    if "add" in op:
+                        self._add(op["add"], op["tf"], op["len"])
+                    else:
+                        self._remove(op["del"])
+
+    def _append_log(self, ops: List[Dict]):
+        if self._log is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._log = open(os.path.join(self.root, "delta.log"), "a", encoding="utf-8")
+        self._log.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+        self._log.flush()
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    # --- mutation ---
+    def _add(self, doc_id: str, tf: Dict[str, int], length: int):
+        doc_no = len(self.base.doc_ids) + len(self.delta_ids)
+        self.delta_ids.append(doc_id)
+        self.delta_len.append(length)
+        for term, count in tf.items():
+            self.delta_postings.setdefault(term, []).append((doc_no, count))
+        self.live[doc_id] = doc_no
+        self.total_len += length
+
+    def _remove(self, doc_ids: Iterable[str]):
+        for doc_id in doc_ids:
+            doc_no = self.live.pop(doc_id, None)
+            if doc_no is not None:
+                self.tombstones.add(doc_no)
+                self.total_len -= self._doc_len(doc_no)
+
+    def _doc_len(self, doc_no: int) -> int:
+        base_n = len(self.base.doc_ids)
+        return int(self.base.doc_len[doc_no]) if doc_no < base_n else self.delta_len[doc_no - base_n]
+
+    def add(self, docs: List[Tuple[str, str]]):
+        ops = []
+        with self.lock:
+            for doc_id, text in docs:
+                if doc_id in self.live:
+                    continue  # content-hash ids: same id, same text
+                tokens = tokenize_ko(text)
+                tf = dict(Counter(tokens))
+                self._add(doc_id, tf, len(tokens))
+                ops.append({"add": doc_id, "len": len(tokens), "tf": tf})
+            if ops:
+                self._append_log(ops)
+
+    def remove(self, doc_ids: List[str]):
+        with self.lock:
+            doc_ids = [doc_id for doc_id in doc_ids if doc_id in self.live]
+            if doc_ids:
+                self._remove(doc_ids)
+                self._append_log([{"del": doc_ids}])
+
+    @property
+    def pending(self) -> int:
+        return len(self.delta_ids) + len(self.tombstones)
+
+    def compact(self):
+        """Rewrites base + delta - tombstones as a new memory-mapped segment."""
+        with self.lock:
+            base_n = len(self.base.doc_ids)
+            total = base_n + len(self.delta_ids)
+            all_ids = list(self.base.doc_ids) + self.delta_ids
+            all_len = np.concatenate([np.asarray(self.base.doc_len, dtype=np.int32), np.asarray(self.delta_len, dtype=np.int32)])
+            # old doc number -> new doc number (-1 for removed)
+            remap = np.full(total, -1, dtype=np.int64)
+            keep = np.ones(total, dtype=bool)
+            if self.tombstones:
+                keep[list(self.tombstones)] = False
+            remap[keep] = np.arange(int(keep.sum()))
+
+            terms: Dict[str, List[int]] = {}
+            docs_parts, tf_parts = [], []
+            offset = 0
+            for term in sorted(set(self.base.terms) | set(self.delta_postings)):
+                docs, tfs = self.base.postings(term)
+                delta = self.delta_postings.get(term)
+                if delta:
+                    docs = np.concatenate([docs, np.fromiter((d for d, _ in delta), dtype=np.int32, count=len(delta))])
+                    tfs = np.concatenate([tfs, np.fromiter((t for _, t in delta), dtype=np.float32, count=len(delta))])
+                new_docs = remap[docs]
+                mask = new_docs >= 0
+                count = int(mask.sum())
+                if not count:
+                    continue
+                docs_parts.append(new_docs[mask].astype(np.int32))
+                tf_parts.append(np.asarray(tfs)[mask].astype(np.float32))
+                terms[term] = [offset, offset + count]
+                offset += count
+
+            name = f"seg-{int(time.time() * 1000)}"
+            path = os.path.join(self.root, name)
+            os.makedirs(path, exist_ok=True)
+            np.save(os.path.join(path, "doc_len.npy"), all_len[keep])
+            np.save(os.path.join(path, "post_docs.npy"), np.concatenate(docs_parts) if docs_parts else np.zeros(0, dtype=np.int32))
+            np.save(os.path.join(path, "post_tf.npy"), np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.float32))
+            with open(os.path.join(path, "terms.json"), "w", encoding="utf-8") as f:
+                json.dump(terms, f, ensure_ascii=False)
+            with open(os.path.join(path, "doc_ids.json"), "w", encoding="utf-8") as f:
+                json.dump([doc_id for doc_id, k in zip(all_ids, keep) if k], f)
+
+            # Swap CURRENT atomically, then drop the delta and the old segment
+            tmp = os.path.join(self.root, "CURRENT.tmp")
+            with open(tmp, "w") as f:
+                f.write(name)
+            os.replace(tmp, os.path.join(self.root, "CURRENT"))
+            old_path = self.base.path
+            self.close()
+            open(os.path.join(self.root, "delta.log"), "w").close()
+            self.base = _Segment(path)
+            self.delta_ids, self.delta_len, self.delta_postings = [], [], {}
+            self.tombstones = set()
+            self.live = {doc_id: n for n, doc_id in enumerate(self.base.doc_ids)}
+            if old_path and old_path != path:
+                shutil.rmtree(old_path, ignore_errors=True)
+
+    # --- search ---
+    def search(self, query: str, limit: int, k1: float, b: float) -> List[Tuple[str, float]]:
+        with self.lock:
+            n_live = len(self.live)
+            if not n_live:
+                return []
+            avgdl = max(self.total_len / n_live, 1.0)
+            base_n = len(self.base.doc_ids)
+            delta_len = np.asarray(self.delta_len, dtype=np.float32)
+            dead = np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones)) if self.tombstones else None
+            doc_parts, score_parts = [], []
+            for term in set(tokenize_ko(query)):
+                docs, tfs = self.base.postings(term)
+                delta = self.delta_postings.get(term)
+                if delta:
+                    docs = np.concatenate([docs, np.fromiter((d for d, _ in delta), dtype=np.int32, count=len(delta))])
+                    tfs = np.concatenate([tfs, np.fromiter((t for _, t in delta), dtype=np.float32, count=len(delta))])
+                docs = np.asarray(docs, dtype=np.int64)
+                tfs = np.asarray(tfs, dtype=np.float32)
+                if dead is not None and len(docs):
+                    # Postings of removed (re-ingested) docs stay until compaction: drop them
+                    # before scoring so df and the length lookup only see live docs
+                    live = ~np.isin(docs, dead)
+                    docs, tfs = docs[live], tfs[live]
+                if not len(docs):
+                    continue
+                df = len(docs)
+                idf = math.log(1 + (n_live - df + 0.5) / (df + 0.5))
+                lengths = np.empty(df, dtype=np.float32)
+                in_base = docs < base_n
+                lengths[in_base] = self.base.doc_len[docs[in_base]]
+                lengths[~in_base] = delta_len[docs[~in_base] - base_n]
+                doc_parts.append(docs)
+                score_parts.append(idf * tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * lengths / avgdl)))
+            if not doc_parts:
+                return []
+
+            doc_nos, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+            top = np.argsort(-scores)[:limit] if len(scores) <= limit else np.argpartition(-scores, limit)[:limit]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for i in top:
+                if not np.isfinite(scores[i]):
+                    break
+                doc_no = int(doc_nos[i])
+                doc_id = self.base.doc_ids[doc_no] if doc_no < base_n else self.delta_ids[doc_no - base_n]
+                results.append((doc_id, float(scores[i])))
+            return results
+
+
+class KeywordIndex:
+    """
+    Per-collection BM25 inverted index kept next to Qdrant for keyword search.
+
+    Postings are compact numpy arrays persisted under KEYWORD_INDEX_DIR/<collection>/
+    and memory-mapped at startup; ingestion adds/removes documents through an
+    append-only delta log, compacted once KEYWORD_INDEX_COMPACT_THRESHOLD changes
+    accumulate. Queries run in-process and return ranked (point id, score) pairs.
+    """
+    def __init__(self, root: str, k1: float = 1.2, b: float = 0.75, compact_threshold: int = 2000):
+        self.root = root
+        self.k1 = k1
+        self.b = b
+        self.compact_threshold = compact_threshold
+        self._indexes: Dict[str, _CollectionIndex] = {}
+        self._lock = threading.Lock()
+
+    def load_all(self):
+        if not os.path.isdir(self.root):
+            return
+        for name in sorted(os.listdir(self.root)):
+            # Only complete indexes; a directory without CURRENT is an interrupted rebuild
+            if os.path.exists(os.path.join(self.root, name, "CURRENT")):
+                try:
+                    self._load(name)
+                except Exception as e:
+                    print(f"Keyword index for '{name}' could not be loaded: {e}")
+        print(f"Keyword indexes loaded: {list(self._indexes)}")
+
+    def _load(self, collection_name: str) -> _CollectionIndex:
+        index = _CollectionIndex(os.path.join(self.root, collection_name))
+        index.load()
+        self._indexes[collection_name] = index
+        return index
+
+    def has(self, collection_name: str) -> bool:
+        if collection_name in self._indexes:
+            return True
+        if os.path.exists(os.path.join(self.root, collection_name, "CURRENT")):
+            with self._lock:
+                if collection_name not in self._indexes:
+                    self._load(collection_name)
+            return True
+        return False
+
+    def _get(self, collection_name: str) -> _CollectionIndex:
+        with self._lock:
+            index = self._indexes.get(collection_name)
+            if index is None:
+                index = self._load(collection_name)
+            return index
+
+    def add_documents(self, collection_name: str, docs: List[Tuple[str, str]]):
+        self._get(collection_name).add(docs)
+
+    def remove_documents(self, collection_name: str, doc_ids: List[str]):
+        self._get(collection_name).remove([str(doc_id) for doc_id in doc_ids])
+
+    def search(self, collection_name: str, query: str, limit: int) -> List[Tuple[str, float]]:
+        index = self._indexes.get(collection_name)
+        if index is None:
+            return []
+        return index.search(query, limit, self.k1, self.b)
+
+    def rebuild(self, collection_name: str, docs: Iterable[Tuple[str, str]]):
+        """Replaces a collection's index with `docs` (backfill for existing collections)."""
+        self.drop(collection_name)
+        index = self._get(collection_name)
+        batch = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= 1000:
+                index.add(batch)
+                batch = []
+        index.add(batch)
+        index.compact()
+
+    def maybe_compact(self, collection_name: str):
+        index = self._indexes.get(collection_name)
+        if index is not None and index.pending >= self.compact_threshold:
+            index.compact()
+
+    def drop(self, collection_name: str):
+        with self._lock:
+            index = self._indexes.pop(collection_name, None)
+            if index is not None:
+                index.close()
+        shutil.rmtree(os.path.join(self.root, collection_name), ignore_errors=True)
+
+    def close(self):
+        for index in self._indexes.values():
+            index.close()
+
+    def stats(self) -> Dict:
+        return {
+            name: {
+                "docs": len(index.live),
+                "terms": len(index.base.terms) + sum(1 for t in index.delta_postings if t not in index.base.terms),
+                "pending_changes": index.pending,
+            }
+            for name, index in list(self._indexes.items())
+        }
+
+
+# Singleton instance
+keyword_index = KeywordIndex(
+    root=settings.KEYWORD_INDEX_DIR,
+    k1=settings.BM25_K1,
+    b=settings.BM25_B,
+    compact_threshold=settings.KEYWORD_INDEX_COMPACT_THRESHOLD,
+)
@@ -0,0 +1,61 @@
+import asyncio
+import codecs
+from typing import AsyncIterable, AsyncIterator, Iterator
+
+
+async def decode_byte_stream(stream: AsyncIterable[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """Incrementally decodes a byte stream (multi-byte characters may span chunks)."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    async for data in stream:
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_pdf_markdown(path: str) -> Iterator[str]:
+    """
+    Converts a PDF to markdown one page at a time (pdf4llm), so only a single page
+    of markdown is held in memory instead of the whole document.
+    """
+    import pdf4llm
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf
+
+    with pymupdf.open(path) as doc:
+        page_count = doc.page_count
+
+    for page_no in range(page_count):
+        page_md = pdf4llm.to_markdown(path, pages=[page_no])
+        if page_md:
+            yield page_md + "\n\n"
+
+
+async def aiter_pdf_markdown(path: str) -> AsyncIterator[str]:
+    """Async wrapper around iter_pdf_markdown; each page is converted in a worker thread."""
+    pages = iter_pdf_markdown(path)
+    while True:
+        page = await asyncio.to_thread(next, pages, None)
+        if page is None:
+            break
+        yield page
+
+
+async def aiter_text_file(path: str, encoding: str = "utf-8", block_size: int = 1024 * 1024) -> AsyncIterator[str]:
+    """Reads a text file block by block without loading it whole."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with open(path, "rb") as f:
+        while True:
+            data = await asyncio.to_thread(f.read, block_size)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
@@ -0,0 +1,485 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Set
+import numpy as np
+from qdrant_client.http import models
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_SEARCH_BLOCK_ROWS = 65536  # Rows scored per matrix product (bounds float32 temporaries)
+_DEFAULT_KEYWORD_FIELDS = ["source"]  # Indexed in collections created before payload indexes were kept
+
+
+class _LocalCollection:
+    """
+    One collection: vectors in a memory-mapped (capacity x dim) array, unit-normalized
+    at insert so cosine similarity is a dot product; ids and payloads in an
+    append-only JSON-lines side file replayed on open. Keyword payload indexes are
+    in-memory inverted maps (value -> rows), rebuilt by the replay, so equality filters
+    on those fields become NumPy masks instead of a scan over every payload.
+    """
+    def __init__(self, root: str, dim: int = None, vector_name: str = None, dtype: str = None):
+        self.root = root
+        self.lock = threading.RLock()
+        meta_path = os.path.join(root, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            os.makedirs(root, exist_ok=True)
+            self.meta = {
+                "dim": dim, "dtype": dtype or "float16", "vector_name": vector_name, "rows": 0, "capacity": 0,
+                "keyword_fields": [],
+            }
+            self._write_meta()
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.vectors = self._open_vectors(self.meta["capacity"])
+        self.ids: List[Optional[str]] = []
+        self.payloads: List[Optional[Dict]] = []
+        self.rows: Dict[str, int] = {}
+        self.keyword_rows: Dict[str, Dict[object, Set[int]]] = {
+            field: {} for field in self.meta.get("keyword_fields", _DEFAULT_KEYWORD_FIELDS)
+        }
+        self.alive = np.zeros(self.meta["capacity"], dtype=bool)
+        log_path = os.path.join(root, "payloads.jsonl")
+        if os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # torn last write
+                    self._apply(op)
+        self._log = open(log_path, "a", encoding="utf-8")
+
+    # --- storage ---
+    def _write_meta(self):
+        tmp = os.path.join(self.root, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.root, "meta.json"))
+
+    def _open_vectors(self, capacity: int):
+        if not capacity:
+            return np.zeros((0, self.meta["dim"]), dtype=self.dtype)
+        return np.memmap(os.path.join(self.root, "vectors.bin"), dtype=self.dtype, mode="r+", shape=(capacity, self.meta["dim"]))
+
+    def _grow(self, needed: int):
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        path = os.path.join(self.root, "vectors.bin")
+        with open(path, "ab") as f:
+            f.truncate(new_capacity * self.meta["dim"] * self.dtype.itemsize)
+        self.vectors = self._open_vectors(new_capacity)
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+        self.meta["capacity"] = new_capacity
+        self._write_meta()
+
+    def _apply(self, op: Dict):
+        if "del" in op:
+            for point_id in op["del"]:
+                row = self.rows.pop(point_id, None)
+                if row is not None:
+                    self._index_payload(row, self.payloads[row], add=False)
+                    self.alive[row] = False
+                    self.ids[row] = None
+                    self.payloads[row] = None
+            return
+        row = op["row"]
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.payloads.append(None)
+        self._index_payload(row, self.payloads[row], add=False)
+        self.ids[row] = op["id"]
+        self.payloads[row] = op["payload"]
+        self._index_payload(row, op["payload"], add=True)
+        self.rows[op["id"]] = row
+        self.alive[row] = True
+
+    def _index_payload(self, row: int, payload: Optional[Dict], add: bool, fields: List[str] = None):
+        if not payload:
+            return
+        for field in fields or self.keyword_rows:
+            index = self.keyword_rows[field]
+            value = payload.get(field)
+            for key in value if isinstance(value, list) else [value]:
+                if key is None or isinstance(key, (dict, list)):
+                    continue
+                if add:
+                    index.setdefault(key, set()).add(row)
+                    continue
+                rows = index.get(key)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del index[key]
+
+    def add_keyword_index(self, field: str):
+        with self.lock:
+            if field in self.keyword_rows:
+                return
+            self.keyword_rows[field] = {}
+            for row, payload in enumerate(self.payloads):
+                self._index_payload(row, payload, add=True, fields=[field])
+            self.meta["keyword_fields"] = list(self.keyword_rows)
+            self._write_meta()
+
+    def close(self):
+        with self.lock:
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    # --- points ---
+    def upsert(self, points: List[models.PointStruct]):
+        with self.lock:
+            ops = []
+            for point in points:
+                point_id = str(point.id)
+                vector = point.vector
+                if isinstance(vector, dict):
+                    # Named vectors: keep the dense one; sparse vectors are not stored locally
+                    vector = vector.get(self.meta["vector_name"]) if self.meta["vector_name"] else next(iter(vector.values()))
+                vector = np.asarray(vector, dtype=np.float32)
+                if vector.shape != (self.meta["dim"],):
+                    raise ValueError(f"Vector dimension error: expected dim: {self.meta['dim']}, got {vector.shape[-1]}")
+                norm = np.linalg.norm(vector)
+                row = self.rows.get(point_id)
+                if row is None:
+                    row = self.meta["rows"]
+                    self._grow(row + 1)
+                    self.meta["rows"] = row + 1
+                self.vectors[row] = vector / norm if norm else vector
+                op = {"row": row, "id": point_id, "payload": point.payload or {}}
+                self._apply(op)
+                ops.append(op)
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+            self._write_meta()
+            self._log.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+            self._log.flush()
+
+    def delete(self, point_ids: List):
+        with self.lock:
+            op = {"del": [str(p) for p in point_ids]}
+            self._apply(op)
+            self._log.write(json.dumps(op) + "\n")
+            self._log.flush()
+
+    def record(self, row: int, with_payload=True, with_vectors=False, score: float = None):
+        payload = _select_payload(self.payloads[row], with_payload)
+        vector = self.vectors[row].astype(np.float32).tolist() if with_vectors else None
+        if self.meta["vector_name"] and vector is not None:
+            vector = {self.meta["vector_name"]: vector}
+        if score is None:
+            return models.Record(id=self.ids[row], payload=payload, vector=vector)
+        return models.ScoredPoint(id=self.ids[row], version=0, score=score, payload=payload, vector=vector)
+
+    # --- filtering ---
+    def filter_rows(self, flt: Optional[models.Filter]) -> np.ndarray:
+        """Boolean mask of live rows matching the filter (must / should / must_not)."""
+        rows = self.meta["rows"]
+        mask = self.alive[:rows].copy()
+        if flt is None:
+            return mask
+        for cond in flt.must or []:
+            if isinstance(cond, models.HasIdCondition):
+                ids_mask = np.zeros(rows, dtype=bool)
+                for point_id in cond.has_id:
+                    row = self.rows.get(str(point_id))
+                    if row is not None:
+                        ids_mask[row] = True
+                mask &= ids_mask
+            else:
+                mask &= self._condition_mask(cond, mask)
+        if flt.should:
+            any_mask = np.zeros(rows, dtype=bool)
+            for cond in flt.should:
+                any_mask |= self._condition_mask(cond, mask)
+            mask &= any_mask
+        for cond in flt.must_not or []:
+            mask &= ~self._condition_mask(cond, mask)
+        return mask
+
+    def _condition_mask(self, cond, candidates: np.ndarray) -> np.ndarray:
+        if isinstance(cond, models.Filter):
+            return self.filter_rows(cond)
+        index = self.keyword_rows.get(getattr(cond, "key", None))
+        match = getattr(cond, "match", None)
+        if index is not None and isinstance(match, (models.MatchValue, models.MatchAny)):
+            # Indexed keyword field: union of the rows of each accepted value
+            out = np.zeros(len(candidates), dtype=bool)
+            for value in [match.value] if isinstance(match, models.MatchValue) else match.any:
+                rows = index.get(value)
+                if rows:
+                    out[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+            return out
+        # Unindexed fields and full-text matches: evaluate the candidate payloads
+        out = np.zeros(len(candidates), dtype=bool)
+        for row in np.flatnonzero(candidates):
+            out[row] = _matches(self.payloads[row], cond)
+        return out
+
+    # --- search ---
+    def search(self, queries: np.ndarray, limit: int, flt: Optional[models.Filter] = None, score_threshold: float = None) -> List[List[tuple]]:
+        """Top-`limit` (row, score) per query row, by cosine similarity."""
+        with self.lock:
+            rows = self.meta["rows"]
+            if not rows:
+                return [[] for _ in range(len(queries))]
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = (queries / np.where(norms == 0, 1, norms)).astype(np.float32)
+            mask = self.filter_rows(flt)
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return [[] for _ in range(len(queries))]
+
+            best_rows = [np.zeros(0, dtype=np.int64) for _ in range(len(queries))]
+            best_scores = [np.zeros(0, dtype=np.float32) for _ in range(len(queries))]
+            for start in range(0, len(candidates), _SEARCH_BLOCK_ROWS):
+                block = candidates[start:start + _SEARCH_BLOCK_ROWS]
+                # Contiguous blocks are sliced straight from the memmap; filtered ones gathered
+                if block[-1] - block[0] + 1 == len(block):
+                    matrix = self.vectors[block[0]:block[-1] + 1]
+                else:
+                    matrix = self.vectors[block]
+                scores = np.asarray(matrix, dtype=np.float32) @ queries.T  # (block, n_queries)
+                for q in range(len(queries)):
+                    col = scores[:, q]
+                    k = min(limit, len(col))
+                    top = np.argpartition(-col, k - 1)[:k] if k < len(col) else np.arange(len(col))
+                    best_rows[q] = np.concatenate([best_rows[q], block[top]])
+                    best_scores[q] = np.concatenate([best_scores[q], col[top]])
+
+            results = []
+            for q in range(len(queries)):
+                order = np.argsort(-best_scores[q])[:limit]
+                hits = [(int(best_rows[q][i]), float(best_scores[q][i])) for i in order]
+                if score_threshold is not None:
+                    hits = [(row, score) for row, score in hits if score >= score_threshold]
+                results.append(hits)
+            return results
+
+
+def _select_payload(payload: Optional[Dict], with_payload) -> Optional[Dict]:
+    if not with_payload or payload is None:
+        return None
+    if isinstance(with_payload, (list, tuple)):
+        return {key: payload[key] for key in with_payload if key in payload}
+    return dict(payload)
+
+
+def _matches(payload: Optional[Dict], cond) -> bool:
+    if payload is None:
+        return False
+    if isinstance(cond, models.Filter):
+        return all(_matches(payload, c) for c in cond.must or []) and \
+            (not cond.should or any(_matches(payload, c) for c in cond.should)) and \
+            not any(_matches(payload, c) for c in cond.must_not or [])
+    value = payload.get(cond.key)
+    match = cond.match
+    if isinstance(match, models.MatchValue):
+        return value == match.value if not isinstance(value, list) else match.value in value
+    if isinstance(match, models.MatchAny):
+        return value in match.any if not isinstance(value, list) else any(v in match.any for v in value)
+    if isinstance(match, models.MatchText):
+        # Every query word must occur (like Qdrant's full-text match)
+        text = str(value or "").lower()
+        return all(word in text for word in match.text.lower().split())
+    return False
+
+
+class LocalVectorStore:
+    """
+    Embedded vector store exposing the subset of the QdrantClient API the retriever uses
+    (collections, upsert/retrieve/scroll/delete, query_points/query_batch_points).
+    Selected with VECTOR_BACKEND="local": no Qdrant server needed for development,
+    CI, benchmarks and small deployments.
+
+    Sparse vectors and non-keyword payload indexes are ignored; collections report dense
+    vectors only, so hybrid search uses the vector + local keyword index merge.
+    """
+    _instances: Dict[str, "LocalVectorStore"] = {}
+
+    def __new__(cls, path: str = None, dtype: str = None):
+        # One engine per directory, shared by the sync and async facades
+        path = os.path.abspath(path or settings.LOCAL_VECTOR_DIR)
+        instance = cls._instances.get(path)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance._init(path, dtype or settings.LOCAL_VECTOR_DTYPE)
+            cls._instances[path] = instance
+        return instance
+
+    def _init(self, path: str, dtype: str):
+        self.path = path
+        self.dtype = dtype
+        self._collections: Dict[str, _LocalCollection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _get(self, collection_name: str) -> _LocalCollection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                root = os.path.join(self.path, collection_name)
+                if not os.path.exists(os.path.join(root, "meta.json")):
+                    raise _NotFound(collection_name)
+                collection = self._collections[collection_name] = _LocalCollection(root)
+            return collection
+
+    # --- collections ---
+    def get_collections(self):
+        names = sorted(
+            name for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, "meta.json"))
+        )
+        return SimpleNamespace(collections=[SimpleNamespace(name=name) for name in names])
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self.path, collection_name, "meta.json"))
+
+    def get_collection(self, collection_name: str):
+        collection = self._get(collection_name)
+        params = models.VectorParams(size=collection.meta["dim"], distance=models.Distance.COSINE)
+        vectors = {collection.meta["vector_name"]: params} if collection.meta["vector_name"] else params
+        return SimpleNamespace(
+            status="green",
+            points_count=len(collection.rows),
+            payload_schema={field: models.PayloadSchemaType.KEYWORD for field in collection.keyword_rows},
+            config=SimpleNamespace(
+                params=SimpleNamespace(vectors=vectors, sparse_vectors=None),
+                quantization_config=None,
+            ),
+        )
+
+    def create_collection(self, collection_name: str, vectors_config, **kwargs):
+        if self.collection_exists(collection_name):
+            raise ValueError(f"Collection '{collection_name}' already exists")
+        if isinstance(vectors_config, dict):
+            vector_name, params = next(iter(vectors_config.items()))
+        else:
+            vector_name, params = None, vectors_config
+        with self._lock:
+            self._collections[collection_name] = _LocalCollection(
+                os.path.join(self.path, collection_name), dim=params.size, vector_name=vector_name, dtype=self.dtype
+            )
+        return True
+
+    def delete_collection(self, collection_name: str):
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None:
+                collection.close()
+        shutil.rmtree(os.path.join(self.path, collection_name), ignore_errors=True)
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs):
+        # Keyword indexes back equality filters; other fields are filtered by scanning payloads
+        if getattr(field_schema, "type", field_schema) == models.PayloadSchemaType.KEYWORD:
+            self._get(collection_name).add_keyword_index(field_name)
+        return True
+
+    # --- points ---
+    def upsert(self, collection_name: str, points: List[models.PointStruct], **kwargs):
+        self._get(collection_name).upsert(points)
+
+    def delete(self, collection_name: str, points_selector, **kwargs):
+        self._get(collection_name).delete(points_selector.points)
+
+    def retrieve(self, collection_name: str, ids: List, with_payload=True, with_vectors=False, **kwargs):
+        collection = self._get(collection_name)
+        with collection.lock:
+            rows = [collection.rows.get(str(i)) for i in ids]
+            return [collection.record(row, with_payload, with_vectors) for row in rows if row is not None]
+
+    def scroll(self, collection_name: str, scroll_filter: models.Filter = None, limit: int = 10, offset=None, with_payload=True, with_vectors=False, **kwargs):
+        collection = self._get(collection_name)
+        with collection.lock:
+            matching = np.flatnonzero(collection.filter_rows(scroll_filter))
+            start = int(offset or 0)
+            page = matching[matching >= start][:limit + 1]
+            next_offset = int(page[limit]) if len(page) > limit else None
+            return [collection.record(int(row), with_payload, with_vectors) for row in page[:limit]], next_offset
+
+    def query_points(self, collection_name: str, query=None, using: str = None, prefetch=None, limit: int = 10, query_filter: models.Filter = None, score_threshold: float = None, with_payload=True, with_vectors=False, **kwargs):
+        if query is None or isinstance(query, models.FusionQuery):
+            # Fusion over prefetches: only dense branches exist locally
+            dense = [p for p in (prefetch or []) if isinstance(p.query, list)]
+            if not dense:
+                return SimpleNamespace(points=[])
+            query, query_filter = dense[0].query, dense[0].filter or query_filter
+            score_threshold = dense[0].score_threshold
+        collection = self._get(collection_name)
+        hits = collection.search(np.asarray([query], dtype=np.float32), limit, query_filter, score_threshold)[0]
+        with collection.lock:
+            return SimpleNamespace(points=[collection.record(row, with_payload, with_vectors, score) for row, score in hits])
+
+    def query_batch_points(self, collection_name: str, requests: List[models.QueryRequest], **kwargs):
+        collection = self._get(collection_name)
+        plain = all(isinstance(r.query, list) and r.filter is None for r in requests)
+        if plain and len({r.limit for r in requests}) == 1:
+            # One matrix product for the whole batch
+            matrix = np.asarray([r.query for r in requests], dtype=np.float32)
+            all_hits = collection.search(matrix, requests[0].limit)
+            with collection.lock:
+                return [
+                    SimpleNamespace(points=[
+                        collection.record(row, r.with_payload, r.with_vector, score) for row, score in hits
+                        if r.score_threshold is None or score >= r.score_threshold
+                    ])
+                    for r, hits in zip(requests, all_hits)
+                ]
+        return [
+            self.query_points(
+                collection_name,
+                query=r.query,
+                using=r.using,
+                prefetch=r.prefetch,
+                limit=r.limit,
+                query_filter=r.filter,
+                score_threshold=r.score_threshold,
+                with_payload=r.with_payload,
+                with_vectors=r.with_vector,
+            ) for r in requests
+        ]
+
+    def close(self, **kwargs):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections.clear()
+
+
+class AsyncLocalVectorStore:
+    """Async facade over LocalVectorStore; searches and writes run in worker threads."""
+    def __init__(self, path: str = None, dtype: str = None):
+        self._store = LocalVectorStore(path, dtype)
+
+    def __getattr__(self, name):
+        method = getattr(self._store, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+
+class _NotFound(Exception):
+    """Raised for unknown collections; status_code mirrors Qdrant's 404."""
+    status_code = 404
+
+    def __init__(self, collection_name: str):
+        super().__init__(f"Collection '{collection_name}' not found")
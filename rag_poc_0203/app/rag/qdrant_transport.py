@@ -0,0 +1,74 @@
+from typing import Dict
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def client_kwargs(prefer_grpc: bool = None) -> Dict:
+    """
+    Shared QdrantClient/AsyncQdrantClient arguments built from Settings.
+
+    - REST: an explicit httpx connection pool with keep-alive. Without it the client
+      disables keep-alive for localhost, opening a new TCP connection per request.
+    - gRPC: one multiplexed HTTP/2 channel with keep-alive pings, so idle connections
+      are not silently dropped between bursts of queries.
+    - timeout: default per-call timeout in seconds (search calls may override it).
+    """
+    prefer_grpc = settings.QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc
+    kwargs = {
+        "url": settings.QDRANT_URL,
+        "api_key": settings.QDRANT_API_KEY,
+        "prefer_grpc": prefer_grpc,
+        "grpc_port": settings.QDRANT_GRPC_PORT,
+        "timeout": settings.QDRANT_TIMEOUT,
+        "check_compatibility": False,  # Bypass 1.16 client vs 1.7 server warning
+        "limits": httpx.Limits(
+            max_connections=settings.QDRANT_POOL_SIZE,
+            max_keepalive_connections=settings.QDRANT_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.QDRANT_KEEPALIVE_EXPIRY,
+        ),
+    }
+    if prefer_grpc:
+        kwargs["grpc_options"] = {
+            "grpc.keepalive_time_ms": settings.QDRANT_GRPC_KEEPALIVE_MS,
+            "grpc.keepalive_timeout_ms": 10000,
+            "grpc.keepalive_permit_without_calls": 1,
+            "grpc.http2.max_pings_without_data": 0,
+            # Batch responses with payloads can exceed the 4MB default
+            "grpc.max_receive_message_length": 64 * 1024 * 1024,
+        }
+    return kwargs
+
+
+def make_client(prefer_grpc: bool = None) -> QdrantClient:
+    if settings.VECTOR_BACKEND == "local":
+        from app.rag.local_store import LocalVectorStore
+        return LocalVectorStore()
+    return QdrantClient(**client_kwargs(prefer_grpc))
+
+
+def make_async_client(prefer_grpc: bool = None) -> AsyncQdrantClient:
+    if settings.VECTOR_BACKEND == "local":
+        from app.rag.local_store import AsyncLocalVectorStore
+        return AsyncLocalVectorStore()
+    return AsyncQdrantClient(**client_kwargs(prefer_grpc))
+
+
+def describe() -> Dict:
+    """Effective transport settings (for /metrics)."""
+    if settings.VECTOR_BACKEND == "local":
+        return {
+            "transport": "local",
+            "path": settings.LOCAL_VECTOR_DIR,
+            "dtype": settings.LOCAL_VECTOR_DTYPE,
+        }
+    return {
+        "transport": "grpc" if settings.QDRANT_PREFER_GRPC else "rest",
+        "grpc_port": settings.QDRANT_GRPC_PORT,
+        "pool_size": settings.QDRANT_POOL_SIZE,
+        "keepalive_connections": settings.QDRANT_KEEPALIVE_CONNECTIONS,
+        "timeout_sec": settings.QDRANT_TIMEOUT,
+        "search_timeout_sec": settings.QDRANT_SEARCH_TIMEOUT,
+    }
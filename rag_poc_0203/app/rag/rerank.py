@@ -0,0 +1,86 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import get_settings
+from app.rag.retriever import retriever
+
+settings = get_settings()
+
+# none: fused retrieval order | vector: query similarity | mmr: similarity + diversity |
+# llm: opt-in LLM ranking (budgeted; see simple_agent.llm_rerank)
+RERANK_MODES = ("none", "vector", "mmr", "llm")
+
+
+def resolve_rerank_mode(retrieval_config: Dict, default: Optional[str] = None) -> str:
+    """
+    rerank_mode from the request; the legacy use_reranker flag selects the LLM reranker.
+    Otherwise `default` (settings.RERANK_MODE when None).
+    """
+    default = default or settings.RERANK_MODE
+    mode = retrieval_config.get("rerank_mode")
+    if not mode:
+        mode = "llm" if retrieval_config.get("use_reranker") else default
+    if mode not in RERANK_MODES:
+        print(f"Unknown rerank mode '{mode}'. Using '{default}'.")
+        mode = default
+    return mode
+
+
+def mmr_select(query_vector: np.ndarray, doc_vectors: np.ndarray, top_k: int, lambda_: float = 0.7) -> Tuple[List[int], np.ndarray]:
+    """
+    Maximal Marginal Relevance over cosine similarities:
+    argmax_d  lambda * sim(q, d) - (1 - lambda) * max_{s in selected} sim(d, s).
+    The query and pairwise similarity matrices are computed once; each greedy step is a
+    vectorized update. Returns the selected row indices and every row's query similarity.
+    lambda_=1.0 is plain similarity ranking.
+    """
+    q = np.asarray(query_vector, dtype=np.float32)
+    q = q / (np.linalg.norm(q) or 1.0)
+    d = np.asarray(doc_vectors, dtype=np.float32)
+    norms = np.linalg.norm(d, axis=1, keepdims=True)
+    d = d / np.where(norms == 0, 1.0, norms)
+    relevance = d @ q
+    k = min(top_k, len(d))
+    if lambda_ >= 1.0:
+        order = np.argsort(-relevance)[:k]
+        return order.tolist(), relevance
+
+    similarity = d @ d.T
+    redundancy = np.zeros(len(d), dtype=np.float32)
+    available = np.ones(len(d), dtype=bool)
+    selected = []
+    for _ in range(k):
+        scores = np.where(available, lambda_ * relevance - (1.0 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected, relevance
+
+
+async def vector_rerank(query: str, docs: List[Dict], top_k: int, collection_name: str = "knowledge_base", lambda_: Optional[float] = None) -> List[Dict]:
+    """
+    Reranks retrieved docs by their stored dense vectors (one Qdrant retrieve call with
+    vectors, no payload) against the query embedding. Adds "rerank_score" (cosine
+    similarity to the query). Docs without a vector (e.g. graph answers) keep their
+    order after the ranked ones. Falls back to the input order on failure.
+    """
+    if not docs:
+        return []
+    lambda_ = settings.MMR_LAMBDA if lambda_ is None else lambda_
+    try:
+        query_vector, vectors = await asyncio.gather(
+            retriever.aembed_query(query),
+            retriever.fetch_vectors(collection_name, [d["id"] for d in docs if d.get("id")]),
+        )
+    except Exception as e:
+        print(f"Vector rerank failed: {e}. Keeping retrieval order.")
+        return docs[:top_k]
+
+    ranked = [d for d in docs if d.get("id") in vectors]
+    unranked = [d for d in docs if d.get("id") not in vectors]
+    if not ranked:
+        return docs[:top_k]
+    selected, relevance = mmr_select(query_vector, np.stack([vectors[d["id"]] for d in ranked]), top_k, lambda_)
+    reranked = [dict(ranked[i], rerank_score=float(relevance[i])) for i in selected]
+    return (reranked + unranked)[:top_k]
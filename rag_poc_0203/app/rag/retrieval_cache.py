@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.core.config import get_settings
+from app.rag.embedding_cache import EmbeddingCache
+
+settings = get_settings()
+
+
+class RetrievalCache:
+    """
+    Bounded LRU of retrieval results keyed by (collection, collection version, query,
+    search options). Ingestion bumps the collection's version, so results cached before
+    it are never served again (they age out of the LRU). The TTL bounds staleness from
+    writes made outside this process.
+    """
+    def __init__(self, max_entries: int = 2048, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, collection_name: str) -> int:
+        return self._versions.get(collection_name, 0)
+
+    def bump(self, collection_name: str):
+        """Marks the collection's contents as changed (called after ingestion)."""
+        with self._lock:
+            self._versions[collection_name] = self._versions.get(collection_name, 0) + 1
+
+    def make_key(self, collection_name: str, queries: List[str], **options) -> str:
+        raw = json.dumps(
+            {
+                "collection": collection_name,
+                "version": self.version(collection_name),
+                "queries": [EmbeddingCache.normalize(q) for q in queries],
+                "options": options,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Copies: callers annotate and reorder the docs they get
+            return [dict(doc) for doc in entry[1]]
+
+    def put(self, key: str, docs: List[Dict]):
+        with self._lock:
+            self._entries[key] = (time.time(), [dict(doc) for doc in docs])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "collection_versions": dict(self._versions),
+        }
+
+
+# Singleton instance
+retrieval_cache = RetrievalCache(
+    max_entries=settings.RETRIEVAL_CACHE_SIZE,
+    ttl=settings.RETRIEVAL_CACHE_TTL,
+)
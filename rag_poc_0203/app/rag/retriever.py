@@ -1,78 +1,60 @@
 import os
-from typing import List, Dict
-from qdrant_client import QdrantClient
+import asyncio
+import time
+import uuid
+import hashlib
+from typing import List, Dict, Iterable, AsyncIterable, AsyncIterator, Union
 from qdrant_client.http import models
 from app.ops.monitor import observable
 from app.core.config import get_settings
 from app.rag.graph_logic import graph_retriever
-import re
-
-# Custom implementation to avoid dependency issues
-class RecursiveCharacterTextSplitter:
-    def __init__(
-        self,
-        chunk_size: int = 4000,
-        chunk_overlap: int = 200,
-        separators: List[str] = None,
-        length_function = len,
-    ):
-        self._chunk_size = chunk_size
-        self._chunk_overlap = chunk_overlap
-        self._separators = separators or ["\n\n", "\n", " ", ""]
-        self._length_function = length_function
-
-    def split_text(self, text: str) -> List[str]:
-        final_chunks = []
-        if self._length_function(text) <= self._chunk_size:
-            return [text]
-        separator = self._separators[-1]
-        for _s in self._separators:
-            if _s == "":
-                separator = _s
-                break
-            if re.search(re.escape(_s), text):
-                separator = _s
-                break
-        splits = text.split(separator) if separator else list(text)
-        _good_splits = []
-        _separator = separator if separator else ""
-        for s in splits:
-            if self._length_function(s) < self._chunk_size:
-                _good_splits.append(s)
-            else:
-                if _good_splits:
-                    merged = self._merge_splits(_good_splits, _separator)
-                    final_chunks.extend(merged)
-                    _good_splits = []
-                final_chunks.extend(self.split_text(s))
-        if _good_splits:
-            final_chunks.extend(self._merge_splits(_good_splits, _separator))
-        return final_chunks
-
-    def _merge_splits(self, splits: List[str], separator: str) -> List[str]:
-        docs = []
-        current_doc = []
-        total = 0
-        for d in splits:
-            _len = self._length_function(d)
-            if total + _len + (len(separator) if current_doc else 0) > self._chunk_size:
-                if current_doc:
-                    doc = separator.join(current_doc)
-                    if doc.strip():
-                        docs.append(doc)
-                    while total > self._chunk_overlap or (total + _len + len(separator) > self._chunk_size and total > 0):
-                        total -= self._length_function(current_doc[0]) + (len(separator) if len(current_doc) > 1 else 0)
-                        current_doc.pop(0)
-            current_doc.append(d)
-            total += _len + (len(separator) if len(current_doc) > 1 else 0)
-        if current_doc:
-            doc = separator.join(current_doc)
-            if doc.strip():
-                docs.append(doc)
-        return docs
+from app.rag.embeddings import embedding_client, AdaptiveBatchSizer
+from app.rag.embedding_cache import embedding_cache
+from app.rag.answer_cache import answer_cache
+from app.rag.retrieval_cache import retrieval_cache
+from app.rag.collection_registry import collection_registry, CollectionInfo
+from app.rag.sparse import sparse_encoder
+from app.rag.keyword_index import keyword_index
+from app.rag.qdrant_transport import make_client, make_async_client
+from app.rag.storage_profiles import collection_config, search_params
+from app.rag.chunking import ChunkLengthStats, WindowChunker, make_splitter, aiter_text_windows
 
 settings = get_settings()
 
+# Serializes first-time keyword index builds (backfill from Qdrant)
+_keyword_index_build_lock = asyncio.Lock()
+
+# Payload fields search results need (_hit_to_doc); the rest of the payload stays server-side
+DOC_PAYLOAD_FIELDS = ["content", "source"]
+
+# Namespace for deterministic point IDs: uuid5(namespace, collection/source/content-hash)
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2a0e-4b7d-5e8a-9c3f-2d1b0a9e8f7c")
+
+async def _aiter_chunks(chunks: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
+
+def rrf_fuse(rankings: List[List[Dict]], k: int = 60) -> List[Dict]:
+    """
+    Reciprocal Rank Fusion: score(d) = sum over rankings of 1 / (k + rank).
+    Docs are deduplicated by point id (content for docs without one, e.g. graph answers).
+    """
+    fused: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.get("id") or doc["content"]
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(doc, rrf_score=0.0)
+            elif doc["score"] > entry["score"]:
+                entry["score"] = doc["score"]
+            entry["rrf_score"] += 1.0 / (k + rank + 1)
+    return sorted(fused.values(), key=lambda d: d["rrf_score"], reverse=True)
+
 import warnings
 # Suppress QdrantUserWarning about insecure connection (we know it's local)
 warnings.filterwarnings("ignore", message=".*Api key is used with an insecure connection.*")
@@ -82,13 +64,14 @@ class QdrantRetriever:
         # Initialize Qdrant Client
         # Using memory mode if no host (development) 
         # or connecting to Docker/Cloud if specified
-        self.client = QdrantClient(
-            url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY,
-            check_compatibility=False,  # Bypass 1.16 client vs 1.7 server warning
-            # prefer_grpc=True
-        )
+        # Transport (REST/gRPC, pool, keep-alive, timeouts) comes from Settings
+        self.client = make_client()
+        # Async client for the request path (retrieval, ingestion) so Qdrant I/O
+        # never blocks the event loop.
+        self.aclient = make_async_client()
         self.collection_name = "knowledge_base"
+        # Query embeddings that fell back to the dummy vector (results are not cached then)
+        self.embed_fallbacks = 0
         self._ensure_collection()
 
     def _ensure_collection(self):
@@ -102,7 +85,7 @@ class QdrantRetriever:
             try:
                 self.client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=models.VectorParams(size=1024, distance=models.Distance.COSINE),
+                    **self._collection_schema()
                 )
                 # Add Full-Text Index for Hybrid Search
                 self.client.create_payload_index(
@@ -135,7 +118,7 @@ class QdrantRetriever:
 
             points.append(models.PointStruct(
                 id=idx,
-                vector=vector,
+                vector=self._point_vector(vector, text, settings.DENSE_VECTOR_NAME, settings.SPARSE_VECTOR_NAME),
                 payload={"content": text, "source": "dummy_init"}
             ))
             
@@ -144,6 +127,14 @@ class QdrantRetriever:
             points=points
         )
 
+    def _collection_schema(self, storage_profile: str = None) -> Dict:
+        """
+        Vector layout for new collections: a named dense vector plus a BM25 sparse vector
+        whose IDF is computed by Qdrant (Modifier.IDF), enabling server-side hybrid fusion.
+        Quantization, on-disk storage and HNSW parameters come from the storage profile.
+        """
+        return collection_config(storage_profile)
+
     def list_collections(self) -> List[str]:
         try:
             collections = self.client.get_collections().collections
@@ -152,30 +143,27 @@ class QdrantRetriever:
             print(f"Failed to list collections: {e}")
             return []
 
-    async def ingest_documents(self, text: str, collection_name: str, filename: str = "manual_ingest", chunk_size: int = 1000, chunk_overlap: int = 100, preset: str = "general"):
-        # Mapping presets
-        presets = {
-            "general": {"size": 1000, "overlap": 100},
-            "legal": {"size": 2000, "overlap": 300},  # Larger chunks for legal context
-            "code": {"size": 800, "overlap": 50},    # Smaller, precise chunks for code
-            "granular": {"size": 500, "overlap": 50}  # Very small chunks for FAQ style
-        }
-        
-        config = presets.get(preset, {"size": chunk_size, "overlap": chunk_overlap})
-        actual_size = config["size"]
-        actual_overlap = config["overlap"]
+    async def alist_collections(self) -> List[str]:
+        try:
+            collections = (await self.aclient.get_collections()).collections
+            return [c.name for c in collections]
+        except Exception as e:
+            print(f"Failed to list collections: {e}")
+            return []
 
-        # Ensure collection exists
+    async def _ensure_ingest_collection(self, collection_name: str, storage_profile: str = None):
+        """Creates the collection if missing. The storage profile only applies on creation."""
+        info = await collection_registry.get(collection_name, self.aclient.get_collection)
+        if info.exists:
+            return
+        print(f"Collection '{collection_name}' not found. Creating (storage profile: {storage_profile or settings.COLLECTION_STORAGE_PROFILE})...")
         try:
-            self.client.get_collection(collection_name)
-        except Exception:
-             print(f"Collection '{collection_name}' not found. Creating...")
-             self.client.create_collection(
+            await self.aclient.create_collection(
                 collection_name=collection_name,
-                vectors_config=models.VectorParams(size=1024, distance=models.Distance.COSINE),
+                **self._collection_schema(storage_profile)
             )
-             # Add Full-Text Index
-             self.client.create_payload_index(
+            # Add Full-Text Index
+            await self.aclient.create_payload_index(
                 collection_name=collection_name,
                 field_name="content",
                 field_schema=models.TextIndexParams(
@@ -184,39 +172,49 @@ class QdrantRetriever:
                     lowercase=True,
                 )
             )
-        
-        # Smart Chunking using custom implementation (embedded above)
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=actual_size,
-            chunk_overlap=actual_overlap,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        chunks = text_splitter.split_text(text)
-        print(f"DEBUG: Splitting text into {len(chunks)} chunks...")
-        
-        points = []
-        for idx, chunk in enumerate(chunks):
-            try:
-                vector = self._embed(chunk)
-                # Use a simple deterministic ID or random UUID
-                import uuid
-                point_id = str(uuid.uuid4())
-                
-                points.append(models.PointStruct(
-                    id=point_id,
-                    vector=vector,
-                    payload={"content": chunk, "source": filename}
-                ))
-            except Exception as e:
-                print(f"Embedding failed for chunk: {chunk[:30]}... Error: {e}")
-
-        if points:
-            self.client.upsert(
+            # Source index for incremental re-ingestion (stale chunk lookup)
+            await self.aclient.create_payload_index(
                 collection_name=collection_name,
-                points=points
+                field_name="source",
+                field_schema=models.PayloadSchemaType.KEYWORD,
             )
-            print(f"Ingested {len(points)} chunks into '{collection_name}' from '{filename}'")
-            
+        finally:
+            # Drop the cached "not found" answer (and anything fetched mid-creation)
+            collection_registry.invalidate(collection_name)
+
+    def _make_splitter(self, preset: str, chunk_size: int, chunk_overlap: int, length_unit: str = "chars"):
+        # Offset-based splitter (same chunks as RecursiveCharacterTextSplitter, linear time)
+        text_splitter = make_splitter(preset, chunk_size, chunk_overlap, length_unit, settings.CHUNK_TOKENIZER)
+        length_stats = ChunkLengthStats(
+            text_splitter._length_function,
+            unit="tokens" if length_unit == "tokens" else "chars",
+            limit=settings.EMBEDDING_MAX_TOKENS if length_unit == "tokens" else None,
+        )
+        return text_splitter, length_stats
+
+    @staticmethod
+    def _length_backend(text_splitter) -> str:
+        """How chunk lengths were measured; token chunk boundaries depend on the tokenizer backend."""
+        return getattr(text_splitter._length_function, "backend", "chars")
+
+    async def ingest_documents(self, text: str, collection_name: str, filename: str = "manual_ingest", chunk_size: int = 1000, chunk_overlap: int = 100, preset: str = "general", length_unit: str = "chars", storage_profile: str = None):
+        # Ensure collection exists
+        await self._ensure_ingest_collection(collection_name, storage_profile)
+
+        # Building the splitter may load a tokenizer; chunking is CPU-bound. Both run in a worker thread
+        text_splitter, length_stats = await asyncio.to_thread(self._make_splitter, preset, chunk_size, chunk_overlap, length_unit)
+        chunks = await asyncio.to_thread(lambda: length_stats.measure(text_splitter.split_text(text)))
+
+        stats = await self._embed_and_upsert(collection_name, chunks, filename)
+        stats["chunk_lengths"] = length_stats.summary()
+        stats["tokenizer"] = self._length_backend(text_splitter)
+        print(
+            f"Ingested '{filename}' into '{collection_name}': {stats['new']} new, "
+            f"{stats['unchanged']} unchanged, {stats['removed']} removed "
+            f"({stats['chunks_per_sec']} chunks/sec, {stats['batches']} batches)"
+        )
+
+        if stats["new"] or stats["removed"]:
             # Also ingest into Knowledge Graph (now properly async)
             try:
                 await graph_retriever.ingest(text)
@@ -224,55 +222,585 @@ class QdrantRetriever:
             except Exception as e:
                 print(f"Graph ingestion failed for '{filename}': {e}")
 
-    @observable(name="rag_retrieval", as_type="span")
-    async def retrieve(self, query: str, top_k: int = 3, collection_name: str = "knowledge_base", limit: int = None, score_threshold: float = 0.0, search_type: str = "vector", metadata_filter: Dict = None, graph_mode: str = "hybrid") -> List[Dict[str, str]]:
+        return stats
+
+    async def ingest_stream(self, pieces: AsyncIterable[str], collection_name: str, filename: str = "stream_ingest", chunk_size: int = 1000, chunk_overlap: int = 100, preset: str = "general", graph_index: bool = False, length_unit: str = "chars", stats: Dict = None, storage_profile: str = None):
+        """
+        Ingests a document that arrives as a stream of text pieces (upload body, PDF pages).
+        Pieces are regrouped into bounded windows and chunked in a worker thread, carrying
+        the unfinished tail of each window (with its overlap) into the next one, so chunks
+        match ingest_documents on the same text while peak memory does not depend on the
+        document size and chunking never stalls the event loop. With graph_index, windows
+        are sent to the knowledge graph only when they produced new chunks, as in
+        ingest_documents. Pass `stats` to observe live progress.
+        """
+        await self._ensure_ingest_collection(collection_name, storage_profile)
+        text_splitter, length_stats = await asyncio.to_thread(self._make_splitter, preset, chunk_size, chunk_overlap, length_unit)
+        window_size = max(settings.INGEST_STREAM_WINDOW_CHARS, text_splitter._chunk_size * 4)
+        chunker = WindowChunker(text_splitter)
+        # Windows whose chunks have not been released yet (the chunker carries tails over)
+        graph_windows: List[str] = []
+
+        async def release(chunks: List[str]):
+            if graph_index and chunks:
+                if await self._has_new_chunks(collection_name, filename, chunks):
+                    await self._graph_ingest_window("".join(graph_windows), filename)
+                graph_windows.clear()
+            return chunks
+
+        async def stream_chunks():
+            async for window in aiter_text_windows(pieces, window_size):
+                if graph_index:
+                    graph_windows.append(window)
+                for chunk in await release(await asyncio.to_thread(lambda: length_stats.measure(chunker.feed(window)))):
+                    yield chunk
+            for chunk in await release(await asyncio.to_thread(lambda: length_stats.measure(chunker.finish()))):
+                yield chunk
+
+        stats = await self._embed_and_upsert(collection_name, stream_chunks(), filename, stats=stats)
+        stats["chunk_lengths"] = length_stats.summary()
+        stats["tokenizer"] = self._length_backend(text_splitter)
+        print(
+            f"Stream-ingested '{filename}' into '{collection_name}': {stats['new']} new, "
+            f"{stats['unchanged']} unchanged, {stats['removed']} removed "
+            f"({stats['chunks_per_sec']} chunks/sec, {stats['batches']} batches)"
+        )
+        return stats
+
+    async def _has_new_chunks(self, collection_name: str, filename: str, chunks: List[str]) -> bool:
+        """True if any of the chunks is not stored yet (checked before they are upserted)."""
+        ids = list({self._chunk_record(collection_name, filename, chunk)["id"] for chunk in chunks})
+        try:
+            existing = await self.aclient.retrieve(
+                collection_name=collection_name,
+                ids=ids,
+                with_payload=False,
+                with_vectors=False,
+            )
+        except Exception as e:
+            print(f"Failed to look up existing chunks of '{filename}': {e}")
+            return True
+        return len(existing) < len(ids)
+
+    async def _graph_ingest_window(self, window: str, filename: str):
         try:
-            # Ensure collection exists
+            await graph_retriever.ingest(window)
+        except Exception as e:
+            print(f"Graph ingestion failed for a window of '{filename}': {e}")
+
+    async def _embed_and_upsert(self, collection_name: str, chunks: Union[Iterable[str], AsyncIterable[str]], filename: str, stats: Dict = None) -> Dict:
+        """
+        Embeds chunks in adaptive batches (embed_documents) with a bounded number of
+        in-flight batches, and upserts finished points to Qdrant page by page while
+        later batches are still embedding.
+
+        Point IDs are derived from (collection, source, content hash), so chunks that
+        already exist are skipped before embedding, and points of this source that are
+        no longer produced by the document are removed at the end. If any chunk failed to
+        embed, nothing is removed (the old version of an edited section stays searchable)
+        and stats["status"] is "partial", or "failed" when no chunk could be embedded.
+        """
+        sizer = AdaptiveBatchSizer(
+            initial=settings.EMBED_BATCH_SIZE,
+            minimum=settings.EMBED_MIN_BATCH_SIZE,
+            maximum=settings.EMBED_MAX_BATCH_SIZE,
+            target_latency=settings.EMBED_TARGET_BATCH_LATENCY,
+        )
+        semaphore = asyncio.Semaphore(settings.EMBED_MAX_CONCURRENCY)
+        upsert_lock = asyncio.Lock()
+        pending_points: List[models.PointStruct] = []
+        stats = stats if stats is not None else {}
+        stats.update({
+            "chunks": 0, "new": 0, "unchanged": 0, "duplicates": 0, "removed": 0,
+            "embedded": 0, "failed": 0, "upserted": 0, "batches": 0
+        })
+        seen_ids = set()
+        started = time.perf_counter()
+        # Vector layout decides whether points get named dense + sparse vectors
+        info = await collection_registry.get(collection_name, self.aclient.get_collection)
+        await self._ensure_keyword_index(collection_name)
+
+        async def flush(force: bool = False):
+            async with upsert_lock:
+                while pending_points and (force or len(pending_points) >= settings.UPSERT_PAGE_SIZE):
+                    page = pending_points[:settings.UPSERT_PAGE_SIZE]
+                    del pending_points[:settings.UPSERT_PAGE_SIZE]
+                    await self.aclient.upsert(collection_name=collection_name, points=page)
+                    stats["upserted"] += len(page)
+                    await asyncio.to_thread(
+                        keyword_index.add_documents,
+                        collection_name,
+                        [(str(point.id), point.payload["content"]) for point in page]
+                    )
+
+        async def run_batch(records: List[Dict]):
             try:
-                self.client.get_collection(collection_name)
-            except:
-                return []
-            
-            fetch_k = limit if limit else top_k
-            results = []
-
-            # Prepare models.Filter if metadata_filter is provided
-            qdrant_filter = None
-            if metadata_filter:
-                must_conditions = []
-                for key, value in metadata_filter.items():
-                    must_conditions.append(models.FieldCondition(key=key, match=models.MatchValue(value=value)))
-                qdrant_filter = models.Filter(must=must_conditions)
-
-            if search_type == "keyword":
-                results = self._search_keyword(query, collection_name, fetch_k, qdrant_filter)
-            elif search_type == "hybrid":
-                results = await self._search_hybrid(query, collection_name, fetch_k, qdrant_filter)
-            elif search_type == "graph":
-                # LightRAG returns a full answer, we package it as a document
-                graph_answer = await graph_retriever.query(query, mode=graph_mode)
-                results = [{"content": graph_answer, "score": 1.0, "source": "Knowledge Graph"}]
-            else: # Default: vector
-                vector = self._embed(query)
-                search_result = self.client.query_points(
+                # Skip chunks whose content-hash ID is already stored
+                existing = await self.aclient.retrieve(
+                    collection_name=collection_name,
+                    ids=[r["id"] for r in records],
+                    with_payload=False,
+                    with_vectors=False,
+                )
+                existing_ids = {str(p.id) for p in existing}
+                records = [r for r in records if r["id"] not in existing_ids]
+                stats["unchanged"] += len(existing_ids)
+                if not records:
+                    return
+
+                batch = [r["content"] for r in records]
+                batch_started = time.perf_counter()
+                try:
+                    vectors = await embedding_client.aembed_documents(batch)
+                    sizer.record(len(batch), time.perf_counter() - batch_started)
+                except Exception as e:
+                    # Fall back to per-chunk embedding so one bad chunk doesn't sink the batch
+                    print(f"Batch embedding failed ({len(batch)} chunks): {e}. Retrying per chunk.")
+                    sizer.record_failure()
+                    vectors = []
+                    for chunk in batch:
+                        try:
+                            vectors.append(await embedding_client.aembed_query(chunk))
+                        except Exception as chunk_error:
+                            print(f"Embedding failed for chunk: {chunk[:30]}... Error: {chunk_error}")
+                            vectors.append(None)
+
+                for record, vector in zip(records, vectors):
+                    if vector is None:
+                        stats["failed"] += 1
+                        continue
+                    pending_points.append(self._build_point(record, vector, filename, info))
+                    stats["embedded"] += 1
+                    stats["new"] += 1
+                stats["batches"] += 1
+                await flush()
+            finally:
+                semaphore.release()
+
+        async def next_batch(chunk_iter: AsyncIterator[str]) -> List[Dict]:
+            records = []
+            while True:
+                try:
+                    chunk = await chunk_iter.__anext__()
+                except StopAsyncIteration:
+                    break
+                stats["chunks"] += 1
+                record = self._chunk_record(collection_name, filename, chunk)
+                if record["id"] in seen_ids:
+                    stats["duplicates"] += 1
+                    continue
+                seen_ids.add(record["id"])
+                records.append(record)
+                if len(records) >= sizer.size:
+                    break
+            return records
+
+        chunk_iter = _aiter_chunks(chunks)
+        tasks = set()
+        try:
+            while True:
+                await semaphore.acquire()
+                records = await next_batch(chunk_iter)
+                if not records:
+                    semaphore.release()
+                    break
+                task = asyncio.create_task(run_batch(records))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+            await flush(force=True)
+        except BaseException:
+            # Cancellation or failure: stop in-flight batches and skip stale-point removal,
+            # which is only safe once the whole document has been processed.
+            for task in list(tasks):
+                task.cancel()
+            raise
+
+        if stats["failed"]:
+            # The stale points may be the only stored version of the sections that failed
+            stats["status"] = "partial" if stats["embedded"] else "failed"
+            print(
+                f"{stats['failed']} chunks of '{filename}' failed to embed. "
+                f"Keeping its previous points; re-ingest to complete the update."
+            )
+        else:
+            stats["status"] = "completed"
+            # Remove chunks of this source that the new version no longer contains
+            stats["removed"] = await self._remove_stale_points(collection_name, filename, seen_ids)
+        await asyncio.to_thread(keyword_index.maybe_compact, collection_name)
+        if stats["upserted"] or stats["removed"]:
+            # Cached retrievals and answers may cite replaced or removed chunks
+            retrieval_cache.bump(collection_name)
+            answer_cache.invalidate(collection_name)
+
+        elapsed = time.perf_counter() - started
+        stats["elapsed_sec"] = round(elapsed, 3)
+        stats["chunks_per_sec"] = round(stats["upserted"] / elapsed, 2) if elapsed > 0 else 0.0
+        stats["final_batch_size"] = sizer.size
+        return stats
+
+    def _chunk_record(self, collection_name: str, filename: str, chunk: str) -> Dict:
+        content_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+        point_id = str(uuid.uuid5(POINT_ID_NAMESPACE, f"{collection_name}\x00{filename}\x00{content_hash}"))
+        return {"id": point_id, "content": chunk, "content_hash": content_hash}
+
+    def _build_point(self, record: Dict, vector: List[float], filename: str, info: CollectionInfo = None) -> models.PointStruct:
+        return models.PointStruct(
+            id=record["id"],
+            vector=self._point_vector(
+                vector,
+                record["content"],
+                info.dense_vector if info else None,
+                info.sparse_vector if info else None
+            ),
+            payload={"content": record["content"], "source": filename, "content_hash": record["content_hash"]}
+        )
+
+    def _point_vector(self, dense: List[float], text: str, dense_name: str = None, sparse_name: str = None):
+        """Plain vector for legacy single-vector collections, named dense (+ BM25 sparse) otherwise."""
+        if not dense_name:
+            return dense
+        vector = {dense_name: dense}
+        if sparse_name:
+            indices, values = sparse_encoder.encode_document(text)
+            if indices:
+                vector[sparse_name] = models.SparseVector(indices=indices, values=values)
+        return vector
+
+    async def _remove_stale_points(self, collection_name: str, filename: str, keep_ids: set) -> int:
+        """Deletes points of `filename` whose IDs are not in `keep_ids`. Returns the count."""
+        stale_ids = []
+        offset = None
+        source_filter = models.Filter(
+            must=[models.FieldCondition(key="source", match=models.MatchValue(value=filename))]
+        )
+        while True:
+            points, offset = await self.aclient.scroll(
+                collection_name=collection_name,
+                scroll_filter=source_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            stale_ids.extend(str(p.id) for p in points if str(p.id) not in keep_ids)
+            if offset is None:
+                break
+
+        for start in range(0, len(stale_ids), settings.UPSERT_PAGE_SIZE):
+            await self.aclient.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=stale_ids[start:start + settings.UPSERT_PAGE_SIZE]),
+            )
+        if stale_ids:
+            await asyncio.to_thread(keyword_index.remove_documents, collection_name, stale_ids)
+        return len(stale_ids)
+
+    async def _ensure_keyword_index(self, collection_name: str):
+        """Builds the local keyword index from Qdrant payloads if this collection has none yet."""
+        if keyword_index.has(collection_name):
+            return
+        async with _keyword_index_build_lock:
+            if keyword_index.has(collection_name):
+                return
+            await self._build_keyword_index(collection_name)
+
+    async def _build_keyword_index(self, collection_name: str):
+        docs = []
+        offset = None
+        while True:
+            points, offset = await self.aclient.scroll(
+                collection_name=collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=["content"],
+                with_vectors=False,
+            )
+            docs.extend((str(point.id), point.payload.get("content", "")) for point in points)
+            if offset is None:
+                break
+        await asyncio.to_thread(keyword_index.rebuild, collection_name, docs)
+        print(f"Keyword index built for '{collection_name}' ({len(docs)} docs)")
+
+    @observable(name="rag_retrieval", as_type="span")
+    async def retrieve(self, query: str, top_k: int = 3, collection_name: str = "knowledge_base", limit: int = None, score_threshold: float = 0.0, search_type: str = "vector", metadata_filter: Dict = None, graph_mode: str = "hybrid", hydrate: bool = True) -> List[Dict[str, str]]:
+        """
+        `score_threshold` is applied by Qdrant for vector search. With hydrate=False vector
+        and fused hybrid results come back as (id, score) only ("content"/"source" are None);
+        call hydrate() on the docs that are actually kept.
+        Results are cached per collection version (graph answers are not cached, nor results
+        of a search that ran on a dummy vector because the embedder failed).
+        """
+        cache_key = None
+        if search_type != "graph":
+            cache_key = retrieval_cache.make_key(
+                collection_name, [query],
+                search_type=search_type, fetch_k=limit if limit else top_k, score_threshold=score_threshold,
+                metadata_filter=metadata_filter, hydrate=hydrate
+            )
+            cached = retrieval_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        fallbacks = self.embed_fallbacks
+        try:
+            results = await self._retrieve(query, top_k, collection_name, limit, score_threshold, search_type, metadata_filter, graph_mode, hydrate)
+        except Exception as e:
+            print(f"Retrieval failed: {e}")
+            # The collection may have been dropped or recreated elsewhere
+            collection_registry.invalidate(collection_name)
+            return []
+        # A fallback during the search (possibly a concurrent one's) only costs a cache miss
+        if cache_key and self.embed_fallbacks == fallbacks:
+            retrieval_cache.put(cache_key, results)
+        return results
+
+    async def _retrieve(self, query: str, top_k: int, collection_name: str, limit: int, score_threshold: float, search_type: str, metadata_filter: Dict, graph_mode: str, hydrate: bool) -> List[Dict]:
+        # Ensure collection exists (cached; no Qdrant round trip on a hit)
+        info = await collection_registry.get(collection_name, self.aclient.get_collection)
+        if not info.exists:
+            return []
+
+        fetch_k = limit if limit else top_k
+        results = []
+
+        # Prepare models.Filter if metadata_filter is provided
+        qdrant_filter = self._build_filter(metadata_filter)
+
+        if search_type == "keyword":
+            results = await self._search_keyword(query, collection_name, fetch_k, qdrant_filter)
+        elif search_type == "hybrid":
+            results = await self._search_hybrid(query, collection_name, fetch_k, qdrant_filter, info, score_threshold, hydrate)
+            if info.sparse_vector:
+                # Threshold already applied to the dense branch; fused scores are rank-based
+                return results
+        elif search_type == "graph":
+            # LightRAG returns a full answer, we package it as a document
+            graph_answer = await graph_retriever.query(query, mode=graph_mode)
+            results = [{"content": graph_answer, "score": 1.0, "source": "Knowledge Graph"}]
+        else: # Default: vector
+            vector = await self._aembed(query)
+            search_result = (await self.aclient.query_points(
+                collection_name=collection_name,
+                query=vector,
+                using=info.dense_vector,
+                limit=fetch_k,
+                query_filter=qdrant_filter,
+                search_params=search_params(info.quantization),
+                score_threshold=score_threshold,
+                with_payload=DOC_PAYLOAD_FIELDS if hydrate else False,
+                timeout=settings.QDRANT_SEARCH_TIMEOUT
+            )).points
+            # Already thresholded server-side
+            return [self._hit_to_doc(hit) for hit in search_result]
+
+        # Filter by score_threshold
+        return [r for r in results if r["score"] >= score_threshold]
+
+    @observable(name="rag_retrieval_batch", as_type="span")
+    async def retrieve_many(self, queries: List[str], top_k: int = 3, collection_name: str = "knowledge_base", limit: int = None, score_threshold: float = 0.0, search_type: str = "vector", metadata_filter: Dict = None, graph_mode: str = "hybrid", hydrate: bool = True) -> List[Dict]:
+        """
+        Multi-query retrieval. For vector search all query variations are embedded in one
+        batch and searched with a single query_batch_points request; the per-query rankings
+        are fused with RRF and deduplicated by point id. Other search types run the
+        per-query searches concurrently and are fused the same way.
+        `limit` (or `top_k`) is the per-query depth, as with retrieve(); the fused union is
+        returned in rank order. "score" is the best raw score a doc got across the queries,
+        "rrf_score" the fused one. `hydrate` works as in retrieve().
+        """
+        queries = list(dict.fromkeys(q for q in queries if q and q.strip()))
+        if not queries:
+            return []
+        cache_key = None
+        if search_type != "graph":
+            cache_key = retrieval_cache.make_key(
+                collection_name, queries,
+                search_type=search_type, fetch_k=limit if limit else top_k, score_threshold=score_threshold,
+                metadata_filter=metadata_filter, hydrate=hydrate, batch=True
+            )
+            cached = retrieval_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        fallbacks = self.embed_fallbacks
+        try:
+            results = await self._retrieve_many(queries, top_k, collection_name, limit, score_threshold, search_type, metadata_filter, graph_mode, hydrate)
+        except Exception as e:
+            print(f"Batch retrieval failed: {e}")
+            collection_registry.invalidate(collection_name)
+            return []
+        if cache_key and self.embed_fallbacks == fallbacks:
+            retrieval_cache.put(cache_key, results)
+        return results
+
+    async def _retrieve_many(self, queries: List[str], top_k: int, collection_name: str, limit: int, score_threshold: float, search_type: str, metadata_filter: Dict, graph_mode: str, hydrate: bool) -> List[Dict]:
+        fetch_k = limit if limit else top_k
+        info = await collection_registry.get(collection_name, self.aclient.get_collection)
+        if not info.exists:
+            return []
+
+        batched_hybrid = search_type == "hybrid" and info.sparse_vector
+        if search_type != "vector" and not batched_hybrid:
+            rankings = await asyncio.gather(*[
+                self.retrieve(
+                    q,
+                    top_k=top_k,
                     collection_name=collection_name,
+                    limit=limit,
+                    score_threshold=score_threshold,
+                    search_type=search_type,
+                    metadata_filter=metadata_filter,
+                    graph_mode=graph_mode,
+                    hydrate=hydrate
+                ) for q in queries
+            ])
+            return rrf_fuse(rankings, settings.RRF_K)
+
+        qdrant_filter = self._build_filter(metadata_filter)
+        vectors = await self._aembed_many(queries)
+        if batched_hybrid:
+            requests = [
+                models.QueryRequest(
+                    **self._hybrid_query(vector, query, fetch_k, qdrant_filter, info, score_threshold),
+                    filter=qdrant_filter,
+                    with_payload=DOC_PAYLOAD_FIELDS if hydrate else False,
+                ) for vector, query in zip(vectors, queries)
+            ]
+        else:
+            requests = [
+                models.QueryRequest(
                     query=vector,
+                    using=info.dense_vector,
                     limit=fetch_k,
-                    query_filter=qdrant_filter
-                ).points
-                results = [
-                    {"content": hit.payload.get("content", ""), "score": hit.score, "source": hit.payload.get("source", "unknown")}
-                    for hit in search_result
-                ]
-
-            # Filter by score_threshold
-            return [r for r in results if r["score"] >= score_threshold]
+                    filter=qdrant_filter,
+                    params=search_params(info.quantization),
+                    score_threshold=score_threshold,
+                    with_payload=DOC_PAYLOAD_FIELDS if hydrate else False,
+                ) for vector in vectors
+            ]
+        responses = await self.aclient.query_batch_points(
+            collection_name=collection_name,
+            requests=requests,
+            timeout=settings.QDRANT_SEARCH_TIMEOUT
+        )
+        # score_threshold was applied server-side (to the dense branch for hybrid)
+        rankings = [[self._hit_to_doc(hit) for hit in response.points] for response in responses]
+        return rrf_fuse(rankings, settings.RRF_K)
+
+    def _build_filter(self, metadata_filter: Dict = None) -> models.Filter:
+        if not metadata_filter:
+            return None
+        return models.Filter(must=[
+            models.FieldCondition(key=key, match=models.MatchValue(value=value))
+            for key, value in metadata_filter.items()
+        ])
+
+    def _hit_to_doc(self, hit, score: float = None) -> Dict:
+        if not hit.payload:
+            # Not hydrated yet (with_payload=False)
+            return {"id": str(hit.id), "content": None, "score": hit.score if score is None else score, "source": None}
+        return {
+            "id": str(hit.id),
+            "content": hit.payload.get("content", ""),
+            "score": hit.score if score is None else score,
+            "source": hit.payload.get("source", "unknown"),
+        }
+
+    async def fetch_vectors(self, collection_name: str, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored dense vectors of the given points (no payload), keyed by point id."""
+        if not ids:
+            return {}
+        info = await collection_registry.get(collection_name, self.aclient.get_collection)
+        if not info.exists:
+            return {}
+        points = await self.aclient.retrieve(
+            collection_name=collection_name,
+            ids=ids,
+            with_payload=False,
+            with_vectors=[info.dense_vector] if info.dense_vector else True,
+        )
+        vectors = {}
+        for point in points:
+            vector = point.vector
+            if isinstance(vector, dict):
+                vector = vector.get(info.dense_vector)
+            if vector is not None:
+                vectors[str(point.id)] = vector
+        return vectors
+
+    async def hydrate(self, docs: List[Dict], collection_name: str = "knowledge_base") -> List[Dict]:
+        """
+        Fills "content"/"source" of lazily retrieved docs with one Qdrant call, keeping their
+        order. Docs whose point was deleted in the meantime are dropped.
+        """
+        missing = [d["id"] for d in docs if d.get("content") is None and d.get("id")]
+        if not missing:
+            return docs
+        try:
+            points = await self.aclient.retrieve(
+                collection_name=collection_name,
+                ids=missing,
+                with_payload=DOC_PAYLOAD_FIELDS,
+                with_vectors=False,
+            )
         except Exception as e:
-            print(f"Retrieval failed: {e}")
+            print(f"Hydration failed: {e}")
+            return [d for d in docs if d.get("content") is not None]
+        payloads = {str(point.id): point.payload or {} for point in points}
+        hydrated = []
+        for doc in docs:
+            if doc.get("content") is None:
+                payload = payloads.get(doc.get("id"))
+                if payload is None:
+                    continue
+                doc = dict(doc, content=payload.get("content", ""), source=payload.get("source", "unknown"))
+            hydrated.append(doc)
+        return hydrated
+
+    async def _search_keyword(self, query: str, collection_name: str, limit: int, qdrant_filter: models.Filter = None) -> List[Dict]:
+        """
+        BM25-ranked keyword search over the local inverted index; the top point ids are
+        then hydrated (and metadata-filtered) with one Qdrant call. Scores are relative
+        to the best match (top hit = 1.0); the raw BM25 score is in "bm25_score".
+        """
+        try:
+            await self._ensure_keyword_index(collection_name)
+            # Over-fetch when a metadata filter may drop candidates
+            fetch = limit * settings.KEYWORD_FILTER_OVERFETCH if qdrant_filter else limit
+            ranked = keyword_index.search(collection_name, query, fetch)
+        except Exception as e:
+            print(f"Keyword index search failed: {e}. Falling back to full-text filter.")
+            return await self._search_keyword_scroll(query, collection_name, limit, qdrant_filter)
+        if not ranked:
             return []
 
-    def _search_keyword(self, query: str, collection_name: str, limit: int, qdrant_filter: models.Filter = None) -> List[Dict]:
-        """Performs full-text keyword search."""
+        must_conditions = [models.HasIdCondition(has_id=[point_id for point_id, _ in ranked])]
+        if qdrant_filter and qdrant_filter.must:
+            must_conditions.extend(qdrant_filter.must)
+        points = (await self.aclient.scroll(
+            collection_name=collection_name,
+            scroll_filter=models.Filter(must=must_conditions),
+            limit=len(ranked),
+            with_payload=DOC_PAYLOAD_FIELDS,
+            with_vectors=False,
+        ))[0]
+        by_id = {str(point.id): point for point in points}
+
+        top_score = ranked[0][1] or 1.0
+        results = []
+        for point_id, score in ranked:
+            point = by_id.get(point_id)
+            if point is None:
+                continue
+            doc = self._hit_to_doc(point, score=score / top_score)
+            doc["bm25_score"] = score
+            results.append(doc)
+            if len(results) >= limit:
+                break
+        return results
+
+    async def _search_keyword_scroll(self, query: str, collection_name: str, limit: int, qdrant_filter: models.Filter = None) -> List[Dict]:
+        """Unranked full-text filter match (fallback when the local index is unavailable)."""
         must_conditions = [
             models.FieldCondition(
                 key="content",
@@ -284,33 +812,79 @@ class QdrantRetriever:
         if qdrant_filter and qdrant_filter.must:
             must_conditions.extend(qdrant_filter.must)
 
-        search_result = self.client.scroll(
+        search_result = (await self.aclient.scroll(
             collection_name=collection_name,
             scroll_filter=models.Filter(must=must_conditions),
             limit=limit,
-            with_payload=True
-        )[0]
+            with_payload=DOC_PAYLOAD_FIELDS
+        ))[0]
         
         # Keyword search via scroll/filter doesn't provide a relevance score in the same way query_points does.
         # We assign a dummy high score for matched keywords to surface them.
-        return [
-            {"content": hit.payload.get("content", ""), "score": 1.0, "source": hit.payload.get("source", "unknown")}
-            for hit in search_result
+        return [self._hit_to_doc(hit, score=1.0) for hit in search_result]
+
+    async def _search_hybrid(self, query: str, collection_name: str, limit: int, qdrant_filter: models.Filter = None, info: CollectionInfo = None, score_threshold: float = 0.0, hydrate: bool = True) -> List[Dict]:
+        """
+        Dense + BM25 sparse search fused server-side (prefetch + RRF/DBSF) in a single
+        request. Collections created before the sparse vector existed fall back to the
+        legacy vector/keyword merge.
+        """
+        if info is None or not info.sparse_vector:
+            return await self._search_hybrid_merge(query, collection_name, limit, qdrant_filter, info, score_threshold)
+        vector = await self._aembed(query)
+        response = await self.aclient.query_points(
+            collection_name=collection_name,
+            **self._hybrid_query(vector, query, limit, qdrant_filter, info, score_threshold),
+            query_filter=qdrant_filter,
+            with_payload=DOC_PAYLOAD_FIELDS if hydrate else False,
+            timeout=settings.QDRANT_SEARCH_TIMEOUT,
+        )
+        return [self._hit_to_doc(hit) for hit in response.points]
+
+    def _hybrid_query(self, vector: List[float], query: str, limit: int, qdrant_filter: models.Filter, info: CollectionInfo, score_threshold: float = 0.0) -> Dict:
+        """prefetch/query/limit arguments shared by query_points and batch QueryRequests."""
+        prefetch_limit = limit * settings.HYBRID_PREFETCH_FACTOR
+        indices, values = sparse_encoder.encode_query(query)
+        prefetch = [
+            models.Prefetch(
+                query=vector,
+                using=info.dense_vector,
+                limit=prefetch_limit,
+                filter=qdrant_filter,
+                params=search_params(info.quantization),
+                score_threshold=score_threshold or None,
+            )
         ]
+        if indices:
+            prefetch.append(models.Prefetch(
+                query=models.SparseVector(indices=indices, values=values),
+                using=info.sparse_vector,
+                limit=prefetch_limit,
+                filter=qdrant_filter,
+            ))
+        fusion = models.Fusion.DBSF if settings.HYBRID_FUSION == "dbsf" else models.Fusion.RRF
+        return {"prefetch": prefetch, "query": models.FusionQuery(fusion=fusion), "limit": limit}
 
-    async def _search_hybrid(self, query: str, collection_name: str, limit: int, qdrant_filter: models.Filter = None) -> List[Dict]:
-        """Combines vector and keyword search results using a simple merge."""
+    async def _search_hybrid_merge(self, query: str, collection_name: str, limit: int, qdrant_filter: models.Filter = None, info: CollectionInfo = None, score_threshold: float = 0.0) -> List[Dict]:
+        """Combines vector and keyword search results using a simple merge (legacy collections)."""
         # 1. Vector Search
-        vector = self._embed(query)
-        vec_results = self.client.query_points(
-            collection_name=collection_name,
-            query=vector,
-            limit=limit,
-            query_filter=qdrant_filter
-        ).points
-        
-        # 2. Keyword Search
-        kw_results = self._search_keyword(query, collection_name, limit, qdrant_filter)
+        vector = await self._aembed(query)
+        vec_response, kw_results = await asyncio.gather(
+            self.aclient.query_points(
+                collection_name=collection_name,
+                query=vector,
+                using=info.dense_vector if info else None,
+                limit=limit,
+                query_filter=qdrant_filter,
+                search_params=search_params(info.quantization) if info else None,
+                score_threshold=score_threshold,
+                with_payload=DOC_PAYLOAD_FIELDS,
+                timeout=settings.QDRANT_SEARCH_TIMEOUT
+            ),
+            # 2. Keyword Search (runs concurrently with the vector query)
+            self._search_keyword(query, collection_name, limit, qdrant_filter),
+        )
+        vec_results = vec_response.points
         
         # 3. Simple Merge (Priority to Keyword matches if exact, otherwise Vector)
         # In production, RRF (Reciprocal Rank Fusion) is preferred.
@@ -327,29 +901,68 @@ class QdrantRetriever:
         for hit in vec_results:
             content = hit.payload.get("content", "")
             if content not in seen_contents:
-                merged.append({"content": content, "score": hit.score, "source": hit.payload.get("source", "unknown")})
+                merged.append(self._hit_to_doc(hit))
                 seen_contents.add(content)
                 
         return merged[:limit]
 
     def _embed(self, text: str) -> List[float]:
-        # 1. Check Binding Strategy
-        if settings.EMBEDDING_BINDING == "openai":
-            from langchain_openai import OpenAIEmbeddings
-            embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
-            return embeddings.embed_query(text)
-        
-        # 2. Default to Ollama (Local)
+        key = embedding_cache.make_key(embedding_client.binding, embedding_client.model_name, text)
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            return cached
         try:
-            from langchain_ollama import OllamaEmbeddings
-            embeddings = OllamaEmbeddings(
-                base_url=settings.EMBEDDING_BINDING_HOST,
-                model=settings.EMBEDDING_MODEL
-            )
-            return embeddings.embed_query(text)
+            vector = embedding_client.embed_query(text)
+        except Exception as e:
+            print(f"Embedding ({embedding_client.binding}/{embedding_client.model_name}) failed: {e}. using dummy.")
+            self.embed_fallbacks += 1
+            return [0.1] * settings.EMBEDDING_DIM
+        embedding_cache.put(key, vector)
+        return vector
+
+    async def _aembed(self, text: str) -> List[float]:
+        key = embedding_cache.make_key(embedding_client.binding, embedding_client.model_name, text)
+        cached = await embedding_cache.aget(key)
+        if cached is not None:
+            return cached
+        try:
+            vector = await embedding_client.aembed_query(text)
         except Exception as e:
-            print(f"Ollama embedding ({settings.EMBEDDING_MODEL}) failed: {e}. using dummy.")
-            return [0.1] * 1024
+            print(f"Embedding ({embedding_client.binding}/{embedding_client.model_name}) failed: {e}. using dummy.")
+            self.embed_fallbacks += 1
+            return [0.1] * settings.EMBEDDING_DIM
+        # Dummy fallback vectors are never cached
+        await embedding_cache.aput(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Cached query embedding that raises on embedder failure instead of a dummy vector."""
+        key = embedding_cache.make_key(embedding_client.binding, embedding_client.model_name, text)
+        vector = await embedding_cache.aget(key)
+        if vector is None:
+            vector = await embedding_client.aembed_query(text)
+            await embedding_cache.aput(key, vector)
+        return vector
+
+    async def _aembed_many(self, texts: List[str]) -> List[List[float]]:
+        """Cache-aware batch query embedding: only the misses go to the embedder, in one call."""
+        keys = [embedding_cache.make_key(embedding_client.binding, embedding_client.model_name, t) for t in texts]
+        vectors = await embedding_cache.aget_many(keys)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            try:
+                # Ollama/OpenAI embed queries and documents identically, so one batch call serves all
+                embedded = await embedding_client.aembed_documents([texts[i] for i in missing])
+            except Exception as e:
+                print(f"Embedding ({embedding_client.binding}/{embedding_client.model_name}) failed: {e}. using dummy.")
+                self.embed_fallbacks += 1
+                embedded = None
+            for n, i in enumerate(missing):
+                vectors[i] = [0.1] * settings.EMBEDDING_DIM if embedded is None else embedded[n]
+            if embedded is not None:
+                # One disk write (executemany + commit) for the whole batch
+                await embedding_cache.aput_many([(keys[i], embedded[n]) for n, i in enumerate(missing)])
+        return vectors
 
 # Singleton instance
 retriever = QdrantRetriever()
@@ -0,0 +1,61 @@
+import re
+import zlib
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def simple_tokenize(text: str) -> List[str]:
+    """Lowercased unicode word tokens (Hangul, Latin and digits alike)."""
+    return _WORD.findall(text.lower())
+
+
+def token_index(token: str) -> int:
+    """Stable 32-bit index for a token, so no vocabulary has to be stored or shared."""
+    return zlib.crc32(token.encode("utf-8"))
+
+
+class BM25SparseEncoder:
+    """
+    Encodes text into sparse vectors for Qdrant's BM25-style scoring.
+
+    Documents carry the BM25 term-frequency component
+        tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avg_doc_len))
+    and the IDF part is applied server-side by a sparse vector configured with
+    `modifier=IDF`, so weights never need re-computing as the collection grows.
+    Queries are the set of their terms with weight 1.0.
+    """
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_len: float = 200.0, tokenizer: Callable[[str], List[str]] = simple_tokenize):
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_len = avg_doc_len
+        self.tokenizer = tokenizer
+
+    def encode_document(self, text: str) -> Tuple[List[int], List[float]]:
+        tokens = self.tokenizer(text)
+        if not tokens:
+            return [], []
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_doc_len)
+        weights: Dict[int, float] = {}
+        for token, tf in Counter(tokens).items():
+            # Hash collisions simply add up, as they would for a repeated term
+            index = token_index(token)
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        indices = sorted(weights)
+        return indices, [weights[i] for i in indices]
+
+    def encode_query(self, text: str) -> Tuple[List[int], List[float]]:
+        indices = sorted({token_index(token) for token in self.tokenizer(text)})
+        return indices, [1.0] * len(indices)
+
+
+# Singleton instance
+sparse_encoder = BM25SparseEncoder(
+    k1=settings.BM25_K1,
+    b=settings.BM25_B,
+    avg_doc_len=settings.BM25_AVG_DOC_LEN,
+)
@@ -0,0 +1,89 @@
+from typing import Dict, Optional
+from qdrant_client.http import models
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Collection storage layouts (applied when a collection is created).
+# RAM per 1024-d vector: default ~4 KB float32; scalar int8 ~1 KB; binary ~128 B.
+# Quantized collections keep the compact vectors in RAM, the originals on disk, and
+# rescore the oversampled candidates with the originals at query time.
+STORAGE_PROFILES = {
+    "default": {"quantization": None, "on_disk": False, "on_disk_payload": False, "hnsw_m": 16, "hnsw_ef_construct": 100, "hnsw_on_disk": False},
+    "scalar": {"quantization": "scalar", "on_disk": True, "on_disk_payload": False, "hnsw_m": 16, "hnsw_ef_construct": 100, "hnsw_on_disk": False},
+    "binary": {"quantization": "binary", "on_disk": True, "on_disk_payload": False, "hnsw_m": 16, "hnsw_ef_construct": 128, "hnsw_on_disk": False},
+    "low_memory": {"quantization": "scalar", "on_disk": True, "on_disk_payload": True, "hnsw_m": 8, "hnsw_ef_construct": 64, "hnsw_on_disk": True},
+}
+
+
+def get_profile(name: Optional[str] = None) -> Dict:
+    name = name or settings.COLLECTION_STORAGE_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile '{name}'. Available: {list(STORAGE_PROFILES)}")
+    return STORAGE_PROFILES[name]
+
+
+def collection_config(profile_name: Optional[str] = None) -> Dict:
+    """create_collection arguments: named dense + BM25 sparse vectors laid out per profile."""
+    profile = get_profile(profile_name)
+    quantization_config = None
+    if profile["quantization"] == "scalar":
+        quantization_config = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif profile["quantization"] == "binary":
+        quantization_config = models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return {
+        "vectors_config": {
+            settings.DENSE_VECTOR_NAME: models.VectorParams(
+                size=settings.EMBEDDING_DIM,
+                distance=models.Distance.COSINE,
+                on_disk=profile["on_disk"],
+            ),
+        },
+        "sparse_vectors_config": {
+            settings.SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                modifier=models.Modifier.IDF,
+                index=models.SparseIndexParams(on_disk=profile["on_disk"]),
+            ),
+        },
+        "hnsw_config": models.HnswConfigDiff(
+            m=profile["hnsw_m"],
+            ef_construct=profile["hnsw_ef_construct"],
+            on_disk=profile["hnsw_on_disk"],
+        ),
+        "quantization_config": quantization_config,
+        "on_disk_payload": profile["on_disk_payload"],
+    }
+
+
+def search_params(quantization: Optional[str]) -> Optional[models.SearchParams]:
+    """
+    Query-time parameters for a collection with the given quantization type
+    (CollectionInfo.quantization): rescoring with oversampling, plus HNSW_EF_SEARCH.
+    """
+    quantization_params = None
+    if quantization:
+        oversampling = settings.BINARY_OVERSAMPLING if "Binary" in quantization else settings.QUANTIZATION_OVERSAMPLING
+        quantization_params = models.QuantizationSearchParams(
+            rescore=settings.QUANTIZATION_RESCORE,
+            oversampling=oversampling,
+        )
+    if quantization_params is None and settings.HNSW_EF_SEARCH is None:
+        return None
+    return models.SearchParams(hnsw_ef=settings.HNSW_EF_SEARCH, quantization=quantization_params)
+
+
+def estimate_memory(points: int, profile_name: Optional[str] = None, dim: int = None) -> Dict:
+    """Rough RAM/disk footprint (bytes) of the dense vectors and HNSW graph for a profile."""
+    profile = get_profile(profile_name)
+    dim = dim or settings.EMBEDDING_DIM
+    original = points * dim * 4
+    quantized = {"scalar": points * dim, "binary": points * dim // 8}.get(profile["quantization"], 0)
+    # Layer-0 links dominate the graph: 2*m neighbours of 4 bytes per point
+    graph = points * profile["hnsw_m"] * 2 * 4
+    ram = quantized + (0 if profile["on_disk"] else original) + (0 if profile["hnsw_on_disk"] else graph)
+    disk = (original if profile["on_disk"] else 0) + (graph if profile["hnsw_on_disk"] else 0)
+    return {"ram_bytes": ram, "disk_bytes": disk}
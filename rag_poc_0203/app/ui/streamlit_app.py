@@ -12,6 +12,8 @@ API_URL = "http://127.0.0.1:8000/chat"
 EVAL_API_URL = "http://127.0.0.1:8000/eval/run"
 COLLECTIONS_API_URL = "http://127.0.0.1:8000/rag/collections"
 INGEST_API_URL = "http://127.0.0.1:8000/rag/ingest"
+INGEST_STREAM_API_URL = "http://127.0.0.1:8000/rag/ingest/stream"
+INGEST_JOBS_API_URL = "http://127.0.0.1:8000/rag/jobs"
 FEEDBACK_API_URL = "http://127.0.0.1:8000/chat/feedback"
 LANGFUSE_HOST = os.getenv("LANGFUSE_HOST", "http://localhost:3000")
 DATA_PATH = "data/golden_set.json"
@@ -38,15 +40,38 @@ with tab_chat:
         st.divider()
         st.header("🕒 대화 기록 (History)")
         
-        @st.cache_data(ttl=10)
         def get_all_sessions():
+            # Conditional request: an unchanged session list costs a 304 with no body
+            etag, cached_sessions = st.session_state.get("sessions_cache", (None, []))
             try:
-                resp = requests.get("http://127.0.0.1:8000/chat/sessions")
+                resp = requests.get(
+                    "http://127.0.0.1:8000/api/v1/chat/sessions",
+                    params={"limit": 50},
+                    headers={"If-None-Match": etag} if etag else {}
+                )
+                if resp.status_code == 304:
+                    return cached_sessions
                 if resp.status_code == 200:
-                    return resp.json()
-                return []
+                    sessions = resp.json()["sessions"]
+                    st.session_state["sessions_cache"] = (resp.headers.get("ETag"), sessions)
+                    return sessions
+                return cached_sessions
             except:
-                return []
+                return cached_sessions
+
+        def get_session_messages(session_id):
+            messages, cursor = [], None
+            while True:
+                resp = requests.get(
+                    f"http://127.0.0.1:8000/api/v1/chat/sessions/{session_id}/messages",
+                    params={"limit": 500, "cursor": cursor}
+                )
+                resp.raise_for_status()
+                page = resp.json()
+                messages.extend(page["messages"])
+                cursor = page["next_cursor"]
+                if not cursor:
+                    return messages
 
         sessions = get_all_sessions()
         if sessions:
@@ -72,13 +97,11 @@ with tab_chat:
             if target_sid != st.session_state.current_session_id:
                 # Load selected session
                 try:
-                    msg_resp = requests.get(f"http://127.0.0.1:8000/chat/sessions/{target_sid}/messages")
-                    if msg_resp.status_code == 200:
-                        st.session_state.messages = msg_resp.json()
-                        st.session_state.current_session_id = target_sid
-                        st.session_state.pop("last_trace_id", None)
-                        st.session_state.pop("last_retrieved_docs", None)
-                        st.rerun()
+                    st.session_state.messages = get_session_messages(target_sid)
+                    st.session_state.current_session_id = target_sid
+                    st.session_state.pop("last_trace_id", None)
+                    st.session_state.pop("last_retrieved_docs", None)
+                    st.rerun()
                 except Exception as e:
                     st.error(f"대화 로드 실패: {e}")
 
@@ -176,7 +199,18 @@ with tab_chat:
             graph_mode = st.selectbox("그래프 검색 모드 (Graph Mode)", options=["local", "global", "hybrid", "naive"], index=2)
             st.info("💡 Graph Search는 데이터 간의 관계를 분석하여 정교한 답변을 생성합니다.")
 
-        use_reranker = st.checkbox("Reranking 적용 (정확도 향상)", value=False)
+        rerank_mode = st.selectbox(
+            "Reranking 방식",
+            options=["mmr", "vector", "llm", "none"],
+            index=0,
+            help="mmr: 유사도+다양성 (빠름) / vector: 유사도 / llm: LLM 재정렬 (느림) / none: 검색 순서"
+        )
+        pipeline_mode = st.radio(
+            "파이프라인 모드",
+            options=["full", "adaptive"],
+            horizontal=True,
+            help="adaptive: 검색 신뢰도가 높으면 쿼리 확장/재정렬/관련성 평가를 건너뜁니다."
+        )
         score_threshold = st.slider("최소 유사도 점수 (Score Threshold)", min_value=0.0, max_value=1.0, value=0.0, step=0.05)
         
         st.subheader("🎯 메타데이터 필터")
@@ -225,7 +259,8 @@ with tab_chat:
                     "prompt_map": prompt_map,
                     "collection_name": selected_collection,
                     "top_k": top_k,
-                    "use_reranker": use_reranker,
+                    "rerank_mode": rerank_mode,
+                    "pipeline_mode": pipeline_mode,
                     "search_type": search_type,
                     "graph_mode": graph_mode,
                     "score_threshold": score_threshold,
@@ -265,12 +300,11 @@ with tab_chat:
                                             status_placeholder.info("⚙️ **작업 수행 및 답변 생성 중...**")
                                         elif node_name == "critic":
                                             status_placeholder.info("🧐 **답변 검증 및 품질 평가 중...** (Refinement Loop)")
-                                        elif node_name == "summarize":
-                                            status_placeholder.info("🧠 **대화 요약 및 기억 업데이트 중...**")
                                         elif node_name == "generate":
                                             status_placeholder.empty()
                                     elif data["event"] == "done":
                                         st.session_state["last_retrieved_docs"] = data.get("retrieved_docs", [])
+                                        st.session_state["last_pipeline"] = data.get("pipeline")
                                         status_placeholder.empty()
 
                 answer = message_placeholder.write_stream(stream_generator())
@@ -296,6 +330,11 @@ with tab_chat:
             else:
                 st.warning("추출된 문서가 없습니다. (Self-RAG에 의해 거절되었거나 검색 결과가 없을 수 있습니다.)")
             
+            pipeline = st.session_state.get("last_pipeline")
+            if pipeline and pipeline.get("skipped"):
+                skipped = ", ".join(f"{s['node']} ({s['reason']})" for s in pipeline["skipped"])
+                st.caption(f"⚡ 생략된 단계: {skipped} · 절약 추정 {pipeline['saved_ms']:.0f} ms")
+            
             st.markdown(f"🔗 [Langfuse에서 트레이스 자세히 보기]({LANGFUSE_HOST}/project/project-123/traces/{curr_trace_id})")
 
         st.subheader("📬 답변 평가 및 분석")
@@ -318,6 +357,22 @@ with tab_data:
         uploaded_file = st.file_uploader("파일 업로드", type=["pdf", "txt", "md", "json", "csv", "py"])
         target_collection = st.text_input("컬렉션 이름", value="knowledge_base")
         ingest_preset = st.selectbox("청킹 프리셋", options=["general", "legal", "code", "granular"])
+        storage_profile = st.selectbox(
+            "저장 프로파일 (새 컬렉션에만 적용)",
+            options=["default", "scalar", "binary", "low_memory"],
+            format_func=lambda x: {
+                "default": "default (float32, 메모리)",
+                "scalar": "scalar (int8 양자화, 원본 디스크)",
+                "binary": "binary (1bit 양자화, 원본 디스크)",
+                "low_memory": "low_memory (int8 + 페이로드/HNSW 디스크)",
+            }[x]
+        )
+        length_unit = st.radio(
+            "청크 길이 단위",
+            options=["chars", "tokens"],
+            horizontal=True,
+            format_func=lambda x: {"chars": "문자 수", "tokens": "토큰 수 (임베딩 토크나이저)"}[x]
+        )
         
         c1, c2 = st.columns(2)
         with c1:
@@ -325,38 +380,80 @@ with tab_data:
         with c2:
             overlap_percent = st.slider("오버랩 (%)", 0, 50, 10, 5)
             chunk_overlap = int(chunk_size * (overlap_percent / 100))
-            st.caption(f"실제 오버랩: {chunk_overlap} 자")
+            st.caption(f"실제 오버랩: {chunk_overlap} {'토큰' if length_unit == 'tokens' else '자'}")
 
         if st.button("🚀 실행"):
             if uploaded_file:
-                with st.spinner("적재 중..."):
-                    try:
-                        file_content = ""
-                        if uploaded_file.name.lower().endswith('.pdf'):
-                            import tempfile, pdf4llm
-                            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                                tmp.write(uploaded_file.getvalue())
-                                tmp_path = tmp.name
-                            file_content = pdf4llm.to_markdown(tmp_path)
-                            os.remove(tmp_path)
-                        else:
-                            file_content = uploaded_file.getvalue().decode("utf-8")
-                        
-                        payload = {
-                            "text": file_content,
-                            "collection_name": target_collection,
-                            "filename": uploaded_file.name,
-                            "chunk_size": chunk_size,
-                            "chunk_overlap": chunk_overlap,
-                            "preset": ingest_preset
-                        }
-                        resp = requests.post(INGEST_API_URL, json=payload)
-                        if resp.status_code == 200:
-                            st.success(f"적재 완료! {resp.json().get('message')}")
-                        else:
-                            st.error(f"적재 실패: {resp.text}")
-                    except Exception as e:
-                        st.error(f"적재 오류: {e}")
+                try:
+                    # Send the raw file as a background job; the server converts PDFs page by
+                    # page and chunks/embeds the stream in bounded windows.
+                    params = {
+                        "collection_name": target_collection,
+                        "filename": uploaded_file.name,
+                        "chunk_size": chunk_size,
+                        "chunk_overlap": chunk_overlap,
+                        "preset": ingest_preset,
+                        "graph_index": True,
+                        "length_unit": length_unit,
+                        "storage_profile": storage_profile
+                    }
+                    uploaded_file.seek(0)
+                    resp = requests.post(
+                        f"{INGEST_JOBS_API_URL}/upload",
+                        params=params,
+                        data=uploaded_file,
+                        headers={"Content-Type": "application/octet-stream"}
+                    )
+                    if resp.status_code == 200 and resp.json().get("job_id"):
+                        st.session_state.ingest_job_id = resp.json()["job_id"]
+                    else:
+                        st.error(f"적재 실패: {resp.text}")
+                except Exception as e:
+                    st.error(f"적재 오류: {e}")
+
+        job_id = st.session_state.get("ingest_job_id")
+        if job_id:
+            import time
+            status_box = st.empty()
+            progress_bar = st.progress(0.0)
+            cancel_clicked = st.button("⏹ 적재 취소", key=f"cancel_{job_id}")
+            if cancel_clicked:
+                requests.delete(f"{INGEST_JOBS_API_URL}/{job_id}")
+            try:
+                while True:
+                    job = requests.get(f"{INGEST_JOBS_API_URL}/{job_id}").json()
+                    progress = job.get("progress", {})
+                    chunks = progress.get("chunks", 0)
+                    done = progress.get("upserted", 0) + progress.get("unchanged", 0) + progress.get("failed", 0)
+                    progress_bar.progress(min(1.0, done / chunks) if chunks else 0.0)
+                    status_box.info(
+                        f"상태: {job.get('status')} | 그래프: {job.get('graph_status')} | "
+                        f"청크 {done}/{chunks} (신규 {progress.get('new', 0)}, 유지 {progress.get('unchanged', 0)}, "
+                        f"삭제 {progress.get('removed', 0)}) | 그래프 윈도우 {progress.get('graph_windows_indexed', 0)}"
+                    )
+                    if job.get("status") in ("completed", "partial", "failed", "cancelled"):
+                        break
+                    time.sleep(1)
+                if job.get("status") == "completed":
+                    progress_bar.progress(1.0)
+                    st.success("적재 완료!")
+                    chunk_lengths = job.get("stats", {}).get("chunk_lengths")
+                    if chunk_lengths:
+                        st.caption(f"청크 길이 분포: {chunk_lengths} (길이 측정: {job['stats'].get('tokenizer', 'chars')})")
+                    if job.get("error"):
+                        st.warning(f"그래프 인덱싱 실패: {job['error']}")
+                elif job.get("status") == "partial":
+                    st.warning(
+                        f"일부 청크 임베딩 실패 ({progress.get('failed', 0)}개): 이전 버전의 청크를 유지했습니다. "
+                        f"다시 적재하면 업데이트가 완료됩니다."
+                    )
+                elif job.get("status") == "failed":
+                    st.error(f"적재 실패: {job.get('error')}")
+                else:
+                    st.warning("적재가 취소되었습니다.")
+                del st.session_state.ingest_job_id
+            except Exception as e:
+                st.error(f"작업 상태 조회 오류: {e}")
 
 # --- TAB 3: Evaluation ---
 with tab_eval:
@@ -0,0 +1,139 @@
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+# Fix path to import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qdrant_client.http import models
+from app.rag.retriever import retriever
+from app.rag.collection_registry import collection_registry
+
+LEGACY_COLLECTION = "bench_hybrid_legacy"
+SPARSE_COLLECTION = "bench_hybrid_sparse"
+
+TEAMS = ["결제", "검색", "인프라", "보안", "데이터", "모바일", "플랫폼", "추천", "광고", "고객지원"]
+PRODUCTS = ["정산 시스템", "주문 API", "로그 수집기", "추천 엔진", "인증 서버", "배치 스케줄러", "메시지 큐", "이미지 변환기"]
+ISSUES = ["메모리 누수", "응답 지연", "중복 결제", "데이터 유실", "인증 만료", "디스크 부족", "타임아웃", "캐시 오염"]
+
+
+def make_corpus(n_docs: int, seed: int = 7):
+    """
+    Labelled synthetic incident reports. Each doc has a unique ticket code (exact-match
+    queries) and a unique product/issue pair (paraphrased natural-language queries).
+    """
+    rng = random.Random(seed)
+    docs, queries = [], []
+    pairs = [(p, i) for p in PRODUCTS for i in ISSUES]
+    for n in range(n_docs):
+        code = f"INC-{rng.randint(1000, 9999)}-{n}"
+        product, issue = pairs[n % len(pairs)]
+        team = rng.choice(TEAMS)
+        month = rng.randint(1, 12)
+        doc = (
+            f"[{code}] {team}팀은 {product}에서 발생한 {issue} 장애를 {month}월에 해결했다. "
+            f"원인 분석 결과 배포 설정 변경이 영향을 주었으며 재발 방지를 위해 모니터링을 추가했다. (v{n})"
+        )
+        docs.append(doc)
+        queries.append(("exact", f"{code} 장애 내용", n))
+        if n < len(pairs):
+            queries.append(("semantic", f"{product}의 {issue} 문제는 어떻게 해결됐나요?", n))
+    return docs, queries
+
+
+async def create_collections(reset: bool):
+    existing = await retriever.alist_collections()
+    for name in (LEGACY_COLLECTION, SPARSE_COLLECTION):
+        if name in existing and reset:
+            await retriever.aclient.delete_collection(name)
+            collection_registry.invalidate(name)
+    existing = await retriever.alist_collections()
+
+    if LEGACY_COLLECTION not in existing:
+        # Pre-sparse layout: single unnamed dense vector + full-text index
+        await retriever.aclient.create_collection(
+            collection_name=LEGACY_COLLECTION,
+            vectors_config=models.VectorParams(size=1024, distance=models.Distance.COSINE),
+        )
+        await retriever.aclient.create_payload_index(
+            collection_name=LEGACY_COLLECTION,
+            field_name="content",
+            field_schema=models.TextIndexParams(type="text", tokenizer=models.TokenizerType.MULTILINGUAL, lowercase=True),
+        )
+        collection_registry.invalidate(LEGACY_COLLECTION)
+    # Current layout: named dense + BM25 sparse
+    await retriever._ensure_ingest_collection(SPARSE_COLLECTION)
+
+
+async def measure(search, queries, top_k: int):
+    latencies = []
+    hits = {"exact": [], "semantic": []}
+    ranks = []
+    for kind, query, target in queries:
+        started = time.perf_counter()
+        results = await search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = [i for i, r in enumerate(results[:top_k]) if f"(v{target})" in r["content"]]
+        hits[kind].append(1 if found else 0)
+        ranks.append(1.0 / (found[0] + 1) if found else 0.0)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "recall_exact": sum(hits["exact"]) / max(1, len(hits["exact"])),
+        "recall_semantic": sum(hits["semantic"]) / max(1, len(hits["semantic"])),
+        "mrr": sum(ranks) / len(ranks),
+    }
+
+
+async def main_async(args):
+    docs, queries = make_corpus(args.docs)
+    queries = queries[:args.queries] if args.queries else queries
+    await create_collections(args.reset)
+    for name in (LEGACY_COLLECTION, SPARSE_COLLECTION):
+        stats = await retriever._embed_and_upsert(name, docs, "bench_hybrid.txt")
+        print(f"{name}: {stats['new']} new, {stats['unchanged']} unchanged")
+
+    legacy_info = await collection_registry.get(LEGACY_COLLECTION, retriever.aclient.get_collection)
+    sparse_info = await collection_registry.get(SPARSE_COLLECTION, retriever.aclient.get_collection)
+    # Warm the query embedding cache so both paths measure search latency only
+    await retriever._aembed_many([q for _, q, _ in queries])
+
+    variants = {
+        "legacy merge": lambda q: retriever._search_hybrid_merge(q, LEGACY_COLLECTION, args.top_k, None, legacy_info),
+        "sparse+fusion": lambda q: retriever._search_hybrid(q, SPARSE_COLLECTION, args.top_k, None, sparse_info),
+    }
+    print(f"\n{len(docs)} docs, {len(queries)} queries, top_k={args.top_k}, repeat={args.repeat}")
+    print(f"{'variant':<15}{'p50 ms':>10}{'p95 ms':>10}{'R@k exact':>12}{'R@k sem':>10}{'MRR':>8}")
+    for label, search in variants.items():
+        results = [await measure(search, queries, args.top_k) for _ in range(args.repeat)]
+        best = min(results, key=lambda r: r["p50_ms"])
+        print(
+            f"{label:<15}{best['p50_ms']:>10.2f}{best['p95_ms']:>10.2f}"
+            f"{best['recall_exact']:>12.3f}{best['recall_semantic']:>10.3f}{best['mrr']:>8.3f}"
+        )
+
+    if not args.keep:
+        for name in (LEGACY_COLLECTION, SPARSE_COLLECTION):
+            await retriever.aclient.delete_collection(name)
+            collection_registry.invalidate(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy hybrid merge with sparse BM25 + server-side fusion.")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=0, help="Limit the query set (0 = all)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reset", action="store_true", help="Recreate the benchmark collections")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark collections afterwards")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
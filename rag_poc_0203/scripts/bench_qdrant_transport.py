@@ -0,0 +1,111 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import statistics
+import numpy as np
+
+# Fix path to import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+from app.core.config import get_settings
+from app.rag.qdrant_transport import make_async_client
+
+settings = get_settings()
+COLLECTION = "bench_transport"
+
+
+def random_vectors(n: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def setup_collection(client: AsyncQdrantClient, n_points: int, dim: int):
+    if await client.collection_exists(COLLECTION):
+        await client.delete_collection(COLLECTION)
+    await client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+    )
+    vectors = random_vectors(n_points, dim, seed=1)
+    for start in range(0, n_points, 512):
+        batch = vectors[start:start + 512]
+        await client.upsert(
+            collection_name=COLLECTION,
+            points=[
+                models.PointStruct(id=start + i, vector=v.tolist(), payload={"content": f"doc {start + i} " * 40})
+                for i, v in enumerate(batch)
+            ],
+            wait=True,
+        )
+
+
+async def run_queries(client: AsyncQdrantClient, queries: np.ndarray, concurrency: int, top_k: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(vector):
+        async with semaphore:
+            started = time.perf_counter()
+            await client.query_points(
+                collection_name=COLLECTION,
+                query=vector.tolist(),
+                limit=top_k,
+                with_payload=True,
+                timeout=settings.QDRANT_SEARCH_TIMEOUT,
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(v) for v in queries])
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "qps": len(queries) / wall,
+    }
+
+
+async def main_async(args):
+    clients = {
+        "rest (default client)": AsyncQdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY, check_compatibility=False),
+        "rest (pooled)": make_async_client(prefer_grpc=False),
+        "grpc": make_async_client(prefer_grpc=True),
+    }
+    await setup_collection(clients["rest (pooled)"], args.points, args.dim)
+    queries = random_vectors(args.queries, args.dim, seed=2)
+
+    print(f"{args.points} points, dim={args.dim}, {args.queries} queries, top_k={args.top_k}, pool={settings.QDRANT_POOL_SIZE}")
+    print(f"{'transport':<24}{'conc':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'QPS':>10}")
+    for concurrency in args.concurrency:
+        for label, client in clients.items():
+            await run_queries(client, queries[:20], concurrency, args.top_k)  # warm up connections
+            r = await run_queries(client, queries, concurrency, args.top_k)
+            print(f"{label:<24}{concurrency:>6}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}{r['qps']:>10.1f}")
+
+    if not args.keep:
+        await clients["rest (pooled)"].delete_collection(COLLECTION)
+    for client in clients.values():
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query latency of REST vs gRPC Qdrant transports.")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=settings.EMBEDDING_DIM)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark collection afterwards")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import sys
+import os
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import tempfile
+import statistics
+
+# Fix path to import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+BASE_TIME = datetime.datetime(2025, 1, 1)
+INDEXES = [
+    "ix_chat_messages_session_created_at_id",
+    "ix_chat_sessions_created_at_id",
+    "ix_chat_sessions_updated_at",
+]
+
+
+async def populate(n_sessions: int, n_messages: int, batch_size: int = 50000):
+    """n_sessions sessions sharing n_messages alternating user/assistant messages."""
+    from sqlalchemy import insert
+    from app.core.database import engine, ChatSession, ChatMessage
+
+    per_session = max(1, n_messages // n_sessions)
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        sessions = [
+            {
+                "id": f"bench-session-{s:07d}",
+                "created_at": BASE_TIME + datetime.timedelta(minutes=s),
+                "updated_at": BASE_TIME + datetime.timedelta(minutes=s, seconds=per_session),
+                "summary": f"bench session {s}",
+            }
+            for s in range(n_sessions)
+        ]
+        await conn.execute(insert(ChatSession.__table__), sessions)
+
+    batch = []
+    for n in range(n_messages):
+        s, k = n % n_sessions, n // n_sessions
+        batch.append({
+            "id": f"bench-message-{n:08d}",
+            "session_id": f"bench-session-{s:07d}",
+            "role": "user" if k % 2 == 0 else "assistant",
+            "content": f"benchmark message {k} of session {s}. " * 4,
+            "created_at": BASE_TIME + datetime.timedelta(minutes=s, seconds=k),
+        })
+        if len(batch) >= batch_size:
+            async with engine.begin() as conn:
+                await conn.execute(insert(ChatMessage.__table__), batch)
+            batch = []
+            print(f"  {n + 1:,} messages", end="\r")
+    if batch:
+        async with engine.begin() as conn:
+            await conn.execute(insert(ChatMessage.__table__), batch)
+    print(f"Populated {n_sessions:,} sessions / {n_messages:,} messages in {time.perf_counter() - start:.1f}s")
+
+
+async def timed(fn, runs: int):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+
+
+async def run_cases(n_sessions: int, runs: int, legacy_runs: int):
+    from sqlalchemy import select
+    from app.core.database import async_session, ChatSession, ChatMessage
+    from app.core import history
+
+    rng = random.Random(7)
+    session_ids = [f"bench-session-{s:07d}" for s in range(n_sessions)]
+
+    async with async_session() as db:
+        # Cursor deep into the session list, for keyset vs OFFSET
+        depth = n_sessions // 2
+        deep = (await db.execute(
+            select(ChatSession).order_by(ChatSession.created_at.desc(), ChatSession.id.desc()).offset(depth - 1).limit(1)
+        )).scalar_one()
+        deep_after = (deep.created_at, deep.id)
+
+        async def history_window():
+            session = await db.get(ChatSession, rng.choice(session_ids))
+            await history.load_history(db, session, with_pending=False)
+
+        async def messages_page():
+            await history.list_messages_page(db, rng.choice(session_ids), 100)
+
+        async def sessions_first_page():
+            await history.list_sessions_page(db, 50)
+
+        async def sessions_deep_keyset():
+            await history.list_sessions_page(db, 50, deep_after)
+
+        async def sessions_deep_offset():
+            await db.execute(
+                select(ChatSession).order_by(ChatSession.created_at.desc(), ChatSession.id.desc()).offset(depth).limit(50)
+            )
+
+        async def sessions_etag():
+            await history.sessions_etag(db, 50, None)
+
+        async def messages_etag():
+            await history.messages_etag(db, rng.choice(session_ids), 100, None)
+
+        async def legacy_all_sessions():
+            (await db.execute(select(ChatSession).order_by(ChatSession.created_at.desc()))).scalars().all()
+
+        async def legacy_all_messages():
+            (await db.execute(
+                select(ChatMessage).filter(ChatMessage.session_id == rng.choice(session_ids)).order_by(ChatMessage.created_at.asc())
+            )).scalars().all()
+
+        cases = [
+            ("history window (load_history)", history_window, runs),
+            ("messages page (limit=100)", messages_page, runs),
+            ("sessions page 1 (limit=50)", sessions_first_page, runs),
+            (f"sessions page @{depth:,} keyset", sessions_deep_keyset, runs),
+            (f"sessions page @{depth:,} OFFSET", sessions_deep_offset, max(1, runs // 10)),
+            ("sessions ETag check (304 path)", sessions_etag, runs),
+            ("messages ETag check (304 path)", messages_etag, runs),
+            ("legacy: all sessions", legacy_all_sessions, legacy_runs),
+            ("legacy: all messages of a session", legacy_all_messages, legacy_runs),
+        ]
+        results = []
+        for name, fn, n in cases:
+            db.expunge_all()
+            p50, p95 = await timed(fn, n)
+            results.append((name, p50, p95))
+            print(f"  {name:<38} p50 {p50:9.2f} ms   p95 {p95:9.2f} ms")
+        return results
+
+
+async def drop_indexes():
+    from sqlalchemy import text
+    from app.core.database import engine
+    async with engine.begin() as conn:
+        for name in INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+async def main(args):
+    from app.core.database import engine, init_db
+    await init_db()
+    if args.populate:
+        await populate(args.sessions, args.messages)
+
+    print("\nIndexed (composite indexes, keyset pagination):")
+    await run_cases(args.sessions, args.runs, args.legacy_runs)
+
+    if args.compare_unindexed:
+        print("\nWithout the composite indexes:")
+        await drop_indexes()
+        await run_cases(args.sessions, max(1, args.runs // 20), args.legacy_runs)
+        await init_db()  # Recreates the indexes
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Session/message API query latency at scale (SQLite).")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=200, help="Repetitions per indexed case")
+    parser.add_argument("--legacy-runs", type=int, default=5, help="Repetitions of the unpaginated legacy queries")
+    parser.add_argument("--compare-unindexed", action="store_true", help="Also run the cases with the indexes dropped")
+    parser.add_argument("--database-url", default=None, help="Defaults to a new temporary SQLite file")
+    parser.add_argument("--no-populate", dest="populate", action="store_false", help="Reuse an already populated --database-url")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_sessions.db')}"
+    # Must be set before app.core.database creates the engine
+    os.environ["DATABASE_URL"] = args.database_url
+    print(f"Database: {args.database_url}")
+
+    asyncio.run(main(args))
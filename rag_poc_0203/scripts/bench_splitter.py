@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+import random
+import argparse
+
+# Fix path to import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.rag.chunking import RecursiveCharacterTextSplitter, OffsetTextSplitter, CHUNK_PRESETS
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+ARTICLE_WORDS = [
+    "제1조", "(목적)", "이", "계약은", "갑과", "을", "사이의", "권리와", "의무를", "정함을", "목적으로", "한다.",
+    "당사자는", "신의성실의", "원칙에", "따라", "본", "계약을", "이행하여야", "하며,", "손해배상", "책임을", "진다.",
+    "The", "parties", "agree", "that", "this", "Agreement", "shall", "be", "governed", "by", "the", "laws", "of", "Korea.",
+]
+
+
+def make_legal_text(target_bytes: int, seed: int = 42) -> str:
+    """Generates a long legal-style document (articles, paragraphs, numbered clauses)."""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    article = 1
+    while size < target_bytes:
+        lines = [f"제{article}조 (조항 {article})"]
+        for clause in range(rng.randint(2, 6)):
+            words = [rng.choice(ARTICLE_WORDS) for _ in range(rng.randint(20, 120))]
+            lines.append(f"{clause + 1}. " + " ".join(words))
+        if rng.random() < 0.05:
+            # Occasional long unbroken run (tables, base64, hashes) to exercise the "" separator
+            lines.append("".join(rng.choice("가나다라마바사ABCDEF0123456789") for _ in range(rng.randint(2500, 5000))))
+        block = "\n".join(lines) + "\n\n"
+        parts.append(block)
+        size += len(block.encode("utf-8"))
+        article += 1
+    return "".join(parts)
+
+
+def make_dense_text(target_bytes: int, seed: int = 42) -> str:
+    """Generates text with long separator-free runs (e.g. PDF extraction without spaces/newlines)."""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < target_bytes:
+        run = "".join(rng.choice("가나다라마바사아자차카타파하") for _ in range(rng.randint(20000, 60000)))
+        block = run + "\n\n"
+        parts.append(block)
+        size += len(block.encode("utf-8"))
+    return "".join(parts)
+
+
+PROFILES = {"legal": make_legal_text, "dense": make_dense_text}
+
+
+def bench(splitter_cls, text: str, size: int, overlap: int, repeat: int):
+    best = float("inf")
+    chunks = None
+    for _ in range(repeat):
+        splitter = splitter_cls(chunk_size=size, chunk_overlap=overlap, separators=SEPARATORS)
+        started = time.perf_counter()
+        chunks = splitter.split_text(text)
+        best = min(best, time.perf_counter() - started)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offset splitter against the recursive splitter.")
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 4], help="Input sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--profile", choices=list(PROFILES), nargs="+", default=["legal", "dense"])
+    args = parser.parse_args()
+
+    print(f"{'profile':>7} {'size':>6} {'preset':>9} {'chunks':>7} {'recursive(s)':>13} {'offset(s)':>10} {'speedup':>8} identical")
+    for profile, mb in [(p, m) for p in args.profile for m in args.mb]:
+        text = PROFILES[profile](int(mb * 1024 * 1024))
+        for preset, config in CHUNK_PRESETS.items():
+            legacy_time, legacy_chunks = bench(RecursiveCharacterTextSplitter, text, config["size"], config["overlap"], args.repeat)
+            offset_time, offset_chunks = bench(OffsetTextSplitter, text, config["size"], config["overlap"], args.repeat)
+            identical = legacy_chunks == offset_chunks
+            print(
+                f"{profile:>7} {mb:>5}M {preset:>9} {len(offset_chunks):>7} {legacy_time:>13.3f} {offset_time:>10.3f} "
+                f"{legacy_time / offset_time:>7.1f}x {identical}"
+            )
+            if not identical:
+                print(f"   ❌ Chunk mismatch for preset '{preset}'")
+                sys.exit(1)
+
+    print("\n✅ Offset splitter output is identical for all presets.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+# Fix path to import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from qdrant_client.http import models
+from app.core.config import get_settings
+from app.rag.retriever import retriever
+from app.rag.embeddings import embedding_client
+from app.rag.storage_profiles import STORAGE_PROFILES, collection_config, search_params, estimate_memory
+
+settings = get_settings()
+
+FALLBACK_QUERIES = ["What is LangGraph?", "What framework is used for the API?"]
+
+
+def load_golden_queries(path: str):
+    """Queries from the golden set (data/golden_set.json: list of {"query"|"input": ...})."""
+    if not os.path.exists(path):
+        print(f"Golden set not found at {path}; using fallback queries.")
+        return FALLBACK_QUERIES
+    with open(path, "r") as f:
+        cases = json.load(f)
+    queries = []
+    for case in cases:
+        query = case.get("query") or case.get("input")
+        if isinstance(query, dict):
+            query = query.get("query") or query.get("input")
+        if query:
+            queries.append(str(query))
+    return queries or FALLBACK_QUERIES
+
+
+async def load_points(collection_name: str):
+    points = []
+    offset = None
+    while True:
+        page, offset = await retriever.aclient.scroll(
+            collection_name=collection_name,
+            limit=256,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        points.extend(page)
+        if offset is None:
+            break
+    return points
+
+
+def dense_vector(point):
+    if isinstance(point.vector, dict):
+        return point.vector.get(settings.DENSE_VECTOR_NAME) or next(iter(point.vector.values()))
+    return point.vector
+
+
+async def build_profile_collection(name: str, profile: str, points):
+    if await retriever.aclient.collection_exists(name):
+        await retriever.aclient.delete_collection(name)
+    config = collection_config(profile)
+    config.pop("sparse_vectors_config")
+    await retriever.aclient.create_collection(collection_name=name, **config)
+    for start in range(0, len(points), settings.UPSERT_PAGE_SIZE):
+        await retriever.aclient.upsert(
+            collection_name=name,
+            points=[
+                models.PointStruct(id=p.id, vector={settings.DENSE_VECTOR_NAME: dense_vector(p)}, payload=p.payload)
+                for p in points[start:start + settings.UPSERT_PAGE_SIZE]
+            ],
+            wait=True,
+        )
+    # Let the optimizer build HNSW/quantized segments before measuring
+    for _ in range(120):
+        info = await retriever.aclient.get_collection(name)
+        if str(info.status).lower().endswith("green"):
+            return info
+        await asyncio.sleep(1)
+    return info
+
+
+async def search(name: str, vector, top_k: int, params=None):
+    response = await retriever.aclient.query_points(
+        collection_name=name,
+        query=vector,
+        using=settings.DENSE_VECTOR_NAME,
+        limit=top_k,
+        search_params=params,
+        with_payload=False,
+    )
+    return [str(p.id) for p in response.points]
+
+
+async def main_async(args):
+    points = await load_points(args.collection)
+    if not points:
+        print(f"Collection '{args.collection}' is empty.")
+        return
+    queries = load_golden_queries(args.golden)
+    vectors = await embedding_client.aembed_documents(queries)
+    print(f"Source '{args.collection}': {len(points)} points; {len(queries)} golden-set queries; top_k={args.top_k}")
+
+    names = {profile: f"quant_report_{profile}" for profile in args.profiles}
+    infos = {}
+    for profile, name in names.items():
+        infos[profile] = await build_profile_collection(name, profile, points)
+
+    # Ground truth: exact (brute-force, full precision) search on the float32 copy
+    baseline = names.get("default") or names[args.profiles[0]]
+    truth = [await search(baseline, v, args.top_k, models.SearchParams(exact=True, quantization=models.QuantizationSearchParams(ignore=True))) for v in vectors]
+
+    dim = len(dense_vector(points[0]))
+    base_ram = estimate_memory(args.scale or len(points), "default", dim)["ram_bytes"]
+    print(f"\nMemory estimated for {args.scale or len(points)} points (dense vectors + HNSW graph)")
+    print(f"{'profile':<12}{'RAM MB':>10}{'disk MB':>10}{'RAM saved':>11}{'recall@k':>10}{'p50 ms':>9}")
+    for profile, name in names.items():
+        quantization = type(infos[profile].config.quantization_config).__name__ if infos[profile].config.quantization_config else None
+        params = search_params(quantization)
+        recalls, latencies = [], []
+        for v, expected in zip(vectors, truth):
+            started = time.perf_counter()
+            got = await search(name, v, args.top_k, params)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(set(got) & set(expected)) / max(1, len(expected)))
+        memory = estimate_memory(args.scale or len(points), profile, dim)
+        print(
+            f"{profile:<12}{memory['ram_bytes'] / 2**20:>10.1f}{memory['disk_bytes'] / 2**20:>10.1f}"
+            f"{1 - memory['ram_bytes'] / base_ram:>10.0%}{statistics.mean(recalls):>10.3f}{statistics.median(latencies):>9.2f}"
+        )
+
+    if not args.keep:
+        for name in names.values():
+            await retriever.aclient.delete_collection(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory saved vs recall impact of the vector storage profiles.")
+    parser.add_argument("--collection", default="knowledge_base", help="Source collection to copy vectors from")
+    parser.add_argument("--golden", default="data/golden_set.json")
+    parser.add_argument("--profiles", nargs="+", default=list(STORAGE_PROFILES), choices=list(STORAGE_PROFILES))
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=0, help="Project memory for this many points (0 = source size)")
+    parser.add_argument("--keep", action="store_true", help="Keep the per-profile collections afterwards")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import sys
+import os
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+
+# Fix path to import app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+class PoolMonitor:
+    """Checked-out connections of the engine's pool: current, peak and connection-seconds."""
+    def __init__(self, engine):
+        self.current = 0
+        self.peak = 0
+        self.connection_seconds = 0.0
+        self._last = time.perf_counter()
+        from sqlalchemy import event
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(engine.sync_engine, "checkin", self._on_checkin)
+
+    def _advance(self):
+        now = time.perf_counter()
+        self.connection_seconds += self.current * (now - self._last)
+        self._last = now
+
+    def _on_checkout(self, *args):
+        self._advance()
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def _on_checkin(self, *args):
+        self._advance()
+        self.current -= 1
+
+    def reset(self):
+        self._advance()
+        self.peak = self.current
+        self.connection_seconds = 0.0
+
+
+async def held_turn(session_id: str, duration: float):
+    """Previous flow: one DB session (and connection) open across the whole graph run."""
+    from app.core.database import async_session, ChatSession, ChatMessage
+    from app.core.history import load_history
+    async with async_session() as db:
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            session = ChatSession(id=session_id)
+            db.add(session)
+            await db.commit()
+        await load_history(db, session, with_pending=False)
+        await asyncio.sleep(duration)  # Graph run (LLM generation / streaming)
+        db.add_all([
+            ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role="user", content="question"),
+            ChatMessage(id=str(uuid.uuid4()), session_id=session_id, role="assistant", content="answer"),
+        ])
+        await db.commit()
+
+
+async def short_turn(session_id: str, duration: float):
+    """Current flow (app/api/server.py): begin_turn -> graph run -> save_turn."""
+    from app.core.history import begin_turn, save_turn
+    await begin_turn(session_id)
+    await asyncio.sleep(duration)  # Graph run (LLM generation / streaming)
+    await save_turn(session_id, "question", "answer")
+
+
+async def measure(args):
+    from app.core.database import engine, init_db
+    await init_db()
+    monitor = PoolMonitor(engine)
+    print(f"{'flow':<6} {'duration':>8} {'streams':>7} {'peak conns':>10} {'avg conns':>9} {'conn-seconds':>12} {'wall (s)':>8}")
+    rows = []
+    for name, turn in (("held", held_turn), ("short", short_turn)):
+        for duration in args.durations:
+            monitor.reset()
+            start = time.perf_counter()
+            await asyncio.gather(*(turn(f"verify-{name}-{duration}-{i}", duration) for i in range(args.streams)))
+            wall = time.perf_counter() - start
+            monitor._advance()
+            rows.append((name, duration, monitor.peak, monitor.connection_seconds, wall))
+            average = monitor.connection_seconds / wall if wall else 0.0
+            print(f"{name:<6} {duration:>8.2f} {args.streams:>7} {monitor.peak:>10} {average:>9.2f} {monitor.connection_seconds:>12.2f} {wall:>8.2f}")
+    await engine.dispose()
+    return rows
+
+
+def check(rows) -> bool:
+    """The short flow's connection usage must not grow with the stream duration."""
+    short = [r for r in rows if r[0] == "short"]
+    held = [r for r in rows if r[0] == "held"]
+    shortest, longest = short[0], short[-1]
+    ok = longest[3] <= max(shortest[3] * 2, 0.5)
+    print(
+        f"\nshort flow: {shortest[3]:.2f} -> {longest[3]:.2f} conn-seconds for "
+        f"{shortest[1]:.2f}s -> {longest[1]:.2f}s streams ({'OK' if ok else 'GROWS WITH DURATION'})"
+    )
+    print(f"held flow:  {held[0][3]:.2f} -> {held[-1][3]:.2f} conn-seconds")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connection usage of chat turns that hold vs. release the DB session during the graph run.")
+    parser.add_argument("--streams", type=int, default=20, help="Concurrent chat turns")
+    parser.add_argument("--durations", type=float, nargs="+", default=[0.5, 2.0], help="Simulated graph run durations (seconds)")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'verify_db_sessions.db')}"
+    # Must be set before app.core.database creates the engine
+    os.environ["DATABASE_URL"] = args.database_url
+    print(f"Database: {args.database_url}")
+
+    rows = asyncio.run(measure(args))
+    sys.exit(0 if check(rows) else 1)
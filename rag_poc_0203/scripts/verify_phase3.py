@@ -14,9 +14,8 @@ async def test_reliability_features():
         "collection_name": "knowledge_base",
         "filename": "propulsion_manual.pdf"
     }
-    requests.post(f"{BASE_URL}/rag/ingest", json=ingest_payload)
-    print("Wait for ingestion...")
-    await asyncio.sleep(5) # Wait for background ingestion
+    # wait=true: respond once the ingestion job has finished
+    requests.post(f"{BASE_URL}/rag/ingest", json=ingest_payload, params={"wait": "true"})
 
     # 1. Test Metadata Filtering (Positive)
     print("\n1. Testing Metadata Filtering (Source-based)...")
@@ -15,12 +15,10 @@ async def test_hybrid_search():
         "filename": "keyword_test.txt",
         "preset": "granular"
     }
-    resp = requests.post(f"{BASE_URL}/rag/ingest", json=ingest_payload)
+    # wait=true: respond once the ingestion job has finished
+    resp = requests.post(f"{BASE_URL}/rag/ingest", json=ingest_payload, params={"wait": "true"})
     print(f"Ingest status: {resp.status_code}, {resp.json()}")
     
-    # Wait for background task (simplified)
-    await asyncio.sleep(2)
-    
     # 2. Test Vector Search (might fail on exact code if embedding is not precise)
     print("\n2. Testing Vector Search for 'Antigravity-X100'...")
     chat_payload_vec = {
@@ -0,0 +1,64 @@
+import pytest
+
+from app.core.config import get_settings
+from app.rag import retriever as retriever_module
+from app.rag.collection_registry import collection_registry
+from app.rag.keyword_index import KeywordIndex
+from app.rag.local_store import LocalVectorStore, AsyncLocalVectorStore
+
+settings = get_settings()
+
+
+class FakeEmbedder:
+    """Deterministic character-histogram embeddings; chunks containing `fail_on` raise."""
+    binding = "fake"
+    model_name = "fake-embedder"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.fail_on = None
+        self.embedded = 0
+
+    def _vector(self, text: str):
+        if self.fail_on is not None and self.fail_on in text:
+            raise RuntimeError("embedder unavailable")
+        vector = [0.0] * self.dim
+        for char in text:
+            vector[ord(char) % self.dim] += 1.0
+        self.embedded += 1
+        return vector
+
+    def embed_query(self, text: str):
+        return self._vector(text)
+
+    async def aembed_query(self, text: str):
+        return self._vector(text)
+
+    async def aembed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    embedder = FakeEmbedder(settings.EMBEDDING_DIM)
+    monkeypatch.setattr(retriever_module, "embedding_client", embedder)
+    return embedder
+
+
+@pytest.fixture
+def local_retriever(tmp_path, monkeypatch, embedder):
+    """QdrantRetriever on the embedded local store, with its own keyword index and no graph."""
+    path = str(tmp_path / "vectors")
+    retriever = retriever_module.QdrantRetriever.__new__(retriever_module.QdrantRetriever)
+    retriever.client = LocalVectorStore(path, dtype="float32")
+    retriever.aclient = AsyncLocalVectorStore(path, dtype="float32")
+    retriever.collection_name = "knowledge_base"
+    retriever.embed_fallbacks = 0
+    monkeypatch.setattr(retriever_module, "keyword_index", KeywordIndex(str(tmp_path / "keyword")))
+
+    async def skip_graph(text: str):
+        return None
+    monkeypatch.setattr(retriever_module.graph_retriever, "ingest", skip_graph)
+    collection_registry.invalidate()
+    yield retriever
+    collection_registry.invalidate()
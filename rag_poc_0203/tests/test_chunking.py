@@ -0,0 +1,60 @@
+from app.rag.chunking import OffsetTextSplitter, SEPARATORS, WindowChunker, iter_text_windows
+
+
+def paragraphs(count: int) -> str:
+    return "\n\n".join(
+        "\n".join(f"제{n}조 {line}항 이 조항은 서비스 이용 조건과 회원의 의무를 정한다." for line in range(1, n % 4 + 2))
+        for n in range(1, count + 1)
+    )
+
+
+def stream_chunks(splitter: OffsetTextSplitter, text: str, window_size: int):
+    chunker = WindowChunker(splitter)
+    pieces = [text[start:start + 37] for start in range(0, len(text), 37)]
+    chunks = []
+    for window in iter_text_windows(pieces, window_size):
+        chunks.extend(chunker.feed(window))
+    return chunks + chunker.finish()
+
+
+def test_window_chunker_matches_whole_text_split():
+    text = paragraphs(60)
+    for chunk_size, chunk_overlap in [(80, 0), (120, 30), (300, 60)]:
+        splitter = OffsetTextSplitter(chunk_size, chunk_overlap, SEPARATORS, len)
+        for window_size in [200, 500, 1500]:
+            assert stream_chunks(splitter, text, window_size) == splitter.split_text(text)
+
+
+def test_window_chunker_keeps_overlap_at_window_boundaries():
+    # One long paragraph: windows are cut mid-paragraph, on lines
+    text = "\n".join(f"{n}번째 줄은 창 경계를 넘어 이어진다." for n in range(200))
+    splitter = OffsetTextSplitter(100, 40, SEPARATORS, len)
+    assert stream_chunks(splitter, text, 400) == splitter.split_text(text)
+
+
+def test_window_chunker_short_text():
+    splitter = OffsetTextSplitter(100, 10, SEPARATORS, len)
+    chunker = WindowChunker(splitter)
+    assert chunker.feed("짧은 문서.") == []
+    assert chunker.finish() == ["짧은 문서."]
+    assert chunker.finish() == []
+
+
+def test_chunk_length_stats_measures_batches():
+    from app.rag.chunking import ChunkLengthStats
+
+    class Counter:
+        backend = "test"
+        calls = 0
+
+        def __call__(self, text):
+            return len(text.split())
+
+        def batch(self, texts):
+            Counter.calls += 1
+            return [self(text) for text in texts]
+
+    stats = ChunkLengthStats(Counter(), unit="tokens")
+    assert stats.measure(["a b", "c"]) == ["a b", "c"]
+    assert Counter.calls == 1
+    assert stats.summary()["max"] == 2
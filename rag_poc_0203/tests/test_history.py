@@ -0,0 +1,94 @@
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.agents import summarizer as summarizer_module
+from app.core import history as history_module
+from app.core.database import Base, ChatMessage, ChatSession
+from app.core.history import load_history
+
+T0 = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def db_sessions(tmp_path, monkeypatch):
+    """Session factory on a fresh SQLite file; the history window keeps one turn."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    monkeypatch.setattr(history_module.settings, "HISTORY_MAX_TURNS", 1)
+    monkeypatch.setattr(history_module.settings, "SUMMARY_MIN_MESSAGES", 2)
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def add_messages(db, session_id: str, count: int, same_instant: bool = False):
+    # Ids sort in insertion order; same_instant gives every message the same created_at
+    for i in range(count):
+        created_at = T0 if same_instant else T0 + datetime.timedelta(seconds=i)
+        db.add(ChatMessage(
+            id=f"m{i:02d}", session_id=session_id, role="user" if i % 2 == 0 else "assistant",
+            content=f"message {i}", created_at=created_at
+        ))
+
+
+def test_pending_messages_resume_after_keyset_watermark(db_sessions):
+    async def run():
+        async with db_sessions() as db:
+            session = ChatSession(id="s")
+            db.add(session)
+            add_messages(db, "s", 10, same_instant=True)
+            await db.commit()
+
+            history = await load_history(db, session)
+            assert [m.content for m in history.messages] == ["message 8", "message 9"]
+            assert [m.content for m in history.pending] == [f"message {i}" for i in range(8)]
+            assert history.watermark(0) is None
+            assert history.watermark(3) == (T0, "m02")
+
+            # Folding three messages that share their created_at with the rest skips only those three
+            session.summarized_until, session.summarized_until_id = history.watermark(3)
+            await db.commit()
+            history = await load_history(db, session)
+            return [m.content for m in history.pending]
+
+    assert asyncio.run(run()) == [f"message {i}" for i in range(3, 8)]
+
+
+def test_summarizer_coalesces_turns_into_one_pass(db_sessions, monkeypatch):
+    passes = []
+
+    async def fake_summarize(existing_summary, messages):
+        passes.append([m.content for m in messages])
+        return f"summary {len(passes)}"
+
+    monkeypatch.setattr(summarizer_module, "async_session", db_sessions)
+    monkeypatch.setattr(summarizer_module, "summarize_messages", fake_summarize)
+
+    async def run():
+        async with db_sessions() as db:
+            db.add(ChatSession(id="s"))
+            add_messages(db, "s", 8)
+            await db.commit()
+
+        summarizer = summarizer_module.SessionSummarizer(debounce=0.05)
+        for _ in range(4):
+            summarizer.schedule("s")
+        await asyncio.wait_for(asyncio.gather(*summarizer._tasks.values()), timeout=5)
+
+        async with db_sessions() as db:
+            session = await db.get(ChatSession, "s")
+            return summarizer.stats(), session
+
+    stats, session = asyncio.run(run())
+    assert (stats["scheduled"], stats["coalesced"], stats["passes"]) == (4, 3, 1)
+    assert passes == [[f"message {i}" for i in range(6)]]
+    assert session.summary == "summary 1"
+    assert (session.summarized_until, session.summarized_until_id) == (T0 + datetime.timedelta(seconds=5), "m05")
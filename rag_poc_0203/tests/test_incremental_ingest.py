@@ -0,0 +1,112 @@
+import asyncio
+
+from qdrant_client.http import models
+
+
+def section(sentence: str) -> str:
+    return " ".join([sentence] * 3)
+
+
+SECTIONS = [
+    section("제1조 (목적) 이 약관은 서비스 이용 조건을 정한다."),
+    section("제2조 (정의) 회원이란 약관에 동의한 자를 말한다."),
+    section("제3조 (효력) 약관은 공지와 함께 효력이 생긴다."),
+]
+
+
+def ingest(retriever, sections):
+    return asyncio.run(retriever.ingest_documents(
+        "\n\n".join(sections), "contracts", "terms.txt", chunk_size=120, chunk_overlap=0, preset="custom"
+    ))
+
+
+def stored_contents(retriever):
+    points, _ = retriever.client.scroll(
+        "contracts",
+        scroll_filter=models.Filter(must=[models.FieldCondition(key="source", match=models.MatchValue(value="terms.txt"))]),
+        limit=100,
+    )
+    return sorted(point.payload["content"] for point in points)
+
+
+def test_reingest_skips_unchanged_and_removes_replaced_chunks(local_retriever, embedder):
+    first = ingest(local_retriever, SECTIONS)
+    assert first["status"] == "completed"
+    assert first["new"] == len(SECTIONS)
+    assert first["tokenizer"] == "chars"
+
+    embedded = embedder.embedded
+    again = ingest(local_retriever, SECTIONS)
+    assert (again["new"], again["unchanged"], again["removed"]) == (0, len(SECTIONS), 0)
+    assert embedder.embedded == embedded  # Nothing re-embedded
+
+    edited = SECTIONS[:2] + [section("제3조 (효력) 약관은 게시한 날부터 효력이 생긴다.")]
+    stats = ingest(local_retriever, edited)
+    assert (stats["new"], stats["unchanged"], stats["removed"]) == (1, 2, 1)
+    assert stored_contents(local_retriever) == sorted(edited)
+
+
+def test_reingest_with_failing_embedder_keeps_previous_points(local_retriever, embedder):
+    ingest(local_retriever, SECTIONS)
+    before = stored_contents(local_retriever)
+
+    edited = [
+        SECTIONS[0],
+        section("제2조 (정의) 회원이란 개정 약관에 동의한 자를 말한다."),
+        section("제3조 (효력) 약관은 게시한 날부터 효력이 생긴다."),
+    ]
+    embedder.fail_on = "제"  # Embedder down: every new chunk fails
+    stats = ingest(local_retriever, edited)
+    assert stats["status"] == "failed"
+    assert (stats["failed"], stats["removed"]) == (2, 0)
+    assert stored_contents(local_retriever) == before
+
+    embedder.fail_on = "개정"  # Flaky: one of the two changed sections fails
+    stats = ingest(local_retriever, edited)
+    assert stats["status"] == "partial"
+    assert (stats["new"], stats["failed"], stats["removed"]) == (1, 1, 0)
+    assert set(before) <= set(stored_contents(local_retriever))
+
+    embedder.fail_on = None
+    stats = ingest(local_retriever, edited)
+    assert stats["status"] == "completed"
+    assert stored_contents(local_retriever) == sorted(edited)
+
+
+def test_stream_ingest_matches_ingest_documents(local_retriever, embedder, monkeypatch):
+    from app.rag import retriever as retriever_module
+
+    graph_calls = []
+
+    async def record_graph(text: str):
+        graph_calls.append(text)
+
+    monkeypatch.setattr(retriever_module.graph_retriever, "ingest", record_graph)
+    monkeypatch.setattr(retriever_module.settings, "INGEST_STREAM_WINDOW_CHARS", 1)
+    sections = [section(f"제{n}조 이 조항은 {n}번째 조건을 정한다.") for n in range(1, 9)]
+    text = "\n\n".join(sections)
+
+    async def pieces():
+        for start in range(0, len(text), 50):
+            yield text[start:start + 50]
+
+    def stream(**kwargs):
+        return asyncio.run(local_retriever.ingest_stream(
+            pieces(), "contracts", "terms.txt", chunk_size=120, chunk_overlap=20, preset="custom", **kwargs
+        ))
+
+    first = stream(graph_index=True)
+    assert first["status"] == "completed"
+    assert "".join(graph_calls) == text  # Every window reached the graph once
+
+    # Same text through ingest_documents: identical chunks, so nothing new or removed
+    whole = asyncio.run(local_retriever.ingest_documents(
+        text, "contracts", "terms.txt", chunk_size=120, chunk_overlap=20, preset="custom"
+    ))
+    assert (whole["new"], whole["removed"]) == (0, 0)
+    assert whole["unchanged"] == first["chunks"]
+
+    graph_calls.clear()
+    again = stream(graph_index=True)
+    assert again["new"] == 0
+    assert graph_calls == []  # Unchanged windows are not re-sent to the graph
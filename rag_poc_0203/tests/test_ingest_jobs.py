@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from app.rag import ingest_jobs as ingest_jobs_module
+from app.rag.ingest_jobs import FileSource, IngestJobManager, TextSource
+
+
+def test_submit_without_workers_removes_spooled_upload(tmp_path):
+    spooled = tmp_path / "upload.txt"
+    spooled.write_text("본문")
+    with pytest.raises(RuntimeError):
+        IngestJobManager().submit(FileSource(str(spooled)), "contracts", "upload.txt", options={})
+    assert not spooled.exists()
+
+
+def test_wait_returns_finished_job(local_retriever, embedder, monkeypatch):
+    monkeypatch.setattr(ingest_jobs_module, "retriever", local_retriever)
+
+    async def run():
+        manager = IngestJobManager()
+        manager.start()
+        try:
+            job = manager.submit(
+                TextSource("제1조 (목적) 이 약관은 서비스 이용 조건을 정한다."),
+                "contracts",
+                "terms.txt",
+                options={"chunk_size": 120, "chunk_overlap": 0, "preset": "custom"},
+                graph_index=False,
+            )
+            return await asyncio.wait_for(manager.wait(job), timeout=10)
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(run())
+    assert (job.status, job.graph_status) == ("completed", "skipped")
+    assert job.stats["new"] == 1
+    assert job.source is None  # Released once finished
@@ -0,0 +1,35 @@
+from app.rag.keyword_index import KeywordIndex
+
+
+def ingest(index: KeywordIndex, version: int):
+    """Re-ingest of the same source: the old chunks are removed, the new ones get new ids."""
+    old = [f"contract-v{version - 1}-{i}" for i in range(3)]
+    index.remove_documents("docs", old)
+    index.add_documents("docs", [
+        (f"contract-v{version}-{i}", f"계약 조항 {i} 개정 {version}판. 계약 해지 조건은 별도 문서를 따른다.")
+        for i in range(3)
+    ])
+
+
+def test_search_after_reingest_skips_tombstoned_postings(tmp_path):
+    index = KeywordIndex(str(tmp_path), compact_threshold=10_000)
+    index.add_documents("docs", [("memo-0", "회의록: 다음 주 배포 일정 논의")])
+    for version in range(4):
+        ingest(index, version)
+
+    results = index.search("docs", "계약 해지", limit=10)
+
+    assert {doc_id for doc_id, _ in results} == {f"contract-v3-{i}" for i in range(3)}
+    assert all(score > 0 for _, score in results)
+
+
+def test_search_after_reingest_and_compaction(tmp_path):
+    index = KeywordIndex(str(tmp_path), compact_threshold=1)
+    ingest(index, 0)
+    index.maybe_compact("docs")
+    ingest(index, 1)
+
+    results = index.search("docs", "개정 1판", limit=2)
+
+    assert len(results) == 2
+    assert all(doc_id.startswith("contract-v1-") for doc_id, _ in results)
@@ -0,0 +1,104 @@
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.rag.local_store import LocalVectorStore, _LocalCollection
+
+VECTORS = {
+    1: [1.0, 0.0, 0.0, 0.0],
+    2: [0.8, 0.6, 0.0, 0.0],   # cos 0.8 to the first query
+    3: [0.0, 1.0, 0.0, 0.0],   # cos 0.0
+    4: [0.0, 0.0, 1.0, 0.0],
+}
+
+
+@pytest.fixture(params=["local", "qdrant"])
+def client(request, tmp_path):
+    if request.param == "local":
+        client = LocalVectorStore(str(tmp_path / "vectors"), dtype="float32")
+    else:
+        client = QdrantClient(":memory:")
+    client.create_collection("docs", vectors_config={"dense": models.VectorParams(size=4, distance=models.Distance.COSINE)})
+    client.upsert("docs", points=[
+        models.PointStruct(id=point_id, vector={"dense": vector}, payload={"content": f"doc {point_id}"})
+        for point_id, vector in VECTORS.items()
+    ])
+    yield client
+    client.close()
+
+
+def ids(response):
+    # The retriever reads ids as str(hit.id); the local store keeps them as strings
+    return [str(point.id) for point in response.points]
+
+
+def test_query_batch_points_applies_each_score_threshold(client):
+    requests = [
+        models.QueryRequest(query=[1.0, 0.0, 0.0, 0.0], using="dense", limit=4, score_threshold=0.5, with_payload=True),
+        models.QueryRequest(query=[0.0, 0.0, 1.0, 0.0], using="dense", limit=4, score_threshold=0.9, with_payload=True),
+        models.QueryRequest(query=[0.0, 1.0, 0.0, 0.0], using="dense", limit=4, with_payload=True),
+    ]
+
+    responses = client.query_batch_points("docs", requests=requests)
+
+    assert ids(responses[0]) == ["1", "2"]
+    assert ids(responses[1]) == ["4"]
+    assert len(responses[2].points) == 4  # No threshold
+
+
+def test_query_points_applies_score_threshold(client):
+    response = client.query_points("docs", query=[1.0, 0.0, 0.0, 0.0], using="dense", limit=4, score_threshold=0.5)
+
+    assert ids(response) == ["1", "2"]
+    assert all(point.score >= 0.5 for point in response.points)
+
+
+def source_filter(**clauses):
+    def condition(spec):
+        if isinstance(spec, list):
+            return models.FieldCondition(key="source", match=models.MatchAny(any=spec))
+        return models.FieldCondition(key="source", match=models.MatchValue(value=spec))
+    return models.Filter(**{clause: [condition(spec) for spec in specs] for clause, specs in clauses.items()})
+
+
+def filtered_ids(client, flt):
+    return sorted(ids(client.query_points("docs", query=[1.0, 1.0, 1.0, 1.0], using="dense", limit=10, query_filter=flt)))
+
+
+def test_keyword_index_filters_follow_upserts_and_deletes(client):
+    client.create_payload_index("docs", field_name="source", field_schema=models.PayloadSchemaType.KEYWORD)
+    client.upsert("docs", points=[
+        models.PointStruct(id=point_id, vector={"dense": VECTORS[point_id]}, payload={"content": f"doc {point_id}", "source": source})
+        for point_id, source in [(1, "a.txt"), (2, "a.txt"), (3, "b.txt"), (4, ["b.txt", "c.txt"])]
+    ])
+
+    assert filtered_ids(client, source_filter(must=["a.txt"])) == ["1", "2"]
+    assert filtered_ids(client, source_filter(must=[["a.txt", "c.txt"]])) == ["1", "2", "4"]
+    assert filtered_ids(client, source_filter(should=["a.txt", "c.txt"], must_not=["a.txt"])) == ["4"]
+    assert filtered_ids(client, models.Filter(must=[source_filter(must=["b.txt"])])) == ["3", "4"]
+
+    # Re-upserting a point moves it to its new value; deleted points drop out
+    client.upsert("docs", points=[
+        models.PointStruct(id=2, vector={"dense": VECTORS[2]}, payload={"content": "doc 2", "source": "b.txt"})
+    ])
+    client.delete("docs", points_selector=models.PointIdsList(points=[3]))
+    assert filtered_ids(client, source_filter(must=["a.txt"])) == ["1"]
+    assert filtered_ids(client, source_filter(must=["b.txt"])) == ["2", "4"]
+
+
+def test_local_keyword_index_is_rebuilt_on_open(tmp_path):
+    root = str(tmp_path / "docs")
+    collection = _LocalCollection(root, dim=4, vector_name="dense", dtype="float32")
+    collection.add_keyword_index("source")
+    collection.upsert([
+        models.PointStruct(id=point_id, vector={"dense": vector}, payload={"source": f"{point_id % 2}.txt"})
+        for point_id, vector in VECTORS.items()
+    ])
+    collection.delete(["1"])
+    collection.close()
+
+    reopened = _LocalCollection(root)
+    assert reopened.keyword_rows == {"source": {"1.txt": {2}, "0.txt": {1, 3}}}
+    mask = reopened.filter_rows(source_filter(must=["1.txt"]))
+    assert [reopened.ids[row] for row in mask.nonzero()[0]] == ["3"]
+    reopened.close()